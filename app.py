@@ -1,13 +1,28 @@
 import os
 import json
-import csv
+import threading
+import time
+import hmac
 import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from PIL import Image
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.model_loader import download_model
+from utils.batching import MicroBatcher
+from utils.model_state import LoadProgress
+from utils.metrics import render as render_metrics, set_model_info, stage, timed, track_requests
+from utils.request_log import RequestLog
+from utils.labels import LabelRegistry
+from utils.artist_catalog import ArtistCatalog
+from utils.similarity import DEFAULT_INDEX_DIR, SimilarityIndex, embeddings_enabled
+from utils.inference_server import DEFAULT_SOCKET, InferenceClient, start_server_process
+from utils.inference import benchmark_against_predict, default_batch_sizes, load_backend, warmup, tflite_path_for
+from utils.uploads import UploadRejected, check_image, collect_batch_images, read_upload
+from utils.prediction_cache import PredictionCache, resource_version
+from utils.perceptual_hash import NearDuplicateIndex, dhash
+from utils.preprocessing import IMG_SIZE, open_image, preprocess_into
+from utils.buffer_pool import BatchBufferPool
+from utils.preprocess_pool import PreprocessPool, default_pool_size
 
 # --- 1. Robust Environment Setup ---
 # Initialize Flask
@@ -25,50 +40,157 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Define Paths
 MODEL_PATH = os.path.join(BASE_DIR, 'art_artist_classifier.keras')
 CLASS_NAMES_PATH = os.path.join(BASE_DIR, 'class_names.json')
-ARTISTS_CSV_PATH = os.path.join(BASE_DIR, 'artists.csv')
+# data/ ships in the Docker image (backend/ is excluded by .dockerignore)
+ARTISTS_CSV_PATH = os.path.join(BASE_DIR, 'data', 'artists.csv')
 
 # --- 2. Load Resources (Global Scope) ---
 print("🔄 Loading resources...")
 
-# Load Model with Error Handling
+# Dynamic micro-batching: concurrent requests share one batched forward pass
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 8))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+# Preallocated uint8 input slots; requests preprocess straight into them
+BATCH_BUFFER_SLOTS = int(os.environ.get('BATCH_BUFFER_SLOTS', 4 * BATCH_MAX_SIZE))
+
+# Inference backend: 'keras' (full TensorFlow) or 'tflite' (converted model)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras').lower()
+TFLITE_THREADS = int(os.environ.get('TFLITE_THREADS', 0)) or None
+
+# 'thread': this worker loads its own model. 'process': one inference process per node owns the
+# model (started by gunicorn.conf.py) and every HTTP worker sends it tensors through shared memory
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'thread').lower()
+INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', DEFAULT_SOCKET)
+INFERENCE_CONNECT_TIMEOUT = float(os.environ.get('INFERENCE_CONNECT_TIMEOUT', 600))
+
+# Load the model on a background thread so the server binds its port (and serves
+# /api/live, /api/ready, /api/artists) while the download and load are running
+MODEL_BACKGROUND_LOAD = os.environ.get('MODEL_BACKGROUND_LOAD', '1') == '1'
+# Seconds a classify request waits for a still-loading model before a 503 with Retry-After
+MODEL_WAIT_SECONDS = float(os.environ.get('MODEL_WAIT_SECONDS', 5))
+
+# Synthetic passes per batch size before the worker reports ready (/api/ready)
+WARMUP_ROUNDS = int(os.environ.get('WARMUP_ROUNDS', 2))
+
+# Set BENCHMARK_INFERENCE=1 to report compiled vs model.predict latency at startup (Keras backend)
+BENCHMARK_INFERENCE = os.environ.get('BENCHMARK_INFERENCE', '0') == '1'
+
+model_progress = LoadProgress()
+backend = None
 model = None
-try:
-    # Download model from Google Drive if not present (File ID: 1yVudBpUunOaEW1ilgROLrQvyqE9Bmzgv)
-    print("🔍 Checking for model file...")
-    model_path = download_model()
-    
-    if model_path is None:
-        print("⚠️ WARNING: Model download failed. Server will start but predictions will not work.")
-    else:
-        print(f"Loading model from: {model_path}")
-        model = tf.keras.models.load_model(model_path)
+model_path = None
+inference_benchmark = None
+warmup_report = None
+buffer_pool = None
+batcher = None
+# Width of the embedding appended to each model output row (0 when embeddings are off)
+embedding_dim = 0
+
+def connect_inference_process():
+    """INFERENCE_MODE=process: attach to the node's inference process instead of loading a model here"""
+    global model_path, warmup_report, buffer_pool, batcher, embedding_dim
+    model_progress.set_phase('loading')
+    print(f"🔌 Waiting for inference process at {INFERENCE_SOCKET}...")
+    client = InferenceClient(INFERENCE_SOCKET, slots=BATCH_BUFFER_SLOTS)
+    status = client.connect(
+        timeout=INFERENCE_CONNECT_TIMEOUT,
+        # Mirror the inference process's download progress on this worker's /api/loading
+        on_status=lambda s: model_progress.update_download(s['download']['bytes_done'], s['download']['bytes_total']),
+    )
+    labels.validate(status['output_dim'])
+    model_path = status['model_path']
+    embedding_dim = int(status.get('embedding_dim') or 0)
+    warmup_report = status['warmup']
+    buffer_pool = client.buffer_pool
+    batcher = client
+    print(f"✅ Attached to inference process (pid {status['pid']}, {BATCH_BUFFER_SLOTS} shared slots)")
+
+def load_model():
+    """Fetch, load and warm up the model, then open the micro-batcher to traffic"""
+    global backend, model, model_path, inference_benchmark, warmup_report, buffer_pool, batcher, embedding_dim
+    try:
+        if INFERENCE_MODE == 'process':
+            connect_inference_process()
+            init_prediction_cache()
+            check_similarity_index()
+            set_model_info(model_path, class_names, INFERENCE_BACKEND)
+            model_progress.set_phase('ready')
+            return
+
+        if INFERENCE_BACKEND == 'tflite':
+            # Converted model (see backend/scripts/convert_tflite.py); no TensorFlow import needed
+            model_path = os.environ.get('TFLITE_MODEL_PATH') or tflite_path_for(MODEL_PATH)
+        else:
+            # Download model from Google Drive if not present (File ID: 1yVudBpUunOaEW1ilgROLrQvyqE9Bmzgv)
+            model_progress.set_phase('downloading')
+            print("🔍 Checking for model file...")
+            model_path = download_model(progress=model_progress.update_download)
+
+        if model_path is None:
+            print("⚠️ WARNING: Model download failed. Server will start but predictions will not work.")
+            model_progress.mark_failed('Model download failed')
+            return
+
+        model_progress.set_phase('loading')
+        print(f"Loading model from: {model_path} ({INFERENCE_BACKEND} backend)")
+        # Traces/allocates a fixed-signature inference function per served batch size
+        backend = load_backend(
+            INFERENCE_BACKEND,
+            model_path,
+            batch_sizes=default_batch_sizes(BATCH_MAX_SIZE),
+            img_size=IMG_SIZE,
+            num_threads=TFLITE_THREADS,
+            embeddings=EMBEDDINGS_ENABLED,
+        )
+        embedding_dim = backend.embedding_dim
         print("✅ Model loaded successfully!")
-    
-    # Check for Rescaling layer
-    has_rescaling = any('rescaling' in layer.name.lower() for layer in model.layers)
-    if has_rescaling:
-        print("ℹ️  Model has built-in Rescaling layer")
-    else:
-        print("ℹ️  Model expects manual normalization (0-255)")
-        
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-
-# CORRECTED, ALPHABETICAL CLASS LIST (Hardcoded to match model training order)
-class_names = [
-    'Albrecht_Durer', 'Alfred_Sisley', 'Amedeo_Modigliani', 'Andy_Warhol', 'Artemisia_Gentileschi',
-    'Berthe_Morisot', 'Camille_Pissarro', 'Canaletto', 'Caravaggio', 'Claude_Monet',
-    'Diego_Velazquez', 'Edgar_Degas', 'Edouard_Manet', 'Edvard_Munch', 'El_Greco',
-    'Eugene_Delacroix', 'Francisco_Goya', 'Frida_Kahlo', 'Georges_Seurat', 'Giotto_di_Bondone',
-    'Gustav_Klimt', 'Gustave_Courbet', 'Henri_Matisse', 'Henri_Rousseau', 'Henri_de_Toulouse-Lautrec',
-    'Hieronymus_Bosch', 'Jackson_Pollock', 'Jan_van_Eyck', 'Joan_Miro', 'Kazimir_Malevich',
-    'Leonardo_da_Vinci', 'Marc_Chagall', 'Michelangelo', 'Mikhail_Vrubel', 'Pablo_Picasso',
-    'Paul_Cezanne', 'Paul_Gauguin', 'Paul_Klee', 'Peter_Paul_Rubens', 'Pierre-Auguste_Renoir',
-    'Piet_Mondrian', 'Pieter_Bruegel', 'Raphael', 'Rembrandt', 'René_Magritte',
-    'Salvador_Dali', 'Sandro_Botticelli', 'Titian', 'Vasiliy_Kandinsky', 'Vincent_van_Gogh',
-    'William_Turner'
-]
-print(f"✅ Loaded {len(class_names)} artist classes (hardcoded alphabetical)")
+        labels.validate(backend.output_dim)
+        print(f"✅ Inference function prepared for batch sizes {backend.batch_sizes}")
+        if embedding_dim:
+            print(f"✅ Returning {embedding_dim}-d embeddings from the same forward pass")
+
+        if backend.name == 'keras':
+            model = backend.model
+            # Check for Rescaling layer
+            if backend.has_rescaling:
+                print("ℹ️  Model has built-in Rescaling layer")
+            else:
+                print("ℹ️  Model expects manual normalization (0-255)")
+
+        if BENCHMARK_INFERENCE and model is not None:
+            inference_benchmark = benchmark_against_predict(model, backend.predictor)
+            print(f"⏱️  model.predict: {inference_benchmark['model_predict']['mean_ms']:.2f} ms, "
+                  f"compiled: {inference_benchmark['compiled']['mean_ms']:.2f} ms "
+                  f"(saves {inference_benchmark['saved_ms']:.2f} ms per image)")
+
+        buffer_pool = BatchBufferPool(BATCH_BUFFER_SLOTS, (IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+        batcher = MicroBatcher(
+            timed(backend.predict, 'model_forward'),
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            buffer_pool=buffer_pool,
+        ).start()
+        print(f"✅ Micro-batching enabled (max batch {BATCH_MAX_SIZE}, max wait {BATCH_MAX_WAIT_MS} ms)")
+
+        # Trace, allocate and pick kernels for every batch size now rather than on the first request
+        model_progress.set_phase('warming')
+        warmup_report = warmup(backend.predict, backend.batch_sizes, img_size=IMG_SIZE, rounds=WARMUP_ROUNDS)
+        print(f"✅ Warmup finished in {warmup_report['total_ms']:.0f} ms (batch sizes {backend.batch_sizes})")
+
+        init_prediction_cache()
+        check_similarity_index()
+        set_model_info(model_path, class_names, INFERENCE_BACKEND)
+        model_progress.set_phase('ready')
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        model_progress.mark_failed(e)
+
+# Label registry: raw/display names and Wikipedia URLs per class id, built once.
+# Defaults to the built-in alphabetical list (the model's training order); LABELS_PATH
+# points at a JSON list to use instead, e.g. a corrected class_names.json
+LABELS_PATH = os.environ.get('LABELS_PATH') or None
+labels = LabelRegistry.load(LABELS_PATH, ARTISTS_CSV_PATH)
+class_names = labels.names
+print(f"✅ Loaded {len(class_names)} artist classes ({LABELS_PATH or 'hardcoded alphabetical'})")
 
 # Startup Verification Check
 print("--------------------------------------------------")
@@ -81,54 +203,237 @@ else:
     print("❌ MAPPING WRONG! Fix required!")
 print("--------------------------------------------------\n")
 
-# Load Wikipedia Data
-artist_wikipedia_map = {}
-try:
-    if os.path.exists(ARTISTS_CSV_PATH):
-        with open(ARTISTS_CSV_PATH, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                artist_name = row['name']
-                wikipedia_url = row['wikipedia']
-                artist_wikipedia_map[artist_name] = wikipedia_url
-        print(f"✅ Loaded Wikipedia URLs for {len(artist_wikipedia_map)} artists")
-    else:
-        print(f"⚠️ Artists CSV not found at {ARTISTS_CSV_PATH}")
-except Exception as e:
-    print(f"⚠️ Warning: Could not load artists CSV: {e}")
+if labels.wikipedia_count:
+    print(f"✅ Loaded Wikipedia URLs for {labels.wikipedia_count} artists")
+else:
+    print(f"⚠️ No Wikipedia URLs loaded (artists CSV: {ARTISTS_CSV_PATH})")
+
+# Artist metadata for /api/artists[/<name>]: serialized, compressed and ETagged once at startup
+ARTISTS_CACHE_SECONDS = int(os.environ.get('ARTISTS_CACHE_SECONDS', 3600))
+artist_catalog = ArtistCatalog.load(ARTISTS_CSV_PATH, labels, max_age=ARTISTS_CACHE_SECONDS)
+if artist_catalog.artists:
+    print(f"✅ Artist catalog ready ({artist_catalog.detail_count} artists)")
+else:
+    print(f"⚠️ Artist catalog is empty: no rows in {ARTISTS_CSV_PATH}; details and Wikipedia links will be missing")
+
+# Content-addressed prediction cache (memory LRU + optional SQLite shared by all workers)
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 3600))
+CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or None
+CACHE_SQLITE_MAX_ROWS = int(os.environ.get('CACHE_SQLITE_MAX_ROWS', 100000))
+
+prediction_cache = None
+
+def init_prediction_cache():
+    """Create the cache once the model file (part of the cache version) is in place"""
+    global prediction_cache
+    if not CACHE_ENABLED:
+        return
+    try:
+        prediction_cache = PredictionCache(
+            resource_version(model_path, class_names, embedding_dim),
+            max_entries=CACHE_MAX_ENTRIES,
+            ttl_seconds=CACHE_TTL_SECONDS,
+            sqlite_path=CACHE_SQLITE_PATH,
+            sqlite_max_rows=CACHE_SQLITE_MAX_ROWS,
+        )
+        print(f"✅ Prediction cache enabled (version {prediction_cache.version}, disk tier: {CACHE_SQLITE_PATH or 'off'})")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not initialise prediction cache: {e}")
+
+# Optional perceptual-hash lookup: recompressed/rescaled copies of a recent upload skip the forward pass
+PHASH_ENABLED = os.environ.get('PHASH_ENABLED', '0') == '1'
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', 6))
+PHASH_MAX_ENTRIES = int(os.environ.get('PHASH_MAX_ENTRIES', 10000))
+PHASH_AUDIT_RATE = float(os.environ.get('PHASH_AUDIT_RATE', 0.05))
+
+near_duplicate_index = None
+if PHASH_ENABLED:
+    near_duplicate_index = NearDuplicateIndex(
+        max_entries=PHASH_MAX_ENTRIES,
+        max_distance=PHASH_MAX_DISTANCE,
+        audit_rate=PHASH_AUDIT_RATE,
+    )
+    print(f"✅ Near-duplicate lookup enabled (max Hamming distance {PHASH_MAX_DISTANCE})")
+
+# Optional process pool so decode/resize runs outside the request threads' GIL
+PREPROCESS_POOL = os.environ.get('PREPROCESS_POOL', '0') == '1'
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', 0)) or default_pool_size()
+PREPROCESS_TIMEOUT = float(os.environ.get('PREPROCESS_TIMEOUT', 10))
+
+preprocess_pool = None
+if PREPROCESS_POOL:
+    try:
+        preprocess_pool = PreprocessPool(size=PREPROCESS_WORKERS, timeout=PREPROCESS_TIMEOUT)
+        print(f"✅ Preprocessing pool started ({PREPROCESS_WORKERS} worker processes)")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not start preprocessing pool, preprocessing in-thread: {e}")
+
+# Similar-artwork search over a prebuilt embedding index (backend/scripts/build_similarity_index.py).
+# When the index exists the model also returns its penultimate-layer embedding with every prediction
+SIMILARITY_INDEX = os.environ.get('SIMILARITY_INDEX') or os.path.join(BASE_DIR, DEFAULT_INDEX_DIR)
+EMBEDDINGS_ENABLED = INFERENCE_BACKEND == 'keras' and embeddings_enabled(SIMILARITY_INDEX)
+SIMILAR_DEFAULT_K = int(os.environ.get('SIMILAR_DEFAULT_K', 12))
+SIMILAR_MAX_K = int(os.environ.get('SIMILAR_MAX_K', 100))
+# Indexes with more rows than this are searched approximately (IVF) unless the request asks for exact
+SIMILARITY_EXACT_MAX = int(os.environ.get('SIMILARITY_EXACT_MAX', 50000))
+SIMILARITY_NPROBE = int(os.environ.get('SIMILARITY_NPROBE', 8))
+
+similarity_index = None
+if SimilarityIndex.exists(SIMILARITY_INDEX):
+    try:
+        # Memory-mapped: vectors are paged in by searches, not read at startup
+        similarity_index = SimilarityIndex(SIMILARITY_INDEX)
+        print(f"✅ Similarity index mapped ({len(similarity_index)} artworks, {similarity_index.dim}-d, "
+              f"IVF lists: {similarity_index.ivf_lists or 'off'})")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not open similarity index: {e}")
+
+def check_similarity_index():
+    """Disable similarity search if the index was built from a different embedding size"""
+    global similarity_index
+    if similarity_index is not None and similarity_index.dim != embedding_dim:
+        print(f"⚠️ Similarity index is {similarity_index.dim}-d but the model gives {embedding_dim}-d embeddings; "
+              f"/api/similar disabled (rebuild the index or set EMBEDDINGS_ENABLED=1)")
+        similarity_index = None
+
+# Structured request logging: JSON lines written by a background thread, per-prediction records sampled
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', 256))
+# /api/admin/traces is disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+request_log = RequestLog(LOG_LEVEL, LOG_SAMPLE_RATE, LOG_QUEUE_SIZE, TRACE_BUFFER_SIZE)
+
+# `python app.py` starts its own inference process. It has to be up before load_model() connects,
+# which with MODEL_BACKGROUND_LOAD=0 happens right below, before the __main__ block runs.
+# Under gunicorn this is done once per node by gunicorn.conf.py
+if INFERENCE_MODE == 'process' and __name__ == '__main__':
+    inference_process = start_server_process(INFERENCE_SOCKET)
+
+# Start loading the model; classify routes wait on model_progress until it is ready
+if MODEL_BACKGROUND_LOAD:
+    threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+else:
+    load_model()
 
 # --- 3. Helper Functions ---
-IMG_SIZE = 224
-
-def preprocess_image(image):
-    """Preprocess the image for model prediction"""
-    # Convert to RGB if necessary
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Resize to model's expected input size
-    image = image.resize((IMG_SIZE, IMG_SIZE))
-    
-    # Convert to numpy array - keep raw pixel values (0-255)
-    img_array = np.array(image).astype('float32')
-    
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    return img_array
-
-def clean_artist_name(name):
-    """Clean artist name for better display"""
-    name = name.replace('_', ' ')
-    name = name.replace('тХа├а', 'ü').replace('а', '')
-    replacements = {
-        'Du rer': 'Dürer',
-        'Duerer': 'Dürer',
-        'Vasiliy Kandinskiy': 'Wassily Kandinsky',
+DEFAULT_TOP_K = 5
+
+def build_predictions(probabilities, top_k=DEFAULT_TOP_K, min_confidence=0.0):
+    """Top-k predictions in the shape the frontend expects"""
+    return labels.top_k(probabilities, top_k, min_confidence)
+
+def prediction_options(values):
+    """(k, min_confidence) from request parameters; ValueError if they are out of range"""
+    k = int(values.get('k') or DEFAULT_TOP_K)
+    min_confidence = float(values.get('min_confidence') or 0.0)
+    if not 1 <= k <= len(labels):
+        raise ValueError(f'k must be between 1 and {len(labels)}')
+    if not 0.0 <= min_confidence <= 1.0:
+        raise ValueError('min_confidence must be between 0 and 1')
+    return k, min_confidence
+
+def infer_bytes(data):
+    """Decode, preprocess into a pooled batch slot and run through the batched model"""
+    # Format and pixel count come from the header; refuse before any pixels are decoded
+    with stage('upload_check'):
+        check_image(data, UPLOAD_MAX_PIXELS)
+    want_hash = near_duplicate_index is not None
+    slot = buffer_pool.acquire()
+    try:
+        pixels = buffer_pool.view(slot)
+        image = None
+        image_hash = None
+
+        if preprocess_pool is not None:
+            with stage('preprocess_pool'):
+                _, image_hash = preprocess_pool.run(data, with_hash=want_hash, out=pixels)
+        else:
+            with stage('decode'):
+                image = open_image(data)
+            if want_hash:
+                with stage('phash'):
+                    image_hash = dhash(image)
+
+        # Near-duplicate of a recent upload? Reuse its result unless picked for audit
+        stored = None
+        if image_hash is not None:
+            stored, distance, audit = near_duplicate_index.lookup(image_hash)
+            if stored is not None and not audit:
+                return stored
+
+        if image is not None:
+            with stage('preprocess'):
+                preprocess_into(image, pixels)
+        with stage('inference'):
+            outputs = batcher.submit_slot(slot)
+    finally:
+        buffer_pool.release(slot)
+
+    if image_hash is not None:
+        if stored is not None:
+            near_duplicate_index.record_audit(distance, stored[:len(labels)], outputs[:len(labels)])
+        else:
+            near_duplicate_index.add(image_hash, outputs)
+    return outputs
+
+def model_outputs(data):
+    """Model output row for raw image bytes (probabilities, then the embedding if enabled), cached by content"""
+    if prediction_cache is None:
+        return infer_bytes(data)
+    return prediction_cache.get_or_compute(prediction_cache.key_for(data), lambda: infer_bytes(data))
+
+def predict_bytes(data):
+    """Class probabilities for raw image bytes, served from the prediction cache when possible"""
+    return model_outputs(data)[:len(labels)]
+
+def embed_bytes(data):
+    """(probabilities, embedding) for raw image bytes from a single forward pass"""
+    outputs = model_outputs(data)
+    return outputs[:len(labels)], outputs[len(labels):]
+
+def classify_bytes(data, top_k=DEFAULT_TOP_K, min_confidence=0.0):
+    """Decode, preprocess and classify one image from raw bytes"""
+    return build_predictions(predict_bytes(data), top_k, min_confidence)
+
+def model_unavailable():
+    """None once the model is ready; otherwise (status, body, headers): 503 + Retry-After while loading, 500 if loading failed"""
+    if model_progress.wait(MODEL_WAIT_SECONDS):
+        return None
+    if model_progress.failed:
+        return 500, {'error': 'Model not loaded on server'}, {}
+    body = {'error': 'Model is still loading, retry shortly', 'loading': model_progress.snapshot()}
+    return 503, body, {'Retry-After': str(model_progress.retry_after())}
+
+def model_unavailable_response():
+    unavailable = model_unavailable()
+    if unavailable is None:
+        return None
+    status, body, headers = unavailable
+    return jsonify(body), status, headers
+
+def classification_payload(probabilities, top_k=DEFAULT_TOP_K, min_confidence=0.0):
+    """Response body for a single classification, or None if nothing could be predicted"""
+    with stage('postprocess'):
+        results = build_predictions(probabilities, top_k, min_confidence)
+    if not results and not min_confidence:
+        return None
+    # Nothing above the requested cutoff is a valid (empty) answer
+    top = results[0] if results else {'artist': None, 'percentage': None}
+    # Return format matching frontend expectations
+    return {
+        'success': True,
+        'predictions': results,
+        'top_artist': top['artist'],
+        'top_confidence': top['percentage'],
+        # Add simple fields for potential other clients
+        'class': top['artist'],
+        'confidence': top['percentage']
     }
-    for old, new in replacements.items():
-        name = name.replace(old, new)
-    return name.strip()
 
 # --- 4. API Routes ---
 
@@ -136,19 +441,68 @@ def clean_artist_name(name):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return jsonify(health_payload())
+
+def health_payload():
+    return {
         'status': 'healthy',
         'message': 'Kala Art AI Backend is Live! 🎨',
-        'model_loaded': model is not None,
+        'model_loaded': batcher is not None,
+        'ready': model_progress.ready,
+        'inference_backend': INFERENCE_BACKEND,
+        'inference_mode': INFERENCE_MODE,
         'num_classes': len(class_names)
-    })
+    }
+
+@app.route('/api/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 503 until the model is loaded and warmed up"""
+    return jsonify(readiness_payload()), 200 if model_progress.ready else 503
+
+def readiness_payload():
+    return {
+        'ready': model_progress.ready,
+        'model_loaded': batcher is not None,
+        'queue_depth': batcher.queue_depth if batcher is not None else None,
+        'warmup': warmup_report,
+        'loading': model_progress.snapshot(),
+    }
+
+@app.route('/api/loading', methods=['GET'])
+def loading_progress():
+    """Model load progress: current phase, download bytes and per-phase durations"""
+    return jsonify(model_progress.snapshot())
+
+# Per-image upload limits: bytes read from the request, and pixels (width x height from the
+# image header) so a decompression bomb is refused before it is decoded
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 50_000_000))
+# Room for the multipart framing and form fields around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+def upload_too_large(limit):
+    """413 for a declared Content-Length over `limit`, before the body is parsed"""
+    if request.content_length is not None and request.content_length > limit + MULTIPART_OVERHEAD:
+        return jsonify({'error': f'Upload exceeds the {limit // (1024 * 1024)} MB limit'}), 413
+    return None
 
 @app.route('/predict', methods=['POST'])  # Alias for compatibility
 @app.route('/api/classify', methods=['POST'])
+@track_requests('classify')
 def classify_artwork():
     """Classify an uploaded artwork image"""
-    if model is None:
-        return jsonify({'error': 'Model not loaded on server'}), 500
+    too_large = upload_too_large(UPLOAD_MAX_BYTES)
+    if too_large is not None:
+        return too_large
+
+    unavailable = model_unavailable_response()
+    if unavailable is not None:
+        return unavailable
 
     try:
         # Check if image file is present (handle both 'image' and 'file' keys)
@@ -160,93 +514,238 @@ def classify_artwork():
         
         if not file or file.filename == '':
             return jsonify({'error': 'No image file provided'}), 400
+
+        try:
+            top_k, min_confidence = prediction_options(request.values)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Read and preprocess the image
-        image = Image.open(BytesIO(file.read()))
-        processed_image = preprocess_image(image)
-        
-        # Make prediction
-        predictions = model.predict(processed_image, verbose=0)
-        
-        # --- DEBUG LOGGING ---
-        # Get top prediction index
-        predicted_index = np.argmax(predictions[0])
-        mapped_name = class_names[predicted_index] if predicted_index < len(class_names) else "Unknown"
-        
-        print("\n" + "="*40)
-        print(f"🧐 PREDICTION DEBUG LOG")
-        print("="*40)
-        print(f"First 5 Classes: {class_names[:5]}")
-        print(f"Predicted Index: {predicted_index}")
-        print(f"Mapped Name:     {mapped_name}")
-        print(f"Confidence:      {predictions[0][predicted_index]:.4f}")
-        print(f"Raw Probabilities (Overview): Min={predictions[0].min():.4f}, Max={predictions[0].max():.4f}")
-        print("="*40 + "\n")
-        # ---------------------
-
-        # Get top 5 predictions
-        top_k = min(5, len(class_names))
-        
-        # Sort indices by confidence (descending)
-        all_indices = np.argsort(predictions[0])[::-1]
+        # Read, preprocess and predict (cached by content hash, batched with other in-flight requests)
+        started = time.perf_counter()
+        with stage('upload_read'):
+            data = read_upload(file.stream, UPLOAD_MAX_BYTES)
+        probabilities = predict_bytes(data)
+        request_log.prediction('classify', file.filename, len(data), probabilities, class_names, started)
         
-        results = []
-        for idx in all_indices:
-            if idx >= len(class_names):
-                continue
-                
-            artist_name = class_names[idx]
-            confidence = float(predictions[0][idx])
-            
-            # Debug inference mapping
-            if idx == predicted_index:
-                print(f"🔍 DEBUG: Model predicted Index {idx}, which maps to: {artist_name}")
-            
-            cleaned_name = clean_artist_name(artist_name)
-            
-            # Get Wikipedia URL
-            wikipedia_url = artist_wikipedia_map.get(cleaned_name, '')
-            
-            results.append({
-                'artist': cleaned_name,
-                'raw_name': artist_name,
-                'confidence': confidence,
-                'percentage': round(confidence * 100, 2),
-                'wikipedia': wikipedia_url
-            })
-            
-            if len(results) >= top_k:
-                break
+        # Get top-k predictions
+        payload = classification_payload(probabilities, top_k, min_confidence)
         
-        if not results:
+        if payload is None:
             return jsonify({'error': 'No predictions generated'}), 500
 
-        # Return format matching frontend expectations
-        return jsonify({
-            'success': True,
-            'predictions': results,
-            'top_artist': results[0]['artist'],
-            'top_confidence': results[0]['percentage'],
-            # Add simple fields for potential other clients
-            'class': results[0]['artist'],
-            'confidence': results[0]['percentage']
-        })
-    
+        with stage('serialize'):
+            return jsonify(payload)
+
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
-        print(f"Error during classification: {str(e)}")
+        request_log.error('classification failed', endpoint='classify')
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+# Batch classification limits (per request) so one upload can't starve interactive traffic
+BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 64))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', 100 * 1024 * 1024))
+BATCH_DECODE_WORKERS = int(os.environ.get('BATCH_DECODE_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Hard cap for any request body; Werkzeug answers 413 while streaming it in, before the form is parsed
+app.config['MAX_CONTENT_LENGTH'] = max(UPLOAD_MAX_BYTES, BATCH_MAX_BYTES) + MULTIPART_OVERHEAD
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': 'Request body too large'}), 413
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_DECODE_WORKERS, thread_name_prefix='batch-decode')
+
+@app.route('/api/classify/batch', methods=['POST'])
+@track_requests('classify_batch')
+def classify_batch():
+    """Classify many images (multipart files and/or zip archives), streaming NDJSON results"""
+    too_large = upload_too_large(BATCH_MAX_BYTES)
+    if too_large is not None:
+        return too_large
+
+    unavailable = model_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+
+    files = []
+    for key in ('images', 'files', 'image', 'file'):
+        files.extend(request.files.getlist(key))
+
+    try:
+        images = collect_batch_images(files, BATCH_MAX_IMAGES, BATCH_MAX_BYTES, UPLOAD_MAX_BYTES)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not images:
+        return jsonify({'error': 'No image files provided'}), 400
+
+    try:
+        top_k, min_confidence = prediction_options(request.values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        # Decode in parallel; each image joins the shared micro-batch queue as soon as it is ready
+        futures = {
+            batch_executor.submit(classify_bytes, data, top_k, min_confidence): (index, name)
+            for index, (name, data, error) in enumerate(images)
+            if error is None
+        }
+        # Files refused at upload (not an image, over UPLOAD_MAX_BYTES) fail only their own line
+        for index, (name, data, error) in enumerate(images):
+            if error is not None:
+                yield json.dumps({'index': index, 'filename': name, 'success': False, 'error': str(error)}) + '\n'
+        for future in as_completed(futures):
+            index, name = futures[future]
+            try:
+                results = future.result()
+                line = {
+                    'index': index,
+                    'filename': name,
+                    'success': True,
+                    'predictions': results,
+                    'top_artist': results[0]['artist'] if results else None,
+                    'top_confidence': results[0]['percentage'] if results else None
+                }
+            except Exception as e:
+                line = {'index': index, 'filename': name, 'success': False, 'error': str(e)}
+            yield json.dumps(line) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/similar', methods=['GET', 'POST'])
+@track_requests('similar')
+def find_similar():
+    """Indexed artworks most similar to an uploaded image (POST) or to an indexed artwork (GET ?item=<row>)"""
+    if similarity_index is None:
+        return jsonify({'error': 'Similarity search is not enabled on this server'}), 503
+    try:
+        k, mode, nprobe = similarity_options(request.values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.method == 'GET':
+        row = request.args.get('item', type=int)
+        if row is None or not 0 <= row < len(similarity_index):
+            return jsonify({'error': f'item must be a row number below {len(similarity_index)}'}), 400
+        return jsonify(similar_payload(similarity_index.vector(row), k, mode, nprobe, exclude=row))
+
+    unavailable = model_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    if not embedding_dim:
+        return jsonify({'error': 'The loaded model is not returning embeddings'}), 503
+
+    too_large = upload_too_large(UPLOAD_MAX_BYTES)
+    if too_large is not None:
+        return too_large
+    file = request.files.get('image') or request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'No image file provided'}), 400
+    try:
+        with stage('upload_read'):
+            data = read_upload(file.stream, UPLOAD_MAX_BYTES)
+        probabilities, embedding = embed_bytes(data)
+        payload = similar_payload(embedding, k, mode, nprobe)
+        # The classification comes from the same forward pass
+        payload['predictions'] = build_predictions(probabilities)
+        with stage('serialize'):
+            return jsonify(payload)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        request_log.error('similarity search failed', endpoint='similar')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def similarity_options(values):
+    """(k, mode, nprobe) from request parameters; ValueError if they are invalid"""
+    k = int(values.get('k') or SIMILAR_DEFAULT_K)
+    if not 1 <= k <= SIMILAR_MAX_K:
+        raise ValueError(f'k must be between 1 and {SIMILAR_MAX_K}')
+    use_ivf = similarity_index.ivf_lists and len(similarity_index) > SIMILARITY_EXACT_MAX
+    mode = values.get('mode') or ('ivf' if use_ivf else 'exact')
+    if mode not in ('exact', 'ivf'):
+        raise ValueError("mode must be 'exact' or 'ivf'")
+    if mode == 'ivf' and not similarity_index.ivf_lists:
+        raise ValueError('The similarity index has no IVF lists (build it with --ivf-lists)')
+    nprobe = int(values.get('nprobe') or SIMILARITY_NPROBE)
+    if nprobe < 1:
+        raise ValueError('nprobe must be at least 1')
+    return k, mode, nprobe
+
+def similar_payload(query, k, mode, nprobe, exclude=None):
+    with stage('similarity_search'):
+        hits = similarity_index.search(query, k, mode=mode, nprobe=nprobe, exclude=exclude)
+    items = similarity_index.items
+    return {
+        'success': True,
+        'mode': mode,
+        'indexed': len(similarity_index),
+        'results': [{**items[row], 'item': row, 'score': round(score, 4)} for row, score in hits],
+    }
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Inference queue and batching statistics"""
+    return jsonify(stats_payload())
+
+def stats_payload():
+    return {
+        'batching': batcher.stats() if batcher is not None else None,
+        'buffer_pool': buffer_pool.stats() if buffer_pool is not None else None,
+        'cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'near_duplicates': near_duplicate_index.stats() if near_duplicate_index is not None else None,
+        'preprocess_pool': preprocess_pool.stats() if preprocess_pool is not None else None,
+        'backend': backend.describe() if backend is not None else None,
+        'similarity': similarity_index.describe() if similarity_index is not None else None,
+        'inference_benchmark': inference_benchmark
+    }
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics: per-stage latency histograms, request/error counters, in-flight gauges"""
+    body, content_type = render_metrics()
+    return Response(body, headers={'Content-Type': content_type})
+
+@app.route('/api/admin/traces', methods=['GET'])
+def get_traces():
+    """Most recent prediction traces (newest first); requires the X-Admin-Token header"""
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(traces_payload(request.args.get('limit', type=int)))
+
+def admin_authorized(token):
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def traces_payload(limit=None):
+    return {
+        'traces': request_log.traces.recent(limit),
+        'logging': request_log.stats(),
+    }
+
 @app.route('/api/artists', methods=['GET'])
 def get_artists():
     """Get list of all artists the model can recognize"""
-    artists = [clean_artist_name(name) for name in class_names]
-    return jsonify({
-        'artists': sorted(artists),
-        'count': len(artists)
-    })
+    return cached_response(artist_catalog.list_response)
+
+@app.route('/api/artists/<path:name>', methods=['GET'])
+def get_artist(name):
+    """Bio, genre, nationality, painting count and Wikipedia URL for one artist (any spelling of the name)"""
+    cached = artist_catalog.detail_response(name)
+    if cached is None:
+        return jsonify({'error': f'Unknown artist: {name}'}), 404
+    return cached_response(cached)
+
+def cached_response(cached):
+    """Serve a pre-serialized body: 304 on a matching If-None-Match, else the best accepted encoding"""
+    status, body, headers = cached.respond(request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'))
+    return Response(body, status=status, headers=headers)
 
 # --- 5. Server Entry Point ---
 if __name__ == '__main__':
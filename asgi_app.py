@@ -0,0 +1,263 @@
+"""
+ASGI serving mode for the classifier API.
+
+Serves the same routes and response JSON as the Flask app (app.py) on an
+asyncio event loop, so a slow client upload only costs an idle coroutine
+instead of a whole gunicorn thread. Model loading, caching, micro-batching
+and preprocessing are shared with app.py; only the HTTP layer differs.
+
+CPU-bound work (decode, preprocess, waiting for the batched forward pass)
+runs on a bounded thread pool sized to the preallocated batch buffer slots,
+so the event loop never blocks and at most that many uploads are being
+processed at once while any number of connections stay open.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 7860
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import app as core
+from utils.metrics import render as render_metrics, stage, track_requests
+from utils.uploads import UploadRejected, UploadTooLargeError, read_upload
+
+# One thread per batch buffer slot: more would only queue on the slots
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 0)) or core.BATCH_BUFFER_SLOTS
+
+executor = ThreadPoolExecutor(max_workers=ASGI_WORKER_THREADS, thread_name_prefix='asgi-inference')
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+class BodyLimitMiddleware:
+    """
+    Caps request bodies at `max_bytes`: a larger Content-Length gets a 413
+    before anything is read, and a chunked body raises UploadTooLargeError
+    from receive() as soon as it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        length = dict(scope['headers']).get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({'error': 'Request body too large'}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise UploadTooLargeError('Request body too large')
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_file(file):
+    """Sniffed, size-capped bytes of an uploaded file; the spooled temp file is read off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, read_upload, file.file, core.UPLOAD_MAX_BYTES)
+
+
+async def model_unavailable_response():
+    if core.model_progress.ready:
+        return None
+    # Waiting for a loading model blocks, so it goes to the default executor, not the inference pool
+    unavailable = await asyncio.get_running_loop().run_in_executor(None, core.model_unavailable)
+    if unavailable is None:
+        return None
+    status, body, headers = unavailable
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    return JSONResponse(core.health_payload())
+
+
+async def liveness(request):
+    return JSONResponse({'status': 'alive'})
+
+
+async def readiness(request):
+    return JSONResponse(core.readiness_payload(), status_code=200 if core.model_progress.ready else 503)
+
+
+async def loading_progress(request):
+    return JSONResponse(core.model_progress.snapshot())
+
+
+@track_requests('classify')
+async def classify_artwork(request):
+    """Classify an uploaded artwork image"""
+    unavailable = await model_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+
+    try:
+        started = time.perf_counter()
+        # The multipart body is received by the event loop; no thread is held while the client uploads
+        with stage('upload_read'):
+            form = await request.form()
+            file = form.get('image') or form.get('file')
+            filename = getattr(file, 'filename', '') if file is not None else ''
+            data = await read_file(file) if filename else None
+            options = {**request.query_params, **{key: form[key] for key in ('k', 'min_confidence') if key in form}}
+            await form.close()
+        if data is None:
+            return JSONResponse({'error': 'No image file provided'}, status_code=400)
+        try:
+            top_k, min_confidence = core.prediction_options(options)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        probabilities = await run_blocking(core.predict_bytes, data)
+        core.request_log.prediction('classify', filename, len(data), probabilities, core.class_names, started)
+        payload = core.classification_payload(probabilities, top_k, min_confidence)
+        if payload is None:
+            return JSONResponse({'error': 'No predictions generated'}, status_code=500)
+        with stage('serialize'):
+            return JSONResponse(payload)
+
+    except UploadRejected as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status)
+    except Exception as e:
+        core.request_log.error('classification failed', endpoint='classify')
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+@track_requests('similar')
+async def find_similar(request):
+    """Indexed artworks most similar to an uploaded image (POST) or to an indexed artwork (GET ?item=<row>)"""
+    index = core.similarity_index
+    if index is None:
+        return JSONResponse({'error': 'Similarity search is not enabled on this server'}, status_code=503)
+
+    if request.method == 'GET':
+        try:
+            k, mode, nprobe = core.similarity_options(request.query_params)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        row = request.query_params.get('item', '')
+        if not row.isdigit() or int(row) >= len(index):
+            return JSONResponse({'error': f'item must be a row number below {len(index)}'}, status_code=400)
+        payload = await run_blocking(core.similar_payload, index.vector(int(row)), k, mode, nprobe, int(row))
+        return JSONResponse(payload)
+
+    unavailable = await model_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    if not core.embedding_dim:
+        return JSONResponse({'error': 'The loaded model is not returning embeddings'}, status_code=503)
+
+    try:
+        with stage('upload_read'):
+            form = await request.form()
+            file = form.get('image') or form.get('file')
+            data = await read_file(file) if file is not None and getattr(file, 'filename', '') else None
+            options = {**request.query_params, **{key: form[key] for key in ('k', 'mode', 'nprobe') if key in form}}
+            await form.close()
+        if data is None:
+            return JSONResponse({'error': 'No image file provided'}, status_code=400)
+        try:
+            k, mode, nprobe = core.similarity_options(options)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        probabilities, embedding = await run_blocking(core.embed_bytes, data)
+        payload = await run_blocking(core.similar_payload, embedding, k, mode, nprobe)
+        # The classification comes from the same forward pass
+        payload['predictions'] = core.build_predictions(probabilities)
+        with stage('serialize'):
+            return JSONResponse(payload)
+
+    except UploadRejected as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status)
+    except Exception as e:
+        core.request_log.error('similarity search failed', endpoint='similar')
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def get_stats(request):
+    # Stats may query the inference process (INFERENCE_MODE=process), so keep them off the loop
+    stats = await run_blocking(core.stats_payload)
+    stats['asgi'] = {'worker_threads': ASGI_WORKER_THREADS}
+    return JSONResponse(stats)
+
+
+async def metrics(request):
+    body, content_type = render_metrics()
+    return Response(body, headers={'Content-Type': content_type})
+
+
+async def get_traces(request):
+    """Most recent prediction traces (newest first); requires the X-Admin-Token header"""
+    if not core.admin_authorized(request.headers.get('x-admin-token')):
+        return JSONResponse({'error': 'Not found'}, status_code=404)
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        limit = None
+    return JSONResponse(core.traces_payload(limit))
+
+
+def cached_response(request, cached):
+    status, body, headers = cached.respond(request.headers.get('if-none-match'), request.headers.get('accept-encoding'))
+    return Response(body, status_code=status, headers=headers)
+
+
+async def get_artists(request):
+    """Get list of all artists the model can recognize"""
+    return cached_response(request, core.artist_catalog.list_response)
+
+
+async def get_artist(request):
+    """Bio, genre, nationality, painting count and Wikipedia URL for one artist (any spelling of the name)"""
+    name = request.path_params['name']
+    cached = core.artist_catalog.detail_response(name)
+    if cached is None:
+        return JSONResponse({'error': f'Unknown artist: {name}'}, status_code=404)
+    return cached_response(request, cached)
+
+
+app = Starlette(
+    routes=[
+        Route('/', health_check, methods=['GET']),
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/live', liveness, methods=['GET']),
+        Route('/api/ready', readiness, methods=['GET']),
+        Route('/api/loading', loading_progress, methods=['GET']),
+        Route('/predict', classify_artwork, methods=['POST']),
+        Route('/api/classify', classify_artwork, methods=['POST']),
+        Route('/api/similar', find_similar, methods=['GET', 'POST']),
+        Route('/api/stats', get_stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/api/admin/traces', get_traces, methods=['GET']),
+        Route('/api/artists', get_artists, methods=['GET']),
+        Route('/api/artists/{name:path}', get_artist, methods=['GET']),
+    ],
+    middleware=[
+        # Same policy as flask_cors in app.py
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'], allow_credentials=True),
+        Middleware(BodyLimitMiddleware, max_bytes=core.UPLOAD_MAX_BYTES + core.MULTIPART_OVERHEAD),
+    ],
+)
@@ -0,0 +1,245 @@
+"""
+WSGI (gunicorn) vs ASGI (uvicorn) Serving Benchmark
+===================================================
+Starts each deployment pinned to the same CPUs, waits for /api/ready, then:
+
+1. Opens --slow-clients connections that upload an image very slowly
+   (a few hundred bytes per second), like mobile clients on a bad network
+2. While they are trickling, runs --requests normal /api/classify uploads
+   with --concurrency parallel clients and measures their latency
+
+For each mode it reports throughput, p50/p95/p99 latency and errors of the
+normal requests, how many slow uploads were still being held open, and the
+RSS of the whole server process tree.
+
+Both servers run from the repository root: `gunicorn app:app` (gthread
+workers, as in the Dockerfile) and `uvicorn asgi_app:app`, with the
+prediction cache and near-duplicate lookup disabled so every request runs
+inference.
+
+Usage:
+    python benchmark_asgi.py [--cpus 0,1] [--workers 1] [--threads 8]
+                             [--slow-clients 200] [--requests 300] [--concurrency 16]
+"""
+
+import os
+import sys
+import time
+import uuid
+import signal
+import asyncio
+import argparse
+import subprocess
+import urllib.request
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SAMPLE_IMAGE = os.path.join(REPO_DIR, 'public', 'starry-night.jpg')
+
+
+def server_command(mode, port, workers, threads):
+    if mode == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers), '--threads', str(threads), '--timeout', '120']
+    return [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--log-level', 'warning']
+
+
+def start_server(mode, port, workers, threads, cpus):
+    return subprocess.Popen(
+        server_command(mode, port, workers, threads),
+        cwd=REPO_DIR,
+        # Every request sends the same image: without this, all but the first would be cache hits
+        env={**os.environ, 'CACHE_ENABLED': '0', 'PHASH_ENABLED': '0', 'NEAR_DUP_ENABLED': '0'},
+        # Equal CPU budget for both deployments
+        preexec_fn=lambda: os.sched_setaffinity(0, cpus),
+        start_new_session=True,
+    )
+
+
+def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(1)
+    return False
+
+
+def tree_rss_mb(pid):
+    """RSS of a process and all its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+def multipart(image_bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="image.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + image_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def request_head(port, length, content_type):
+    return (
+        f'POST /api/classify HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: {content_type}\r\n'
+        f'Content-Length: {length}\r\nConnection: close\r\n\r\n'
+    ).encode()
+
+
+async def classify(port, body, content_type, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(request_head(port, len(body), content_type) + body)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def slow_upload(port, body, content_type, bytes_per_second, stop, open_counter):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    open_counter[0] += 1
+    try:
+        writer.write(request_head(port, len(body), content_type))
+        sent = 0
+        while not stop.is_set() and sent < len(body):
+            writer.write(body[sent:sent + bytes_per_second])
+            await writer.drain()
+            sent += bytes_per_second
+            try:
+                await asyncio.wait_for(stop.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+    except OSError:
+        pass
+    finally:
+        open_counter[0] -= 1
+        writer.close()
+
+
+async def run_load(port, args, image_bytes):
+    body, content_type = multipart(image_bytes)
+    stop = asyncio.Event()
+    open_slow = [0]
+    slow_tasks = [
+        asyncio.create_task(slow_upload(port, body, content_type, args.slow_rate, stop, open_slow))
+        for _ in range(args.slow_clients)
+    ]
+    # Let the slow clients connect and start occupying the server
+    await asyncio.sleep(2)
+    held_open = open_slow[0]
+
+    latencies, errors = [], 0
+    remaining = iter(range(args.requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await classify(port, body, content_type, args.timeout)
+                if status != 200:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+    return latencies, errors, elapsed, held_open
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=['gunicorn', 'uvicorn'], default=['gunicorn', 'uvicorn'])
+    parser.add_argument('--cpus', default='0,1', help='CPU ids both servers are pinned to')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--slow-clients', type=int, default=200, help='concurrent slow uploads')
+    parser.add_argument('--slow-rate', type=int, default=512, help='bytes/second per slow upload')
+    parser.add_argument('--requests', type=int, default=300, help='normal requests to time')
+    parser.add_argument('--concurrency', type=int, default=16, help='parallel normal clients')
+    parser.add_argument('--timeout', type=float, default=60, help='per-request timeout (s)')
+    parser.add_argument('--image', default=SAMPLE_IMAGE, help='image to upload')
+    parser.add_argument('--port', type=int, default=18080, help='first port to use')
+    parser.add_argument('--ready-timeout', type=float, default=600, help='seconds to wait for /api/ready')
+    args = parser.parse_args()
+
+    cpus = {int(c) for c in args.cpus.split(',')}
+    with open(args.image, 'rb') as f:
+        image_bytes = f.read()
+
+    results = {}
+    for offset, mode in enumerate(args.modes):
+        port = args.port + offset
+        print(f"\n🚀 Starting {mode} on port {port} (CPUs {sorted(cpus)}, {args.workers} worker(s))")
+        server = start_server(mode, port, args.workers, args.threads, cpus)
+        try:
+            if not wait_ready(port, args.ready_timeout):
+                print(f"❌ {mode} did not become ready")
+                continue
+            idle_rss = tree_rss_mb(server.pid)
+            latencies, errors, elapsed, held_open = asyncio.run(run_load(port, args, image_bytes))
+            results[mode] = {
+                'throughput': len(latencies) / elapsed if elapsed else 0.0,
+                'latencies': np.array(latencies) if latencies else np.zeros(1),
+                'errors': errors,
+                'held_open': held_open,
+                'idle_rss': idle_rss,
+                'loaded_rss': tree_rss_mb(server.pid),
+            }
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+
+    print("\n" + "="*86)
+    print(f"SERVING BENCHMARK ({args.slow_clients} slow uploads at {args.slow_rate} B/s, "
+          f"{args.requests} requests x{args.concurrency})")
+    print("="*86)
+    print(f"{'Mode':<10} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} "
+          f"{'slow held':>10} {'RSS idle':>9} {'RSS load':>9}")
+    print("-"*86)
+    for mode, r in results.items():
+        p50, p95, p99 = np.percentile(r['latencies'], [50, 95, 99])
+        print(f"{mode:<10} {r['throughput']:>8.1f} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {r['errors']:>7} "
+              f"{r['held_open']:>10} {r['idle_rss']:>8.0f}M {r['loaded_rss']:>8.0f}M")
+    print("="*86 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Batch Buffer Copy Benchmark
+===========================
+Counts the array copies made per image between "resized PIL image" and
+"batch handed to the model", comparing:
+
+1. The original path: np.array -> .astype('float32') -> np.expand_dims ->
+   np.stack into a batch -> pad with zeros up to the traced batch size
+2. The pooled path: preprocess_into() writes uint8 pixels straight into a
+   BatchBufferPool slot, and the batch is a slice of the pool
+
+Allocations are measured with tracemalloc (NumPy reports its buffers to it),
+so PIL's own decode/resize memory - identical in both paths - is excluded.
+
+Usage:
+    python benchmark_buffers.py [--batch N] [--bucket N] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.buffer_pool import BatchBufferPool
+from utils.preprocessing import IMG_SIZE, preprocess_pixels, reduce_for_resize
+
+SAMPLE_IMAGE = os.path.join(REPO_DIR, 'public', 'starry-night.jpg')
+# Allocations smaller than a tenth of a uint8 image are array headers, not pixel copies
+COPY_THRESHOLD = IMG_SIZE * IMG_SIZE * 3 // 10
+
+
+def resized(image):
+    """The part both paths share: decode + reduce + RGB + resize"""
+    image = reduce_for_resize(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image.resize((IMG_SIZE, IMG_SIZE))
+
+
+def allocated(fn):
+    """Run fn() and return (result, bytes newly allocated at its peak)"""
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    return result, max(0, peak - before)
+
+
+def original_path(images, bucket):
+    stages = {'np.array(image)': 0, ".astype('float32')": 0, 'np.expand_dims': 0, 'np.stack': 0, 'pad to bucket': 0}
+    arrays = []
+    for image in images:
+        pixels, size = allocated(lambda: np.array(image))
+        stages['np.array(image)'] += size
+        as_float, size = allocated(lambda: pixels.astype('float32'))
+        stages[".astype('float32')"] += size
+        expanded, size = allocated(lambda: np.expand_dims(as_float, axis=0))
+        stages['np.expand_dims'] += size
+        arrays.append(expanded[0])
+    batch, size = allocated(lambda: np.stack(arrays))
+    stages['np.stack'] += size
+    if len(batch) < bucket:
+        padding = np.zeros((bucket - len(batch),) + batch.shape[1:], dtype=batch.dtype)
+        batch, size = allocated(lambda: np.concatenate([batch, padding]))
+        stages['pad to bucket'] += size
+    return batch, stages
+
+
+def pooled_path(images, pool):
+    stages = {'np.asarray(image)': 0, 'write into slot': 0, 'batch from pool': 0}
+    slots = []
+    for image in images:
+        slot = pool.acquire()
+        slots.append(slot)
+        pixels, size = allocated(lambda: preprocess_pixels(image))
+        stages['np.asarray(image)'] += size
+        _, size = allocated(lambda: np.copyto(pool.view(slot), pixels, casting='unsafe'))
+        stages['write into slot'] += size
+    batch, size = allocated(lambda: pool.gather(slots))
+    stages['batch from pool'] += size
+    for slot in slots:
+        pool.release(slot)
+    return batch, stages
+
+
+def print_stages(title, stages, count):
+    print(f"\n{title}")
+    print("-"*70)
+    total = 0
+    for name, size in stages.items():
+        total += size
+        marker = 'copy' if size / count >= COPY_THRESHOLD else 'no copy'
+        print(f"  {name:<24} {size / count / 1024:>10.1f} KB/image   {marker}")
+    print(f"  {'TOTAL':<24} {total / count / 1024:>10.1f} KB/image")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', type=int, default=3, help='images per batch')
+    parser.add_argument('--bucket', type=int, default=4, help='traced batch size the batch is padded to')
+    parser.add_argument('--repeat', type=int, default=50, help='timing repetitions')
+    args = parser.parse_args()
+
+    source = Image.open(SAMPLE_IMAGE)
+    images = [resized(source.copy()) for _ in range(args.batch)]
+    pool = BatchBufferPool(4 * args.bucket, (IMG_SIZE, IMG_SIZE, 3))
+
+    tracemalloc.start()
+    original_batch, original_stages = original_path(images, args.bucket)
+    pooled_batch, pooled_stages = pooled_path(images, pool)
+    tracemalloc.stop()
+
+    assert np.array_equal(original_batch[:args.batch], pooled_batch.astype('float32')), "Paths disagree!"
+
+    print("="*70)
+    print(f"BATCH BUFFER COPY BENCHMARK ({args.batch} images, bucket {args.bucket})")
+    print("="*70)
+    original_total = print_stages("ORIGINAL PATH", original_stages, args.batch)
+    pooled_total = print_stages("POOLED PATH", pooled_stages, args.batch)
+
+    original_copies = sum(1 for size in original_stages.values() if size / args.batch >= COPY_THRESHOLD)
+    pooled_copies = sum(1 for size in pooled_stages.values() if size / args.batch >= COPY_THRESHOLD)
+
+    # Timing (without tracemalloc overhead)
+    def _time(fn):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        return (time.perf_counter() - started) * 1000 / args.repeat / args.batch
+
+    original_ms = _time(lambda: original_path(images, args.bucket))
+    pooled_ms = _time(lambda: pooled_path(images, pool))
+
+    print("\n" + "="*70)
+    print("📊 SUMMARY (per image)")
+    print(f"   Allocating copies: {original_copies} -> {pooled_copies} "
+          f"({original_copies - pooled_copies} eliminated)")
+    print(f"   Bytes allocated:   {original_total / args.batch / 1024:.1f} KB -> "
+          f"{pooled_total / args.batch / 1024:.1f} KB")
+    print(f"   Time:              {original_ms:.3f} ms -> {pooled_ms:.3f} ms")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Reduced-Resolution Decode Benchmark & Parity Check
+===================================================
+Compares the original preprocessing path (full-resolution decode, then
+resize to 224x224) with the fast path in utils/preprocessing.py (JPEG
+draft-mode DCT scaling + integer reduce(), then resize).
+
+For every image it reports:
+1. Decode+preprocess time for both paths (and ms saved per megapixel)
+2. Peak RSS of a fresh process running each path
+3. Pixel difference between the two 224x224 inputs
+4. Top-1 / top-5 agreement of the model on both inputs (if the model is available)
+
+Usage:
+    python benchmark_decode.py [image_or_folder ...] [--synthetic] [--repeat N] [--model PATH]
+
+Examples:
+    python benchmark_decode.py ../../public
+    python benchmark_decode.py --synthetic        # adds 12 MP and 24 MP JPEGs
+"""
+
+import os
+import sys
+import time
+import argparse
+import shutil
+import resource
+import tempfile
+import multiprocessing as mp
+import numpy as np
+from io import BytesIO
+from PIL import Image
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.preprocessing import IMG_SIZE, open_image, preprocess_image
+
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+
+def baseline_preprocess(data):
+    """The original app.py path: full decode at native resolution, then resize"""
+    image = Image.open(BytesIO(data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((IMG_SIZE, IMG_SIZE))
+    img_array = np.array(image).astype('float32')
+    return np.expand_dims(img_array, axis=0)
+
+
+def fast_preprocess(data):
+    """The draft-mode path now used by the server"""
+    return preprocess_image(open_image(data))
+
+
+PATHS = {'baseline': baseline_preprocess, 'fast': fast_preprocess}
+
+
+def _peak_rss_kb():
+    """
+    Peak resident set size of this process in KB. On Linux VmHWM is used
+    because ru_maxrss survives exec() and would report the parent's peak.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _rss_worker(path_name, image_path, queue):
+    """Run one path in a fresh process and report its peak RSS growth (KB)"""
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    before = _peak_rss_kb()
+    PATHS[path_name](data)
+    queue.put(_peak_rss_kb() - before)
+
+
+def measure_peak_rss_mb(path_name, image_path):
+    """Peak RSS growth caused by one decode, measured in an isolated process"""
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_rss_worker, args=(path_name, image_path, queue))
+    proc.start()
+    growth_kb = queue.get()
+    proc.join()
+    return growth_kb / 1024
+
+
+def time_path(fn, data, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(data)
+        samples.append((time.perf_counter() - started) * 1000)
+    return float(np.median(samples)), result
+
+
+def make_synthetic_images(directory):
+    """Upscale a bundled painting to typical phone-photo resolutions"""
+    source = Image.open(os.path.join(REPO_DIR, 'public', 'starry-night.jpg')).convert('RGB')
+    paths = []
+    for megapixels, size in ((12, (4032, 3024)), (24, (5664, 4248))):
+        path = os.path.join(directory, f'synthetic_{megapixels}mp.jpg')
+        source.resize(size, Image.Resampling.BICUBIC).save(path, 'JPEG', quality=92)
+        paths.append(path)
+    return paths
+
+
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        paths.append(os.path.join(root, name))
+        elif os.path.exists(item):
+            paths.append(item)
+    return paths
+
+
+def load_model(model_path=MODEL_PATH):
+    """Load the classifier if TensorFlow and the model file are available"""
+    if not os.path.exists(model_path):
+        print(f"ℹ️  Model not found at {model_path} - skipping prediction parity")
+        return None
+    try:
+        import tensorflow as tf
+    except ImportError:
+        print("ℹ️  TensorFlow not installed - skipping prediction parity")
+        return None
+    print(f"Loading model from: {model_path}")
+    return tf.keras.models.load_model(model_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', default=[os.path.join(REPO_DIR, 'public')])
+    parser.add_argument('--model', default=MODEL_PATH, help='Keras model for the top-5 parity check')
+    parser.add_argument('--synthetic', action='store_true', help='add generated 12 MP / 24 MP JPEGs')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions per image')
+    parser.add_argument('--no-rss', action='store_true', help='skip per-process RSS measurement')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='kala-decode-')
+    paths = collect_images(args.inputs)
+    if args.synthetic:
+        paths += make_synthetic_images(tmp_dir)
+    if not paths:
+        print("❌ No images found")
+        sys.exit(1)
+
+    model = load_model(args.model)
+
+    print("\n" + "="*100)
+    print("REDUCED-RESOLUTION DECODE BENCHMARK")
+    print("="*100)
+    print(f"{'Image':<32} {'MP':>6} {'base ms':>9} {'fast ms':>9} {'ms/MP saved':>12} "
+          f"{'base RSS':>9} {'fast RSS':>9} {'pix diff':>9} {'top5':>5}")
+    print("-"*100)
+
+    totals = {'megapixels': 0.0, 'saved_ms': 0.0, 'saved_rss': 0.0, 'top1_agree': 0, 'top5_agree': 0, 'compared': 0}
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        with Image.open(path) as probe:
+            megapixels = probe.width * probe.height / 1e6
+
+        base_ms, base_array = time_path(baseline_preprocess, data, args.repeat)
+        fast_ms, fast_array = time_path(fast_preprocess, data, args.repeat)
+        pixel_diff = float(np.mean(np.abs(base_array - fast_array)))
+
+        if args.no_rss:
+            base_rss = fast_rss = float('nan')
+        else:
+            base_rss = measure_peak_rss_mb('baseline', path)
+            fast_rss = measure_peak_rss_mb('fast', path)
+            totals['saved_rss'] += base_rss - fast_rss
+
+        top5_flag = '-'
+        if model is not None:
+            probs = model.predict(np.concatenate([base_array, fast_array]), verbose=0)
+            base_top5 = np.argsort(probs[0])[::-1][:5]
+            fast_top5 = np.argsort(probs[1])[::-1][:5]
+            top1_same = base_top5[0] == fast_top5[0]
+            top5_same = set(base_top5) == set(fast_top5)
+            totals['top1_agree'] += int(top1_same)
+            totals['top5_agree'] += int(top5_same)
+            totals['compared'] += 1
+            top5_flag = '✅' if top1_same and top5_same else ('~' if top1_same else '❌')
+
+        totals['megapixels'] += megapixels
+        totals['saved_ms'] += base_ms - fast_ms
+        print(f"{os.path.basename(path)[:32]:<32} {megapixels:>6.1f} {base_ms:>9.2f} {fast_ms:>9.2f} "
+              f"{(base_ms - fast_ms) / megapixels:>12.2f} {base_rss:>8.1f}M {fast_rss:>8.1f}M "
+              f"{pixel_diff:>9.2f} {top5_flag:>5}")
+
+    print("-"*100)
+    print(f"\n📊 SUMMARY ({len(paths)} images, {totals['megapixels']:.1f} MP total)")
+    print(f"   Time saved per megapixel: {totals['saved_ms'] / totals['megapixels']:.2f} ms")
+    if not args.no_rss:
+        print(f"   Peak RSS saved per megapixel: {totals['saved_rss'] / totals['megapixels']:.2f} MB")
+    if totals['compared']:
+        print(f"   Top-1 agreement: {totals['top1_agree']}/{totals['compared']}")
+        print(f"   Top-5 set agreement: {totals['top5_agree']}/{totals['compared']}")
+    print("="*100 + "\n")
+
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ Usage:
     2. Record the index → artist pairs
     3. Edit the KNOWN_MAPPINGS below
     4. Run this script to generate corrected_class_names.json
+
+solve_label_mapping.py does all of this in one run from a folder of labelled
+images, and reports how confident each index is.
 """
 
 import os
@@ -0,0 +1,125 @@
+"""
+Similar-Artwork Index Builder
+=============================
+Runs gallery images through art_artist_classifier.keras and stores each
+image's penultimate-layer embedding in the on-disk index served by
+/api/similar (see utils/similarity.py). The same forward pass also gives the
+predicted artist, which is saved with every item.
+
+By default the index is appended to: images already in it (same path) are
+skipped, so adding a new folder doesn't re-embed the whole gallery. Pass
+--rebuild to start from scratch (required after a model change).
+
+For large galleries pass --ivf-lists to train an IVF coarse quantizer
+(around sqrt(N) lists is a good start); later appends are assigned to the
+existing lists without retraining. Re-run with --train-ivf alone to refresh
+the lists after the gallery has grown a lot.
+
+Usage:
+    python build_similarity_index.py [inputs ...] [--index PATH] [--model PATH]
+                                     [--batch-size 16] [--rebuild] [--ivf-lists N]
+
+Examples:
+    python build_similarity_index.py                                  # public/artists
+    python build_similarity_index.py ../../public /data/corpus --ivf-lists 256
+    python build_similarity_index.py --train-ivf 512                  # retrain lists only
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.image_folder import list_images, load_batch
+from utils.inference import KerasBackend
+from utils.labels import LabelRegistry
+from utils.model_loader import model_version
+from utils.similarity import DEFAULT_INDEX_DIR, SimilarityIndex
+
+PUBLIC_DIR = os.path.join(REPO_DIR, 'public')
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+INDEX_PATH = os.path.join(REPO_DIR, DEFAULT_INDEX_DIR)
+GALLERY = [os.path.join(PUBLIC_DIR, 'artists')]
+
+
+def describe_item(path, probabilities, labels):
+    """Metadata stored with each vector and returned by /api/similar"""
+    path = os.path.abspath(path)
+    top = int(np.argmax(probabilities))
+    item = {
+        'path': os.path.relpath(path, REPO_DIR),
+        'name': os.path.splitext(os.path.basename(path))[0].replace('_', ' '),
+        'predicted_artist': labels.display_names[top],
+        'confidence': round(float(probabilities[top]), 4),
+    }
+    if path.startswith(PUBLIC_DIR + os.sep):
+        # Served by the frontend as a static file
+        item['url'] = '/' + os.path.relpath(path, PUBLIC_DIR).replace(os.sep, '/')
+    return item
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', default=GALLERY, help='image files or folders (default: public/artists)')
+    parser.add_argument('--index', default=INDEX_PATH, help='index directory')
+    parser.add_argument('--model', default=MODEL_PATH, help='Keras model')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--rebuild', action='store_true', help='discard the existing index first')
+    parser.add_argument('--ivf-lists', type=int, default=0, help='train IVF with this many lists after adding')
+    parser.add_argument('--train-ivf', type=int, metavar='LISTS', help='only (re)train IVF on the existing index')
+    args = parser.parse_args()
+
+    if args.train_ivf:
+        index = SimilarityIndex(args.index)
+        started = time.perf_counter()
+        index.train_ivf(args.train_ivf)
+        print(f"✅ Trained {index.ivf_lists} IVF lists over {len(index)} vectors in {time.perf_counter() - started:.1f}s")
+        return
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found at {args.model}")
+        sys.exit(1)
+
+    labels = LabelRegistry.load()
+    print(f"🔄 Loading model from {args.model}...")
+    backend = KerasBackend(args.model, batch_sizes=(args.batch_size,), embeddings=True)
+    labels.validate(backend.output_dim)
+    version = model_version(args.model)
+    print(f"✅ Model loaded ({backend.embedding_dim}-d embeddings)")
+
+    if args.rebuild or not SimilarityIndex.exists(args.index):
+        index = SimilarityIndex.create(args.index, backend.embedding_dim, model_version=version)
+    else:
+        index = SimilarityIndex(args.index)
+        if index.dim != backend.embedding_dim or index.meta.get('model_version') != version:
+            print("❌ The index was built with a different model; re-run with --rebuild")
+            sys.exit(1)
+
+    indexed = {item['path'] for item in index.items}
+    paths = [p for p in list_images(args.inputs) if os.path.relpath(os.path.abspath(p), REPO_DIR) not in indexed]
+    print(f"🖼️  {len(paths)} new images ({len(index)} already indexed)")
+
+    started = time.perf_counter()
+    for start in range(0, len(paths), args.batch_size):
+        chunk = paths[start:start + args.batch_size]
+        outputs = backend.predict(load_batch(chunk))
+        probabilities, embeddings = outputs[:, :backend.output_dim], outputs[:, backend.output_dim:]
+        # Appended batch by batch, so an interrupted run keeps everything before it
+        index.add(embeddings, [describe_item(p, row, labels) for p, row in zip(chunk, probabilities)])
+        print(f"   {min(start + args.batch_size, len(paths))}/{len(paths)}", end='\r')
+    if paths:
+        elapsed = time.perf_counter() - started
+        print(f"✅ Embedded {len(paths)} images in {elapsed:.1f}s ({len(paths) / elapsed:.1f} img/s)")
+
+    if args.ivf_lists:
+        index.train_ivf(args.ivf_lists)
+        print(f"✅ Trained {index.ivf_lists} IVF lists")
+    print(f"💾 Index at {args.index}: {len(index)} artworks, {index.dim}-d, IVF lists: {index.ivf_lists or 'off'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Offline Bulk Classification
+===========================
+Labels large archives of images with one model load, instead of one
+process (and one 244 MB model load) per image like test_inference.py.
+
+Pipeline:
+1. Image paths come from directories (walked in sorted order) and/or a
+   --manifest file (one path per line, or a CSV with a `path` column)
+2. A pool of --workers threads decodes and resizes batches ahead of the
+   model; at most --prefetch batches wait in memory, so memory stays
+   bounded however large the archive is
+3. Each batch goes through the compiled model in one call
+4. Results are appended to --output (JSONL or CSV, by extension) as soon as
+   each batch finishes
+
+The output doubles as the checkpoint: on restart, files already present in
+it are skipped, so a killed run resumes where it stopped (a partially
+written last line is discarded). Unreadable images are recorded with an
+`error` instead of stopping the run.
+
+Usage:
+    python bulk_classify.py INPUT [INPUT ...] --output results.jsonl
+                            [--manifest FILE] [--batch-size 32] [--workers 8]
+                            [--prefetch 4] [--top-k 5] [--backend keras]
+
+Examples:
+    python bulk_classify.py /archive/scans --output labels.jsonl
+    python bulk_classify.py --manifest todo.txt --output labels.csv --backend tflite
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.image_folder import list_images, prefetched_batches
+from utils.inference import load_backend, tflite_path_for
+from utils.labels import LabelRegistry
+
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+
+
+def read_manifest(path):
+    """Paths from a text file (one per line) or a CSV with a `path` column"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            return [row['path'] for row in csv.DictReader(f) if row.get('path')]
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+class ResultWriter:
+    """Append-only JSONL/CSV output that also tells which paths are already done"""
+
+    def __init__(self, path, top_k):
+        self.path = path
+        self.top_k = top_k
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        self.columns = ['path'] + [f'{field}_{i}' for i in range(1, top_k + 1) for field in ('artist', 'confidence')] + ['error']
+        self.done = self._recover()
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._csv = csv.writer(self._file) if self.format == 'csv' else None
+        if self._csv is not None and os.path.getsize(path) == 0:
+            self._csv.writerow(self.columns)
+
+    def _recover(self):
+        """Paths of complete records, read line by line; drops a torn final line left by a killed run"""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, 'r+b') as f:
+            def complete_lines():
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Torn write: cut it off so the next record starts on its own line
+                        f.truncate(f.tell() - len(line))
+                        return
+                    yield line.decode('utf-8')
+
+            if self.format == 'csv':
+                return {row['path'] for row in csv.DictReader(complete_lines())}
+            return {json.loads(line)['path'] for line in complete_lines() if line.strip()}
+
+    def write(self, path, predictions, error=None):
+        if self._csv is not None:
+            cells = []
+            for i in range(self.top_k):
+                p = predictions[i] if i < len(predictions) else None
+                cells += [p['artist'], p['confidence']] if p else ['', '']
+            self._csv.writerow([path] + cells + [error or ''])
+        else:
+            record = {'path': path, 'predictions': predictions}
+            if predictions:
+                record['top_artist'] = predictions[0]['artist']
+                record['top_confidence'] = predictions[0]['confidence']
+            if error:
+                record['error'] = error
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def classify_batch(chunk, batch, errors, backend, labels, writer, top_k):
+    """Run one batch through the model and write its rows; returns the number of unreadable files"""
+    probabilities = backend.predict(batch)
+    for path, row, error in zip(chunk, probabilities, errors):
+        if error:
+            writer.write(path, [], error)
+            continue
+        predictions = [
+            {'artist': p['artist'], 'confidence': round(p['confidence'], 6)}
+            for p in labels.top_k(row, top_k)
+        ]
+        writer.write(path, predictions)
+    return sum(1 for error in errors if error)
+
+
+def report(done, failed, total, elapsed):
+    rate = done / elapsed if elapsed else 0.0
+    eta = (total - done) / rate if rate else 0.0
+    print(f"   {done}/{total} ({done / total * 100:.1f}%)  {rate:.1f} img/s  "
+          f"{failed} unreadable  ETA {eta / 60:.0f} min", end='\r', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='image files or folders')
+    parser.add_argument('--manifest', help='file listing image paths (text, or CSV with a path column)')
+    parser.add_argument('--output', required=True, help='results file (.jsonl or .csv); also the resume checkpoint')
+    parser.add_argument('--model', help='model path (default: the .keras model, or its .tflite for --backend tflite)')
+    parser.add_argument('--backend', choices=['keras', 'tflite'], default='keras')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='decode threads')
+    parser.add_argument('--prefetch', type=int, default=4, help='batches decoded ahead of the model')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--labels', help='JSON list of class names (default: built-in alphabetical list)')
+    parser.add_argument('--sync-every', type=float, default=10, help='seconds between fsyncs of the output')
+    args = parser.parse_args()
+
+    paths = list_images(args.inputs) if args.inputs else []
+    if args.manifest:
+        paths += read_manifest(args.manifest)
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        parser.error('no images given (pass folders/files or --manifest)')
+
+    writer = ResultWriter(args.output, args.top_k)
+    todo = [p for p in paths if p not in writer.done]
+    print(f"🖼️  {len(paths)} images, {len(paths) - len(todo)} already in {args.output}, {len(todo)} to go")
+    if not todo:
+        writer.close()
+        return
+
+    labels = LabelRegistry.load(args.labels)
+    model_path = args.model or (tflite_path_for(MODEL_PATH) if args.backend == 'tflite' else MODEL_PATH)
+    print(f"🔄 Loading {args.backend} model from {model_path}...")
+    backend = load_backend(args.backend, model_path, batch_sizes=(args.batch_size,), num_threads=args.threads)
+    labels.validate(backend.output_dim)
+    print("✅ Model loaded")
+
+    done = failed = 0
+    started = last_report = last_sync = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='decode') as executor:
+        try:
+            for chunk, batch, errors in prefetched_batches(executor, todo, args.batch_size, args.workers, args.prefetch):
+                failed += classify_batch(chunk, batch, errors, backend, labels, writer, args.top_k)
+                done += len(chunk)
+                now = time.perf_counter()
+                if now - last_sync >= args.sync_every:
+                    writer.flush()
+                    last_sync = now
+                if now - last_report >= 2:
+                    report(done, failed, len(todo), now - started)
+                    last_report = now
+        except KeyboardInterrupt:
+            print("\n⏸️  Interrupted; re-run the same command to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    report(done, failed, len(todo), elapsed)
+    print(f"\n✅ {done} images in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.1f} img/s), "
+          f"{failed} unreadable -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Keras -> TFLite Conversion & Equivalence Check
+==============================================
+Converts art_artist_classifier.keras into a .tflite model for the `tflite`
+inference backend (INFERENCE_BACKEND=tflite), then runs both backends over
+sample images and checks that they agree:
+
+1. Top-5 class indices must be identical for every image
+2. The largest absolute probability difference must stay below --max-drift
+
+The script exits with status 1 if either check fails, so it can gate a deploy.
+
+Usage:
+    python convert_tflite.py [--model PATH] [--output PATH] [--images DIR ...]
+                             [--max-drift 1e-3] [--threads N] [--check-only]
+
+Examples:
+    python convert_tflite.py                       # convert + check on public/artists
+    python convert_tflite.py --check-only --images ../../public
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.image_folder import list_images, load_batch
+from utils.inference import KerasBackend, TFLiteBackend, tflite_path_for
+
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+SAMPLE_IMAGES = os.path.join(REPO_DIR, 'public', 'artists')
+
+
+def convert(model_path, output_path):
+    """Convert the Keras model to a float32 TFLite flatbuffer (batch dimension left dynamic)"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    started = time.perf_counter()
+    tflite_model = converter.convert()
+    elapsed = time.perf_counter() - started
+
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+
+    print(f"✅ Converted in {elapsed:.1f}s")
+    print(f"   Keras model:  {os.path.getsize(model_path) / 1e6:.1f} MB")
+    print(f"   TFLite model: {len(tflite_model) / 1e6:.1f} MB -> {output_path}")
+
+
+def top_k(probabilities, k=5):
+    return np.argsort(probabilities, axis=-1)[:, ::-1][:, :k]
+
+
+def check_equivalence(model_path, tflite_path, image_paths, max_drift, threads):
+    batch = load_batch(image_paths)
+    batch_sizes = (1, len(image_paths))
+
+    keras_backend = KerasBackend(model_path, batch_sizes=batch_sizes)
+    tflite_backend = TFLiteBackend(tflite_path, batch_sizes=batch_sizes, num_threads=threads)
+
+    keras_probs = keras_backend.predict(batch)
+    tflite_probs = tflite_backend.predict(batch)
+
+    keras_top5 = top_k(keras_probs)
+    tflite_top5 = top_k(tflite_probs)
+    drift = np.abs(keras_probs - tflite_probs).max(axis=-1)
+
+    print(f"\n{'Image':<40} {'Top-5 match':>12} {'Max drift':>12}")
+    print("-"*66)
+    for path, a, b, d in zip(image_paths, keras_top5, tflite_top5, drift):
+        match = '✅' if np.array_equal(a, b) else '❌'
+        print(f"{os.path.basename(path)[:40]:<40} {match:>12} {d:>12.2e}")
+
+    mismatches = int(sum(not np.array_equal(a, b) for a, b in zip(keras_top5, tflite_top5)))
+    worst = float(drift.max())
+
+    # Single-image latency for both backends (first call excluded)
+    def _latency(backend):
+        backend.predict(batch[:1])
+        samples = []
+        for row in range(len(batch)):
+            started = time.perf_counter()
+            backend.predict(batch[row:row + 1])
+            samples.append((time.perf_counter() - started) * 1000)
+        return float(np.median(samples))
+
+    print("\n" + "="*66)
+    print("📊 SUMMARY")
+    print(f"   Images checked:      {len(image_paths)}")
+    print(f"   Top-5 mismatches:    {mismatches}")
+    print(f"   Max probability drift: {worst:.2e} (limit {max_drift:.0e})")
+    print(f"   Load time:           keras {keras_backend.load_ms:.0f} ms, tflite {tflite_backend.load_ms:.0f} ms")
+    print(f"   Median latency:      keras {_latency(keras_backend):.1f} ms, "
+          f"tflite {_latency(tflite_backend):.1f} ms ({tflite_backend.num_threads} threads)")
+    print("="*66 + "\n")
+
+    return mismatches == 0 and worst <= max_drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=MODEL_PATH, help='Keras model to convert')
+    parser.add_argument('--output', help='TFLite output path (default: next to the model)')
+    parser.add_argument('--images', nargs='+', default=[SAMPLE_IMAGES], help='images or folders for the check')
+    parser.add_argument('--limit', type=int, default=64, help='maximum images to check')
+    parser.add_argument('--max-drift', type=float, default=1e-3, help='largest allowed probability difference')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--check-only', action='store_true', help='skip conversion, only compare')
+    args = parser.parse_args()
+
+    output = args.output or tflite_path_for(args.model)
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    if not args.check_only:
+        convert(args.model, output)
+    elif not os.path.exists(output):
+        print(f"❌ TFLite model not found: {output}")
+        sys.exit(1)
+
+    image_paths = list_images(args.images, limit=args.limit)
+    if not image_paths:
+        print("❌ No sample images found for the equivalence check")
+        sys.exit(1)
+
+    if check_equivalence(args.model, output, image_paths, args.max_drift, args.threads):
+        print("✅ TFLite model is equivalent to the Keras model")
+    else:
+        print("❌ TFLite model diverges from the Keras model")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Model Evaluation Harness
+========================
+Measures how accurate and how fast a model is on a labelled image set,
+rather than only checking label strings like verify_labels.py.
+
+Accuracy pass: <root>/<Artist Name>/ folders (any spelling of the class
+names) are streamed through batched inference with decoding prefetched on
+a thread pool, and accumulated into:
+  - top-1 / top-5 accuracy, overall and per artist
+  - a per-artist confusion matrix and each artist's most common mix-ups
+  - calibration: expected calibration error (ECE) over confidence bins and NLL
+
+Throughput pass: a sample of already-decoded images is timed through the
+model alone at each --throughput-batch-sizes, giving images/sec and per-call
+p50/p95 latency without decode noise.
+
+--json saves everything; --compare prints the deltas against an earlier
+--json result, so two models or preprocessing variants can be diffed.
+
+Usage:
+    python evaluate_model.py ROOT [--model PATH] [--backend keras|tflite] [--labels JSON]
+                             [--batch-size 32] [--throughput-batch-sizes 1,8,32]
+                             [--json results.json] [--compare baseline.json]
+
+Examples:
+    python evaluate_model.py /data/holdout --json keras.json
+    python evaluate_model.py /data/holdout --backend tflite --json tflite.json --compare keras.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.evaluation import EvaluationStats, compare
+from utils.image_folder import decode_batch, prefetched_batches
+from utils.inference import load_backend, tflite_path_for
+from utils.label_mapping import labelled_images
+from utils.labels import LabelRegistry
+from utils.model_loader import model_version
+
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+
+
+def measure_throughput(backend, images, batch_size, rounds=3):
+    """Model-only images/sec and per-call latency at one batch size"""
+    backend.predict(images[:batch_size])  # warm this bucket
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for start in range(0, len(images) - batch_size + 1, batch_size):
+            t0 = time.perf_counter()
+            backend.predict(images[start:start + batch_size])
+            latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        'batch_size': batch_size,
+        'images_per_second': round(len(latencies) * batch_size / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'calls': len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='folder with one sub-folder of images per artist')
+    parser.add_argument('--model', help='model path (default: the .keras model, or its .tflite for --backend tflite)')
+    parser.add_argument('--backend', choices=['keras', 'tflite'], default='keras')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--labels', help='JSON list of class names (default: built-in alphabetical list)')
+    parser.add_argument('--per-artist', type=int, default=None, help='use at most N images per artist')
+    parser.add_argument('--batch-size', type=int, default=32, help='batch size of the accuracy pass')
+    parser.add_argument('--throughput-batch-sizes', default='1,8,32', help='comma-separated; empty to skip')
+    parser.add_argument('--throughput-images', type=int, default=256, help='decoded images used for timing')
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='decode threads')
+    parser.add_argument('--prefetch', type=int, default=4, help='batches decoded ahead of the model')
+    parser.add_argument('--json', help='write the full results here')
+    parser.add_argument('--compare', help='earlier --json result to diff against')
+    args = parser.parse_args()
+
+    sizes = sorted({int(s) for s in args.throughput_batch_sizes.split(',') if s.strip()})
+    labels = LabelRegistry.load(args.labels)
+    images, unknown = labelled_images(args.root, labels.names, args.per_artist)
+    for folder in unknown:
+        print(f"⚠️  Skipping {folder!r}: no class name matches it")
+    paths = [p for name in sorted(images) for p in images[name]]
+    class_ids = {name: i for i, name in enumerate(labels.names)}
+    truth = {p: class_ids[name] for name in images for p in images[name]}
+    if not paths:
+        print(f"❌ No labelled images under {args.root}")
+        sys.exit(1)
+    print(f"🖼️  {len(paths)} images of {len(images)}/{len(labels)} artists")
+
+    model_path = args.model or (tflite_path_for(MODEL_PATH) if args.backend == 'tflite' else MODEL_PATH)
+    print(f"🔄 Loading {args.backend} model from {model_path}...")
+    backend = load_backend(args.backend, model_path, batch_sizes=tuple(sorted({args.batch_size, *sizes})),
+                           num_threads=args.threads)
+    labels.validate(backend.output_dim)
+    print("✅ Model loaded")
+
+    stats = EvaluationStats(labels.display_names.tolist())
+    unreadable = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='decode') as executor:
+        for chunk, batch, errors in prefetched_batches(executor, paths, args.batch_size, args.workers, args.prefetch):
+            ok = np.array([error is None for error in errors])
+            unreadable += [path for path, error in zip(chunk, errors) if error]
+            probabilities = backend.predict(batch)[:, :backend.output_dim]
+            stats.update(probabilities[ok], [truth[p] for p, good in zip(chunk, ok) if good])
+            done = stats.count + len(unreadable)
+            rate = done / (time.perf_counter() - started)
+            print(f"   {done}/{len(paths)}  {rate:.1f} img/s", end='\r', flush=True)
+    elapsed = time.perf_counter() - started
+    if not stats.count:
+        print(f"\n❌ None of the {len(paths)} images could be decoded")
+        sys.exit(1)
+
+    results = {
+        'model': os.path.abspath(model_path),
+        'model_version': model_version(model_path),
+        'backend': args.backend,
+        'labels': args.labels or 'built-in',
+        'dataset': os.path.abspath(args.root),
+        'unreadable': unreadable,
+        'unmatched_folders': unknown,
+        'end_to_end_images_per_second': round(len(paths) / elapsed, 1),
+        **stats.summary(),
+        'throughput': {},
+    }
+
+    if sizes:
+        sample, errors = decode_batch(paths[:max(args.throughput_images, max(sizes))])
+        sample = sample[[error is None for error in errors]]
+        for size in sizes:
+            if len(sample) >= size:
+                results['throughput'][str(size)] = measure_throughput(backend, sample, size)
+
+    print("\n" + "=" * 60)
+    print(f"📊 {results['images']} images ({len(unreadable)} unreadable)")
+    print(f"   Top-1: {results['top1']:.2%}   Top-5: {results['top5']:.2%}   "
+          f"ECE: {results['ece']:.4f}   NLL: {results['nll']:.3f}")
+    worst = sorted(((row['top1'], name) for name, row in results['per_class'].items() if row['images']))[:5]
+    print("\n   Weakest artists (top-1):")
+    for accuracy, name in worst:
+        mixups = ', '.join(f"{other} x{n}" for other, n in results['per_class'][name]['confused_with'].items())
+        print(f"     {name:<28} {accuracy:.0%}" + (f"  (confused with {mixups})" if mixups else ''))
+    print(f"\n   End to end (decode + inference): {results['end_to_end_images_per_second']} img/s")
+    for size, row in results['throughput'].items():
+        print(f"   Batch {size:>3}: {row['images_per_second']:>8.1f} img/s   "
+              f"p50 {row['p50_ms']:.1f} ms   p95 {row['p95_ms']:.1f} ms")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            delta = compare(results, json.load(f))
+        results['compared_to'] = {'path': os.path.abspath(args.compare), **delta}
+        print(f"\n   Versus {args.compare}:")
+        for key, value in delta['overall'].items():
+            print(f"     {key:<5} {value:+.4f}")
+        for size, value in delta['images_per_second'].items():
+            print(f"     batch {size} img/s {value:+.1f}")
+        changed = sorted(delta['per_class_top1'].items(), key=lambda item: item[1])
+        if changed:
+            print(f"     {len(changed)} artists changed top-1; largest drop: {changed[0][0]} {changed[0][1]:+.2%}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Results saved to {args.json}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
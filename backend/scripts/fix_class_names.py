@@ -6,7 +6,7 @@ import csv
 
 # Read artists.csv and extract names in ID order
 artists = []
-with open('public/data/artists.csv', 'r', encoding='utf-8') as f:
+with open('data/artists.csv', 'r', encoding='utf-8') as f:
     reader = csv.DictReader(f)
     for row in reader:
         artists.append({
@@ -2,7 +2,7 @@ import csv
 import json
 
 # Read the CSV file
-with open('public/data/artists.csv', 'r', encoding='utf-8') as f:
+with open('data/artists.csv', 'r', encoding='utf-8') as f:
     reader = csv.DictReader(f)
     artists = [row['name'] for row in reader]
 
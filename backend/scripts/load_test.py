@@ -0,0 +1,377 @@
+"""
+Classification API Load Test
+============================
+Drives POST /api/classify on a running server and reports how many
+classifications per second it sustains and at what latency.
+
+The request corpus is generated in memory (no network, no dataset needed):
+noise/gradient images of varied sizes in JPEG, PNG and WebP, including
+RGBA and greyscale variants, so decode and resize costs match real uploads
+rather than one cached image.
+
+Two load models:
+
+  closed  --concurrency clients each send a request as soon as their
+          previous one finished (measures capacity; latency is optimistic
+          once the server saturates)
+  open    requests arrive as a Poisson process at --rate requests/s no
+          matter how the server is doing; latency is measured from the
+          scheduled arrival time, so queueing delay is not hidden
+
+--sweep runs the closed loop at each concurrency level and reports the
+saturation point: the level after which throughput stops improving by more
+than --knee percent (or p99 exceeds --slo-ms).
+
+Start a server first (e.g. `python app.py`, or `gunicorn app:app`), or let
+the script start one with --serve. Everything runs against localhost.
+--serve starts it with the prediction cache and near-duplicate lookup off,
+since the corpus repeats; each run also reports the share of requests
+/api/stats counted as cache hits, so numbers from a cached server are
+flagged rather than mistaken for model throughput.
+
+Usage:
+    python load_test.py [--url http://127.0.0.1:7860] [--mode closed] [--concurrency 8]
+                        [--duration 30] [--json results.json]
+    python load_test.py --mode open --rate 50 --duration 60
+    python load_test.py --sweep 1,2,4,8,16,32 --duration 20
+    python load_test.py --serve gunicorn --sweep 1,4,16
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import signal
+import asyncio
+import argparse
+import subprocess
+import urllib.parse
+import urllib.request
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (format, mode, content type) combinations the corpus cycles through
+VARIANTS = [
+    ('JPEG', 'RGB', 'image/jpeg'),
+    ('JPEG', 'L', 'image/jpeg'),
+    ('PNG', 'RGB', 'image/png'),
+    ('PNG', 'RGBA', 'image/png'),
+    ('PNG', 'L', 'image/png'),
+    ('WEBP', 'RGB', 'image/webp'),
+    ('WEBP', 'RGBA', 'image/webp'),
+]
+SIZES = [(160, 120), (224, 224), (512, 384), (800, 600), (1024, 1024), (1920, 1080), (3000, 2000)]
+
+
+def generate_image(rng, size, mode):
+    """Smooth gradient plus noise: compresses like a photo, unlike pure noise"""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    channels = []
+    for _ in range(4 if mode == 'RGBA' else 3):
+        fx, fy, phase = rng.uniform(0.002, 0.02), rng.uniform(0.002, 0.02), rng.uniform(0, np.pi)
+        channel = 127 + 90 * np.sin(x * fx + y * fy + phase) + rng.normal(0, 20, (height, width))
+        channels.append(np.clip(channel, 0, 255).astype(np.uint8))
+    image = Image.fromarray(np.stack(channels, axis=-1), 'RGBA' if mode == 'RGBA' else 'RGB')
+    return image.convert('L') if mode == 'L' else image
+
+
+def build_corpus(count, seed=0):
+    """`count` encoded images cycling through every format/mode and size"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        fmt, mode, content_type = VARIANTS[i % len(VARIANTS)]
+        size = SIZES[(i // len(VARIANTS) + i) % len(SIZES)]
+        buffer = BytesIO()
+        generate_image(rng, size, mode).save(buffer, format=fmt, quality=85)
+        name = f"load_{i:03d}_{size[0]}x{size[1]}_{mode}.{fmt.lower()}"
+        corpus.append((name, content_type, buffer.getvalue()))
+    return corpus
+
+
+def multipart(name, content_type, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{name}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Target:
+    def __init__(self, url):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 80
+        self.base = f'{parsed.scheme or "http"}://{self.host}:{self.port}'
+
+    async def classify(self, body, content_type, timeout):
+        """One request over a fresh connection; returns the HTTP status"""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        try:
+            writer.write((
+                f'POST /api/classify HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+            ).encode() + body)
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            await asyncio.wait_for(reader.read(), timeout)
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = {}
+
+    async def send(self, target, request, timeout, started=None):
+        started = time.perf_counter() if started is None else started
+        try:
+            status = await target.classify(*request, timeout)
+        except asyncio.TimeoutError:
+            self.errors['timeout'] = self.errors.get('timeout', 0) + 1
+            return
+        except (OSError, ValueError, IndexError) as e:
+            key = type(e).__name__
+            self.errors[key] = self.errors.get(key, 0) + 1
+            return
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 200:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+
+    def summary(self, elapsed, **extra):
+        total = sum(self.statuses.values()) + sum(self.errors.values())
+        failed = total - self.statuses.get(200, 0)
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            **extra,
+            'requests': total,
+            'succeeded': self.statuses.get(200, 0),
+            'error_rate': failed / total if total else 0.0,
+            'throughput_rps': self.statuses.get(200, 0) / elapsed if elapsed else 0.0,
+            'latency_ms': {
+                'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                'max': float(latencies.max()), 'mean': float(latencies.mean()),
+            },
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            'errors': self.errors,
+            'elapsed_s': elapsed,
+        }
+
+
+def encode_corpus(corpus):
+    return [multipart(name, content_type, data) for name, content_type, data in corpus]
+
+
+async def closed_loop(target, requests, concurrency, duration, timeout):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(sys.maxsize))
+
+    async def client():
+        while time.perf_counter() < deadline:
+            await recorder.send(target, requests[next(counter) % len(requests)], timeout)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return recorder.summary(time.perf_counter() - started, mode='closed', concurrency=concurrency)
+
+
+async def open_loop(target, requests, rate, duration, timeout, max_in_flight, seed=0):
+    recorder = Recorder()
+    rng = random.Random(seed)
+    in_flight = set()
+    shed = 0
+    started = time.perf_counter()
+    scheduled = started
+    i = 0
+    while scheduled < started + duration:
+        scheduled += rng.expovariate(rate)
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        if len(in_flight) >= max_in_flight:
+            # The client can't keep up either; count it instead of silently slowing the arrival rate
+            shed += 1
+            continue
+        task = asyncio.create_task(recorder.send(target, requests[i % len(requests)], timeout, started=scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        i += 1
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    if shed:
+        recorder.errors['client_shed'] = shed
+    return recorder.summary(time.perf_counter() - started, mode='open', rate=rate)
+
+
+def find_saturation(results, knee_percent, slo_ms):
+    """Last concurrency level that still improved throughput by more than knee_percent within the SLO"""
+    best = results[0]
+    for previous, current in zip(results, results[1:]):
+        gain = (current['throughput_rps'] - previous['throughput_rps']) / max(previous['throughput_rps'], 1e-9)
+        if gain * 100 < knee_percent or (slo_ms and current['latency_ms']['p99'] > slo_ms):
+            break
+        best = current
+    return {
+        'concurrency': best['concurrency'],
+        'throughput_rps': best['throughput_rps'],
+        'p99_ms': best['latency_ms']['p99'],
+    }
+
+
+def wait_ready(base, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base}/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(1)
+    return False
+
+
+def start_server(kind, port):
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                   '--threads', '8', '--timeout', '120']
+    elif kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'app.py']
+    # The corpus repeats, so caches would turn most requests into lookups instead of inference
+    env = {**os.environ, 'PORT': str(port), 'CACHE_ENABLED': '0', 'PHASH_ENABLED': '0', 'NEAR_DUP_ENABLED': '0'}
+    return subprocess.Popen(command, cwd=REPO_DIR, env=env, start_new_session=True)
+
+
+def cache_hits(base):
+    """Prediction-cache plus near-duplicate hits so far per /api/stats, or None if unavailable"""
+    try:
+        with urllib.request.urlopen(f'{base}/api/stats', timeout=5) as response:
+            stats = json.load(response)
+    except Exception:
+        return None
+    cache = stats.get('cache') or {}
+    near = stats.get('near_duplicates') or {}
+    return sum((cache.get('hits') or {}).values()) + near.get('hits', 0)
+
+
+def measured(target, coroutine):
+    """Run one load phase and attach how many of its requests the server answered from a cache"""
+    before = cache_hits(target.base)
+    result = asyncio.run(coroutine)
+    after = cache_hits(target.base)
+    if before is None or after is None:
+        result['cache_hit_ratio'] = None
+    else:
+        # With several workers /api/stats reflects whichever one answered, so this is an estimate
+        succeeded = result['succeeded']
+        result['cache_hit_ratio'] = min(1.0, max(0, after - before) / succeeded) if succeeded else 0.0
+    return result
+
+
+def print_table(results, title):
+    print("\n" + "="*100)
+    print(title)
+    print("="*100)
+    print(f"{'Load':<14} {'req':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>8} "
+          f"{'cached':>7}")
+    print("-"*100)
+    for r in results:
+        load = f"c={r['concurrency']}" if r['mode'] == 'closed' else f"{r['rate']:g} req/s"
+        lat = r['latency_ms']
+        cached = '-' if r.get('cache_hit_ratio') is None else f"{r['cache_hit_ratio']*100:.1f}%"
+        print(f"{load:<14} {r['requests']:>6} {r['throughput_rps']:>8.1f} {lat['p50']:>9.1f} {lat['p95']:>9.1f} "
+              f"{lat['p99']:>9.1f} {lat['max']:>9.1f} {r['error_rate']*100:>7.1f}% {cached:>7}")
+        if r['errors'] or set(r['statuses']) - {'200'}:
+            print(f"{'':<14} statuses {r['statuses']} errors {r['errors']}")
+    print("="*100)
+    cached = max((r.get('cache_hit_ratio') or 0.0) for r in results)
+    if cached > 0.05:
+        print(f"⚠️  Up to {cached:.0%} of requests were cache hits: this measures the caches, not inference. "
+              f"Restart the server with CACHE_ENABLED=0 PHASH_ENABLED=0 for model throughput.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:7860', help='server base URL')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed', help='load model')
+    parser.add_argument('--concurrency', type=int, default=8, help='closed loop: parallel clients')
+    parser.add_argument('--rate', type=float, default=20, help='open loop: mean arrivals per second')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='open loop: client-side cap')
+    parser.add_argument('--sweep', help='closed loop at each comma-separated concurrency level')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per run')
+    parser.add_argument('--timeout', type=float, default=60, help='per-request timeout (s)')
+    parser.add_argument('--corpus-size', type=int, default=49, help='generated images to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--knee', type=float, default=5, help='sweep: min %% throughput gain to keep scaling')
+    parser.add_argument('--slo-ms', type=float, default=0, help='sweep: p99 limit for the saturation point')
+    parser.add_argument('--serve', choices=['flask', 'gunicorn', 'uvicorn'], help='start a local server first')
+    parser.add_argument('--ready-timeout', type=float, default=600, help='seconds to wait for /api/ready')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    target = Target(args.url)
+    server = None
+    if args.serve:
+        print(f"🚀 Starting {args.serve} on port {target.port}")
+        server = start_server(args.serve, target.port)
+    try:
+        if not wait_ready(target.base, args.ready_timeout if args.serve else 10):
+            print(f"❌ {target.base}/api/ready did not return 200")
+            sys.exit(1)
+
+        print(f"🎨 Generating {args.corpus_size} images...")
+        corpus = build_corpus(args.corpus_size, args.seed)
+        requests = encode_corpus(corpus)
+        sizes = [len(data) for _, _, data in corpus]
+        print(f"✅ Corpus ready ({min(sizes) // 1024}-{max(sizes) // 1024} KB, "
+              f"{len({c for _, c, _ in corpus})} content types)")
+
+        report = {'url': target.base, 'duration_s': args.duration, 'corpus_size': len(corpus)}
+        if args.sweep:
+            levels = [int(level) for level in args.sweep.split(',')]
+            results = []
+            for level in levels:
+                print(f"⏱️  concurrency {level}...")
+                results.append(measured(target, closed_loop(target, requests, level, args.duration, args.timeout)))
+            report['results'] = results
+            report['saturation'] = find_saturation(results, args.knee, args.slo_ms)
+            print_table(results, f"CONCURRENCY SWEEP ({args.duration:g}s per level)")
+            sat = report['saturation']
+            print(f"📈 Saturation at concurrency {sat['concurrency']}: "
+                  f"{sat['throughput_rps']:.1f} req/s, p99 {sat['p99_ms']:.1f} ms\n")
+        elif args.mode == 'open':
+            result = measured(target, open_loop(target, requests, args.rate, args.duration, args.timeout,
+                                                args.max_in_flight, args.seed))
+            report['results'] = [result]
+            print_table([result], f"OPEN LOOP ({args.rate:g} req/s Poisson, {args.duration:g}s)")
+        else:
+            result = measured(target, closed_loop(target, requests, args.concurrency, args.duration, args.timeout))
+            report['results'] = [result]
+            print_table([result], f"CLOSED LOOP ({args.concurrency} clients, {args.duration:g}s)")
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Results written to {args.json}")
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
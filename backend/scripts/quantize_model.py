@@ -0,0 +1,211 @@
+"""
+Post-Training Quantization with an Accuracy/Latency Gate
+========================================================
+Produces quantized TFLite variants of art_artist_classifier.keras:
+
+- dynamic: dynamic-range quantization (int8 weights, float activations)
+- float16: float16 weights
+- int8:    full-integer quantization, calibrated on a representative dataset
+           from a local image folder (uint8 input, float32 output)
+
+For every variant it reports file size, load time, single-image and batched
+latency, and top-1/top-5 agreement with the float Keras model on a set of
+evaluation images. A variant is only published (written to --output-dir) if
+its agreement meets --min-top1 and --min-top5; otherwise it is discarded and
+the script exits with status 1.
+
+Any published variant can be served with:
+    INFERENCE_BACKEND=tflite TFLITE_MODEL_PATH=<variant>.tflite
+
+Usage:
+    python quantize_model.py [--calibration DIR] [--eval DIR ...]
+                             [--variants dynamic float16 int8]
+                             [--min-top1 0.98] [--min-top5 0.95]
+
+Examples:
+    python quantize_model.py --calibration ~/wikiart-sample --eval ~/wikiart-holdout
+    python quantize_model.py --variants int8 --calibration-limit 300
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import tempfile
+import numpy as np
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.image_folder import list_images, load_batch
+from utils.inference import KerasBackend, TFLiteBackend
+
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+SAMPLE_IMAGES = os.path.join(REPO_DIR, 'public', 'artists')
+VARIANTS = ('dynamic', 'float16', 'int8')
+
+
+def convert(model, variant, calibration_paths):
+    """Return the TFLite flatbuffer for one quantization variant"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variant == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        def representative_dataset():
+            # One image at a time keeps calibration memory flat for large folders
+            for path in calibration_paths:
+                yield [load_batch([path], dtype=np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Pixels are already 0-255, so a uint8 input needs no rescaling on the request path
+        converter.inference_input_type = tf.uint8
+
+    return converter.convert()
+
+
+def agreement(reference, candidate):
+    """Top-1 and top-5 agreement of `candidate` with the float model's predictions"""
+    ref_top1 = reference.argmax(axis=-1)
+    top1 = float(np.mean(candidate.argmax(axis=-1) == ref_top1))
+    cand_top5 = np.argsort(candidate, axis=-1)[:, -5:]
+    # Top-5 agreement: the float model's top-1 appears in the variant's top-5
+    top5 = float(np.mean([label in row for label, row in zip(ref_top1, cand_top5)]))
+    return top1, top5
+
+
+def latency(backend, batch, batch_size, repeat):
+    """Median milliseconds per image at `batch_size` (one untimed warmup call)"""
+    inputs = np.resize(batch, (batch_size,) + batch.shape[1:])
+    backend.predict(inputs)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        backend.predict(inputs)
+        samples.append((time.perf_counter() - started) * 1000 / batch_size)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=MODEL_PATH, help='float Keras model')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--calibration', nargs='+', default=[SAMPLE_IMAGES], help='representative images for int8 calibration')
+    parser.add_argument('--calibration-limit', type=int, default=200, help='maximum calibration images')
+    parser.add_argument('--eval', nargs='+', default=[SAMPLE_IMAGES], help='images used to measure agreement')
+    parser.add_argument('--eval-limit', type=int, default=500, help='maximum evaluation images')
+    parser.add_argument('--min-top1', type=float, default=0.98, help='minimum top-1 agreement to publish')
+    parser.add_argument('--min-top5', type=float, default=0.95, help='minimum top-5 agreement to publish')
+    parser.add_argument('--batch-size', type=int, default=8, help='batch size for the batched latency figure')
+    parser.add_argument('--repeat', type=int, default=20, help='latency repetitions')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--output-dir', default=REPO_DIR, help='where published variants are written')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    calibration_paths = list_images(args.calibration, limit=args.calibration_limit)
+    eval_paths = list_images(args.eval, limit=args.eval_limit)
+    if not eval_paths or ('int8' in args.variants and not calibration_paths):
+        print("❌ No calibration/evaluation images found")
+        sys.exit(1)
+
+    print("="*78)
+    print("POST-TRAINING QUANTIZATION")
+    print("="*78)
+    print(f"Calibration images: {len(calibration_paths)}   Evaluation images: {len(eval_paths)}")
+
+    eval_batch = load_batch(eval_paths)
+    batch_sizes = (1, args.batch_size)
+
+    reference = KerasBackend(args.model, batch_sizes=batch_sizes)
+    reference_probs = reference.predict(eval_batch)
+    results = [{
+        'variant': 'float (keras)',
+        'size_mb': round(os.path.getsize(args.model) / 1e6, 1),
+        'load_ms': reference.load_ms,
+        'single_ms': round(latency(reference, eval_batch, 1, args.repeat), 2),
+        'batched_ms': round(latency(reference, eval_batch, args.batch_size, args.repeat), 2),
+        'top1': 1.0,
+        'top5': 1.0,
+        'published': None,
+    }]
+
+    base_name = os.path.splitext(os.path.basename(args.model))[0]
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for variant in args.variants:
+            print(f"\n🔧 Converting {variant}...")
+            started = time.perf_counter()
+            flatbuffer = convert(reference.model, variant, calibration_paths)
+            print(f"   done in {time.perf_counter() - started:.1f}s")
+
+            candidate_path = os.path.join(workdir, f"{base_name}.{variant}.tflite")
+            with open(candidate_path, 'wb') as f:
+                f.write(flatbuffer)
+
+            backend = TFLiteBackend(candidate_path, batch_sizes=batch_sizes, num_threads=args.threads)
+            top1, top5 = agreement(reference_probs, backend.predict(eval_batch))
+            passed = top1 >= args.min_top1 and top5 >= args.min_top5
+
+            result = {
+                'variant': variant,
+                'size_mb': round(len(flatbuffer) / 1e6, 1),
+                'load_ms': backend.load_ms,
+                'single_ms': round(latency(backend, eval_batch, 1, args.repeat), 2),
+                'batched_ms': round(latency(backend, eval_batch, args.batch_size, args.repeat), 2),
+                'top1': round(top1, 4),
+                'top5': round(top5, 4),
+                'published': None,
+            }
+            if passed:
+                published_path = os.path.join(args.output_dir, os.path.basename(candidate_path))
+                shutil.move(candidate_path, published_path)
+                result['published'] = published_path
+            else:
+                failed = True
+            results.append(result)
+
+    print("\n" + "="*78)
+    print(f"{'Variant':<15} {'Size MB':>8} {'Load ms':>9} {'1-img ms':>9} "
+          f"{f'{args.batch_size}-batch ms/img':>16} {'Top-1':>7} {'Top-5':>7}  Status")
+    print("-"*78)
+    for r in results:
+        if r['published'] is None and r['variant'] != 'float (keras)':
+            status = '❌ rejected'
+        elif r['published']:
+            status = '✅ published'
+        else:
+            status = 'reference'
+        print(f"{r['variant']:<15} {r['size_mb']:>8.1f} {r['load_ms']:>9.0f} {r['single_ms']:>9.2f} "
+              f"{r['batched_ms']:>16.2f} {r['top1']:>7.2%} {r['top5']:>7.2%}  {status}")
+    print("="*78)
+    print(f"Gate: top-1 >= {args.min_top1:.0%}, top-5 >= {args.min_top5:.0%}")
+
+    report_path = os.path.join(args.output_dir, f"{base_name}.quantization.json")
+    with open(report_path, 'w') as f:
+        json.dump({
+            'model': args.model,
+            'calibration_images': len(calibration_paths),
+            'eval_images': len(eval_paths),
+            'min_top1': args.min_top1,
+            'min_top5': args.min_top5,
+            'results': results,
+        }, f, indent=2)
+    print(f"📝 Report written to {report_path}\n")
+
+    if failed:
+        print("❌ One or more variants fell below the agreement gate and were not published")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
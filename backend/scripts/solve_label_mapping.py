@@ -0,0 +1,138 @@
+"""
+Label Mapping Solver
+====================
+Works out which artist each model output index stands for from a folder of
+labelled images, in one run:
+
+1. <root>/<Artist Name>/ holds known works by that artist (any spelling the
+   class names use: "Albrecht_Durer", "Albrecht Dürer", ...)
+2. Every image goes through the model in batches
+3. The index x artist matrix of mean log-probabilities is built with one
+   matrix product
+4. The optimal one-to-one assignment is solved (Hungarian algorithm), so two
+   indices can never claim the same artist the way per-image argmax guesses can
+
+Writes a class_names.json usable as LABELS_PATH, plus a report with each
+index's evidence. An index is flagged ambiguous when it has fewer than
+--min-images images, when fewer than --min-agreement of them pick it as
+top-1, or when its log-prob margin over the runner-up index is below
+--min-margin. Indices with no labelled artist keep the leftover class names
+in alphabetical order and are flagged too.
+
+Replaces the reverse_engineer_labels.py + build_mapping.py round trip.
+
+Usage:
+    python solve_label_mapping.py ROOT [--output PATH] [--report PATH] [--model PATH]
+                                  [--names JSON] [--per-artist N] [--batch-size 32]
+
+Examples:
+    python solve_label_mapping.py /data/labelled --per-artist 20
+    python solve_label_mapping.py /data/labelled --output ../class_names.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.image_folder import load_batch
+from utils.inference import load_backend
+from utils.label_mapping import labelled_images, solve_mapping
+from utils.labels import LabelRegistry, load_class_names
+
+BASE_DIR = os.path.join(REPO_DIR, 'backend')
+MODEL_PATH = os.path.join(REPO_DIR, 'art_artist_classifier.keras')
+OUTPUT_PATH = os.path.join(BASE_DIR, 'corrected_class_names.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='folder with one sub-folder of images per artist')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='class_names.json to write')
+    parser.add_argument('--report', help='per-index evidence JSON (default: next to --output)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--names', help='JSON list of class names to assign (default: built-in alphabetical list)')
+    parser.add_argument('--per-artist', type=int, default=None, help='use at most N images per artist')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--min-images', type=int, default=3)
+    parser.add_argument('--min-agreement', type=float, default=0.5)
+    parser.add_argument('--min-margin', type=float, default=1.0)
+    args = parser.parse_args()
+
+    candidates = load_class_names(args.names)
+    images, unknown = labelled_images(args.root, candidates, args.per_artist)
+    for folder in unknown:
+        print(f"⚠️  Skipping {folder!r}: no class name matches it")
+    if not images:
+        print(f"❌ No labelled images under {args.root}")
+        sys.exit(1)
+    artists = sorted(images)
+    paths = [p for artist in artists for p in images[artist]]
+    artist_ids = np.concatenate([np.full(len(images[a]), i) for i, a in enumerate(artists)])
+    print(f"🖼️  {len(paths)} images of {len(artists)}/{len(candidates)} artists")
+
+    print(f"🔄 Loading model from {args.model}...")
+    backend = load_backend('keras', args.model, batch_sizes=(args.batch_size,))
+    print(f"✅ Model loaded ({backend.output_dim} outputs)")
+
+    started = time.perf_counter()
+    probabilities = np.empty((len(paths), backend.output_dim), dtype=np.float32)
+    for start in range(0, len(paths), args.batch_size):
+        chunk = paths[start:start + args.batch_size]
+        probabilities[start:start + len(chunk)] = backend.predict(load_batch(chunk))[:, :backend.output_dim]
+        print(f"   {start + len(chunk)}/{len(paths)}", end='\r')
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {len(paths)} images in {elapsed:.1f}s ({len(paths) / elapsed:.1f} img/s)")
+
+    mapping = solve_mapping(probabilities, artist_ids, artists, args.min_margin, args.min_agreement, args.min_images)
+
+    # Indices no labelled artist claimed keep the remaining names in alphabetical order
+    leftover = iter(sorted(set(candidates) - {entry['artist'] for entry in mapping}))
+    for entry in mapping:
+        entry['evidence'] = entry['artist'] is not None
+        if entry['artist'] is None:
+            entry['artist'] = next(leftover, None)
+    names = [entry['artist'] for entry in mapping]
+    if None in names:
+        print(f"❌ The model has {len(names)} outputs but only {len(candidates)} class names were given")
+        sys.exit(1)
+    LabelRegistry(names).validate(backend.output_dim)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(names, f, indent=2, ensure_ascii=False)
+    report_path = args.report or os.path.splitext(args.output)[0] + '.report.json'
+    ambiguous = [entry for entry in mapping if entry['ambiguous']]
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': os.path.abspath(args.model),
+            'images': len(paths),
+            'artists_with_images': len(artists),
+            'unmatched_folders': unknown,
+            'ambiguous': [entry['index'] for entry in ambiguous],
+            'indices': mapping,
+        }, f, indent=2, ensure_ascii=False)
+
+    print("\n" + "=" * 60)
+    changed = [entry for entry in mapping if entry['index'] >= len(candidates) or candidates[entry['index']] != entry['artist']]
+    print(f"📊 {len(changed)} indices differ from {'--names' if args.names else 'the built-in list'}")
+    for entry in changed:
+        was = candidates[entry['index']] if entry['index'] < len(candidates) else '-'
+        print(f"   Index {entry['index']:>3}: {was} -> {entry['artist']}")
+    if ambiguous:
+        print(f"\n⚠️  {len(ambiguous)} ambiguous indices (add more images of these artists):")
+        for entry in ambiguous:
+            evidence = (f"{entry['images']} images, agreement {entry['agreement']:.0%}, margin {entry['margin']:.2f}"
+                        if entry['evidence'] else 'no labelled images')
+            print(f"   Index {entry['index']:>3}: {entry['artist']} ({evidence})")
+    print(f"\n✅ Saved {len(names)} class names to {args.output}")
+    print(f"📝 Evidence per index in {report_path}; use the file as LABELS_PATH once nothing is ambiguous")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Upload Memory Test
+==================
+Shows that the upload guards in utils/uploads.py bound the memory a single
+request can take, however hostile the upload.
+
+Each case runs in a fresh process that builds its upload, resets the
+kernel's peak-RSS counter and then handles the upload exactly like the
+server does (sniff + capped read, header check, decode, preprocess). The
+reported peak is what that one request added to the worker's RSS.
+
+Cases: normal 12 MP and 48 MP phone JPEGs, a 64 MP PNG scan, 100 MP and
+400 MP decompression-bomb PNGs (a few hundred KB on the wire), a 200 MB
+body that starts with JPEG magic bytes, and a non-image.
+
+--unguarded runs the same cases through the old path (file.read() +
+Image.open + full decode) for comparison. --url also POSTs every case to a
+running server and checks the status codes (413/415 for the rejected ones);
+add --pid to report that server's RSS before and after.
+
+Usage:
+    python upload_memory_test.py [--max-bytes N] [--max-pixels N] [--unguarded]
+                                 [--url http://localhost:7860] [--pid PID]
+"""
+
+import os
+import sys
+import time
+import argparse
+import urllib.error
+import urllib.request
+import uuid
+import multiprocessing
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Shared helpers live in the repository-level utils/ package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+from utils.preprocessing import open_image, preprocess_pixels
+from utils.uploads import UploadRejected, check_image, read_upload
+
+# Same defaults as app.py
+MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 50_000_000))
+MB = 1024 * 1024
+
+
+class RepeatingStream:
+    """A `size`-byte upload body produced on the fly, so the test itself never holds it"""
+
+    def __init__(self, head, size):
+        self.head = head
+        self.remaining = size
+
+    def read(self, n=-1):
+        if self.remaining <= 0:
+            return b''
+        n = self.remaining if n is None or n < 0 else min(n, self.remaining)
+        chunk = (self.head + b'\0' * max(0, n - len(self.head)))[:n]
+        self.head = b''
+        self.remaining -= n
+        return chunk
+
+
+def _encode(image, fmt, **params):
+    buffer = BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def _photo(width, height):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise: realistic JPEG sizes without a huge array
+    small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+    return _encode(Image.fromarray(small).resize((width, height), Image.BILINEAR), 'JPEG', quality=90)
+
+
+CASES = {
+    'photo-12mp.jpg': lambda: BytesIO(_photo(4000, 3000)),
+    'photo-48mp.jpg': lambda: BytesIO(_photo(8000, 6000)),
+    'scan-64mp.png': lambda: BytesIO(_encode(Image.new('RGB', (8000, 8000), (200, 180, 150)), 'PNG')),
+    'bomb-100mp.png': lambda: BytesIO(_encode(Image.new('L', (10000, 10000)), 'PNG', optimize=True)),
+    'bomb-400mp.png': lambda: BytesIO(_encode(Image.new('L', (20000, 20000)), 'PNG', optimize=True)),
+    'body-200mb.jpg': lambda: RepeatingStream(b'\xff\xd8\xff\xe0', 200 * MB),
+    'not-an-image.exe': lambda: BytesIO(b'MZ\x90\x00' + os.urandom(64 * 1024)),
+}
+
+
+def _status_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak():
+    """Reset VmHWM to the current RSS (Linux 4.0+); False if unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def handle_guarded(stream, max_bytes, max_pixels):
+    data = read_upload(stream, max_bytes)
+    check_image(data, max_pixels)
+    return preprocess_pixels(open_image(data))
+
+
+def handle_unguarded(stream, max_bytes, max_pixels):
+    # What classify_artwork used to do
+    image = Image.open(BytesIO(stream.read()))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image.resize((224, 224)), dtype=np.uint8)
+
+
+def _run_case(name, guarded, max_bytes, max_pixels, results):
+    stream = CASES[name]()
+    handler = handle_guarded if guarded else handle_unguarded
+    baseline = _status_kb('VmRSS')
+    # Without clear_refs the peak also covers building the case, so it over- rather than under-reports
+    _reset_peak()
+    started = time.perf_counter()
+    try:
+        handler(stream, max_bytes, max_pixels)
+        outcome = '200'
+    except UploadRejected as e:
+        outcome = f'{e.status} ({e})'
+    except MemoryError:
+        outcome = 'MemoryError'
+    except Exception as e:
+        outcome = f'{type(e).__name__}'
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = _status_kb('VmHWM')
+    results.put((outcome, max(0, peak - baseline) / 1024, elapsed))
+
+
+def measure(name, guarded, max_bytes, max_pixels):
+    # A fresh interpreter per case, so one case's peak can't hide another's
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(name, guarded, max_bytes, max_pixels, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return f'killed (exit {process.exitcode})', float('nan'), float('nan')
+    return results.get()
+
+
+def post_case(url, name, pid):
+    stream = CASES[name]()
+    data = stream.getvalue() if isinstance(stream, BytesIO) else stream.read()
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{name}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url.rstrip('/') + '/api/classify', data=body, method='POST',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError) as e:
+        # A server that answers 413 early may close the socket mid-upload
+        status = f'closed ({getattr(e, "reason", e)})'
+    return status, (time.perf_counter() - started) * 1000, _server_rss(pid)
+
+
+def _server_rss(pid):
+    if not pid:
+        return None
+    with open(f'/proc/{pid}/status') as f:
+        fields = dict(line.split(':', 1) for line in f if ':' in line)
+    return int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-bytes', type=int, default=MAX_BYTES, help='UPLOAD_MAX_BYTES')
+    parser.add_argument('--max-pixels', type=int, default=MAX_PIXELS, help='UPLOAD_MAX_PIXELS')
+    parser.add_argument('--unguarded', action='store_true', help='also measure the unguarded upload path')
+    parser.add_argument('--url', help='also POST every case to this running server')
+    parser.add_argument('--pid', type=int, help='server process to report RSS for (with --url)')
+    parser.add_argument('--budget-mb', type=float, default=None,
+                        help='fail if a guarded request peaks above this (default: derived from the limits)')
+    args = parser.parse_args()
+
+    # Capped read (chunks + joined copy) + the largest allowed decode (RGBA) + its RGB conversion
+    budget = args.budget_mb or (2 * args.max_bytes + 7 * args.max_pixels) / MB + 32
+    print(f"🧪 Limits: {args.max_bytes / MB:g} MB per upload, {args.max_pixels / 1e6:g} MP decoded "
+          f"(budget {budget:.0f} MB per request)\n")
+
+    modes = [('guarded', True)] + ([('unguarded', False)] if args.unguarded else [])
+    worst = 0.0
+    print(f"   {'case':<18} {'path':<10} {'peak RSS':>10} {'time':>9}  outcome")
+    for name in CASES:
+        for label, guarded in modes:
+            outcome, peak_mb, elapsed = measure(name, guarded, args.max_bytes, args.max_pixels)
+            if guarded and peak_mb == peak_mb:
+                worst = max(worst, peak_mb)
+            print(f"   {name:<18} {label:<10} {peak_mb:>7.1f} MB {elapsed:>6.0f} ms  {outcome}")
+
+    if args.url:
+        print(f"\n🌐 POSTing each case to {args.url}/api/classify")
+        if args.pid:
+            rss, hwm = _server_rss(args.pid)
+            print(f"   server RSS {rss:.0f} MB (peak {hwm:.0f} MB) before")
+        for name in CASES:
+            status, elapsed, rss = post_case(args.url, name, args.pid)
+            server = f"  server RSS {rss[0]:.0f} MB (peak {rss[1]:.0f} MB)" if rss else ''
+            print(f"   {name:<18} {status!s:<8} {elapsed:>6.0f} ms{server}")
+
+    print()
+    if worst > budget:
+        print(f"❌ Worst guarded request peaked at {worst:.1f} MB, over the {budget:.0f} MB budget")
+        sys.exit(1)
+    print(f"✅ Worst guarded request peaked at {worst:.1f} MB (budget {budget:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
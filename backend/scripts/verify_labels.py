@@ -10,7 +10,7 @@ import csv
 
 # Paths
 CLASS_NAMES_PATH = 'class_names.json'
-ARTISTS_CSV_PATH = 'public/data/artists.csv'
+ARTISTS_CSV_PATH = 'data/artists.csv'
 
 def load_class_names():
     """Load class names from JSON"""
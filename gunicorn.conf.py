@@ -0,0 +1,38 @@
+# Gunicorn reads ./gunicorn.conf.py automatically.
+# Metrics from all workers are aggregated through a shared PROMETHEUS_MULTIPROC_DIR.
+# With INFERENCE_MODE=process the master starts one inference process that owns the model;
+# HTTP workers (--workers / WEB_CONCURRENCY) then only decode and preprocess uploads.
+import glob
+import os
+import tempfile
+
+from utils.inference_server import DEFAULT_SOCKET, start_server_process
+
+# prometheus_client multiprocess mode: every worker (and the inference process) writes its metrics
+# to files in this directory and /metrics aggregates them. Must be set before the app is imported.
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), 'kala-prometheus')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+# Stale files from a previous run would be summed into this run's metrics
+for stale in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+    os.remove(stale)
+
+inference_process = None
+
+
+def on_starting(server):
+    global inference_process
+    if os.environ.get('INFERENCE_MODE', 'thread').lower() == 'process':
+        inference_process = start_server_process(os.environ.get('INFERENCE_SOCKET', DEFAULT_SOCKET))
+        server.log.info("Started inference process (pid %s)", inference_process.pid)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if inference_process is not None:
+        inference_process.terminate()
+        inference_process.wait(timeout=10)
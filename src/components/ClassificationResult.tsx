@@ -1,7 +1,6 @@
 import { motion } from "framer-motion";
 import { Sparkles, ExternalLink } from "lucide-react";
 import { getArtistStyle } from "@/utils/artistStyles";
-import { useState, useEffect } from "react";
 
 interface Prediction {
   artist: string;
@@ -16,52 +15,17 @@ interface ClassificationResultProps {
   predictions: Prediction[];
 }
 
-interface ArtistData {
-  name: string;
-  wikipedia: string;
-}
-
 const ClassificationResult = ({
   imageUrl,
   predictions,
 }: ClassificationResultProps) => {
-  const [artistsData, setArtistsData] = useState<ArtistData[]>([]);
-
-  useEffect(() => {
-    // Fetch artists CSV to get Wikipedia URLs
-    const loadArtistsData = async () => {
-      try {
-        const response = await fetch('/data/artists.csv');
-        const csvText = await response.text();
-
-        const lines = csvText.trim().split('\n');
-        const parsedData: ArtistData[] = lines.slice(1).map((line) => {
-          const values = line.split(',');
-          return {
-            name: values[0]?.trim() || '',
-            wikipedia: values[3]?.trim() || ''
-          };
-        });
-
-        setArtistsData(parsedData);
-      } catch (error) {
-        console.error("Failed to load artists data:", error);
-      }
-    };
-
-    loadArtistsData();
-  }, []);
-
   if (!predictions || predictions.length === 0) return null;
 
   const topPrediction = predictions[0];
   const otherPredictions = predictions.slice(1);
 
-  // Find Wikipedia URL for top prediction
-  const artistData = artistsData.find(
-    (artist) => artist.name === topPrediction.artist
-  );
-  const wikipediaUrl = artistData?.wikipedia || topPrediction.wikipedia;
+  // The API resolves each prediction's Wikipedia URL from the artist catalog
+  const wikipediaUrl = topPrediction.wikipedia;
 
   return (
     <motion.div
@@ -1,55 +1,43 @@
+export const API_URL = import.meta.env.VITE_API_URL || 'https://ricky07-b-kala-api.hf.space';
+
+// Shape of GET /api/artists/<name>
 export interface Artist {
-  id: number;
+  id: number | null;
   name: string;
-  years: string;
-  genre: string;
-  nationality: string;
-  bio: string;
+  display_name: string;
+  raw_name: string | null;
+  class_id: number | null;
+  years: string | null;
+  genre: string[] | null;
+  nationality: string | null;
+  bio: string | null;
   wikipedia: string;
-  paintings: number;
+  paintings: number | null;
 }
 
-export const parseArtistsCSV = async (): Promise<Artist[]> => {
-  const response = await fetch('/data/artists.csv');
-  const text = await response.text();
-  
-  const lines = text.trim().split('\n');
-  const headers = lines[0].split(',');
-  
-  const artists: Artist[] = [];
-  
-  for (let i = 1; i < lines.length; i++) {
-    const line = lines[i];
-    const values: string[] = [];
-    let current = '';
-    let inQuotes = false;
-    
-    for (let j = 0; j < line.length; j++) {
-      const char = line[j];
-      if (char === '"') {
-        inQuotes = !inQuotes;
-      } else if (char === ',' && !inQuotes) {
-        values.push(current.trim());
-        current = '';
-      } else {
-        current += char;
-      }
-    }
-    values.push(current.trim());
-    
-    if (values.length >= 8) {
-      artists.push({
-        id: parseInt(values[0], 10),
-        name: values[1],
-        years: values[2],
-        genre: values[3],
-        nationality: values[4],
-        bio: values[5],
-        wikipedia: values[6],
-        paintings: parseInt(values[7], 10),
-      });
-    }
+// Names of every artist the model can recognize (GET /api/artists)
+export const fetchArtistNames = async (): Promise<string[]> => {
+  const response = await fetch(`${API_URL}/api/artists`);
+  if (!response.ok) {
+    throw new Error(`Failed to load artists (${response.status})`);
+  }
+  const data = await response.json();
+  return data.artists;
+};
+
+// One artist's details; the API accepts any spelling of the name
+export const fetchArtist = async (name: string): Promise<Artist | null> => {
+  const response = await fetch(`${API_URL}/api/artists/${encodeURIComponent(name)}`);
+  if (response.status === 404) return null;
+  if (!response.ok) {
+    throw new Error(`Failed to load ${name} (${response.status})`);
   }
-  
-  return artists;
+  return response.json();
+};
+
+// Details of every recognized artist, in the API's (alphabetical) order
+export const fetchArtists = async (): Promise<Artist[]> => {
+  const names = await fetchArtistNames();
+  const artists = await Promise.all(names.map(fetchArtist));
+  return artists.filter((artist): artist is Artist => artist !== null);
 };
@@ -4,6 +4,7 @@ import Header from "@/components/Header";
 import Footer from "@/components/Footer";
 import ArtistCard from "@/components/ArtistCard";
 import { artistStyles } from "../utils/artistStyles";
+import { fetchArtists } from "@/lib/artists";
 
 interface Artist {
   id: string;
@@ -21,35 +22,16 @@ const Collection = () => {
   useEffect(() => {
     const loadArtists = async () => {
       try {
-        // Fetch the CSV file
-        const response = await fetch('/data/artists.csv');
-        const csvText = await response.text();
-
-        // Parse CSV
-        const lines = csvText.trim().split('\n');
-        const headers = lines[0].split(',');
-
-        const parsedArtists: Artist[] = lines.slice(1).map((line, index) => {
-          const values = line.split(',');
-          const name = values[0]?.trim() || '';
-          const nationality = values[1]?.trim() || '';
-          const years = values[2]?.trim() || '';
-          const wikipedia = values[3]?.trim() || '';
-
-          // Get genre from artistStyles
-          const genre = artistStyles[name] || "Modern Art";
-
-          return {
-            id: `artist-${index}`,
-            name,
-            genre,
-            nationality,
-            years,
-            wikipedia
-          };
-        });
-
-        setArtists(parsedArtists);
+        const details = await fetchArtists();
+        setArtists(details.map((artist) => ({
+          id: `artist-${artist.class_id ?? artist.id}`,
+          name: artist.display_name,
+          // Genre from the API, falling back to the art movement mapping
+          genre: artist.genre?.join(", ") || artistStyles[artist.display_name] || "Modern Art",
+          nationality: artist.nationality || "",
+          years: artist.years || "",
+          wikipedia: artist.wikipedia || "",
+        })));
       } catch (error) {
         console.error("Failed to load artists:", error);
       } finally {
@@ -71,6 +71,7 @@ export const artistStyles: Record<string, string> = {
 
     // V-W
     "Vasiliy Kandinsky": "Abstract Art",
+    "Wassily Kandinsky": "Abstract Art",
     "Vincent van Gogh": "Post-Impressionism",
     "William Turner": "Romanticism",
 };
@@ -0,0 +1,168 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+
+from utils.labels import name_keys, normalize_name
+
+try:
+    import brotli
+except ImportError:  # optional: responses are offered as gzip/identity only
+    brotli = None
+
+# Smaller bodies aren't worth the Content-Encoding overhead
+MIN_COMPRESS_BYTES = 256
+
+
+def _parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name] = q
+    return codings
+
+
+class CachedResponse:
+    """
+    A JSON body serialized and compressed once, with one strong ETag per
+    encoding. Serving it is a header comparison plus returning stored bytes.
+    """
+
+    def __init__(self, payload, max_age=3600):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = f'public, max-age={max_age}'
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+            if brotli is not None:
+                self.variants['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self._etags = {etag for _, etag in self.variants.values()}
+
+    def negotiate(self, accept_encoding):
+        """Best stored encoding the client accepts: br, then gzip, then identity"""
+        accepted = _parse_accept_encoding(accept_encoding)
+        for coding in ('br', 'gzip'):
+            q = accepted.get(coding, accepted.get('*', 0.0))
+            if coding in self.variants and q > 0:
+                return coding
+        return 'identity'
+
+    def not_modified(self, if_none_match):
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # Compare opaque tags; a weak W/ prefix still names the same representation for If-None-Match
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return not tags.isdisjoint(self._etags)
+
+    def respond(self, if_none_match=None, accept_encoding=None):
+        """(status, body, headers) for a request with the given conditional/encoding headers"""
+        coding = self.negotiate(accept_encoding)
+        body, etag = self.variants[coding]
+        headers = {'ETag': etag, 'Cache-Control': self.cache_control, 'Vary': 'Accept-Encoding'}
+        if self.not_modified(if_none_match):
+            return 304, b'', headers
+        headers['Content-Type'] = 'application/json'
+        if coding != 'identity':
+            headers['Content-Encoding'] = coding
+        return 200, body, headers
+
+
+class CatalogMismatchError(ValueError):
+    """Raised when a class the model recognizes has no row in the artists CSV"""
+
+
+def load_artists(csv_path):
+    """Rows of the artists CSV with typed fields ([] if the file is missing)"""
+    if not csv_path or not os.path.exists(csv_path):
+        return []
+    artists = []
+    with open(csv_path, 'r', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            artists.append({
+                'id': int(row['id']),
+                'name': row['name'],
+                'years': row['years'],
+                'genre': [g.strip() for g in row['genre'].split(',') if g.strip()],
+                'nationality': row['nationality'],
+                'bio': row['bio'],
+                'wikipedia': row['wikipedia'],
+                # Blank for artists outside the original dataset: unknown, not zero
+                'paintings': int(row['paintings']) if row['paintings'] else None,
+            })
+    return artists
+
+
+class ArtistCatalog:
+    """
+    Artist metadata for /api/artists and /api/artists/<name>, loaded once.
+
+    Every response is prebuilt as a CachedResponse. Detail lookups go through
+    a normalized-name index, so "Rene_Magritte", "René Magritte" and
+    "rene-magritte" all resolve, as do the model's class names.
+
+    Class names are joined to CSV rows through every spelling name_keys()
+    knows, so "Vasiliy_Kandinsky" finds the "Vasiliy Kandinskiy" row via its
+    Wikipedia title. With a non-empty CSV every class must find its row
+    (CatalogMismatchError otherwise); only an empty or missing CSV falls back
+    to minimal per-class records.
+    """
+
+    def __init__(self, artists, labels, max_age=3600):
+        self.artists = artists
+        records = {}
+        self._index = {}
+        for artist in artists:
+            record = {**artist, 'display_name': artist['name'], 'raw_name': None, 'class_id': None}
+            records[normalize_name(artist['name'])] = record
+            for key in name_keys(artist['name'], artist['wikipedia']):
+                self._index.setdefault(key, record)
+
+        unmatched = []
+        for class_id, (raw_name, display_name, wikipedia) in enumerate(
+                zip(labels.names, labels.display_names, labels.wikipedia)):
+            record = next((self._index[key] for key in name_keys(raw_name) if key in self._index), None)
+            if record is None:
+                unmatched.append(raw_name)
+                record = {field: None for field in ('id', 'years', 'genre', 'nationality', 'bio', 'paintings')}
+                record.update({'name': display_name, 'wikipedia': wikipedia})
+                records[normalize_name(display_name)] = record
+            record.update({'display_name': display_name, 'raw_name': raw_name, 'class_id': class_id})
+            for key in name_keys(raw_name):
+                self._index[key] = record
+        if unmatched and artists:
+            raise CatalogMismatchError(
+                f"{len(unmatched)} recognized artists have no row in the artists CSV: {', '.join(unmatched)}"
+            )
+
+        responses = {id(record): CachedResponse(record, max_age) for record in records.values()}
+        self._responses = {key: responses[id(record)] for key, record in self._index.items()}
+        self.detail_count = len(responses)
+
+        recognized = sorted(labels.display_names.tolist())
+        self.list_response = CachedResponse({'artists': recognized, 'count': len(recognized)}, max_age)
+
+    @classmethod
+    def load(cls, csv_path, labels, max_age=3600):
+        return cls(load_artists(csv_path), labels, max_age)
+
+    def lookup(self, name):
+        """The artist record for any spelling of a name, or None"""
+        return self._index.get(normalize_name(name))
+
+    def detail_response(self, name):
+        return self._responses.get(normalize_name(name))
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from queue import Queue, Empty
+
+import numpy as np
+
+
+class _PendingItem:
+    """A single image waiting for its row of a batched forward pass"""
+    __slots__ = ('array', 'slot', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, array=None, slot=None):
+        self.array = array
+        self.slot = slot
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collect preprocessed images from concurrent requests and run them through
+    the model as one batched forward pass.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images, or when
+    the oldest queued image has waited `max_wait_ms`, whichever comes first.
+    Each caller blocks in `submit()` until its own row of the output is ready.
+
+    With a `buffer_pool`, callers preprocess straight into a borrowed slot and
+    call `submit_slot()`; the batch is then read from the pool without
+    stacking per-request arrays.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10, stats_window=1024, buffer_pool=None):
+        self.predict_fn = predict_fn
+        self.buffer_pool = buffer_pool
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+        # Stats (guarded by self._lock)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = [0] * (self.max_batch_size + 1)
+        self._queue_wait_ms = deque(maxlen=stats_window)
+        self._inference_ms = deque(maxlen=stats_window)
+
+    def start(self):
+        """Start the background batching thread (idempotent)"""
+        with self._lock:
+            if self._running:
+                return self
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the batching thread after the current batch finishes"""
+        with self._lock:
+            self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def submit(self, array, timeout=None):
+        """
+        Queue one preprocessed image of shape (H, W, C) and wait for its
+        prediction row. Raises TimeoutError if no result arrives in time.
+        """
+        return self._wait_for(_PendingItem(array=array), timeout)
+
+    def submit_slot(self, slot, timeout=None):
+        """Queue an image already written into `buffer_pool` slot `slot`"""
+        return self._wait_for(_PendingItem(slot=slot), timeout)
+
+    def _wait_for(self, item, timeout):
+        if not self._running:
+            self.start()
+
+        with self._lock:
+            self._submitted += 1
+        self._queue.put(item)
+        self._note_queue_depth()
+
+        if not item.done.wait(timeout):
+            raise TimeoutError('Timed out waiting for batched inference')
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Queue depth and batch-size statistics for tuning against the latency budget"""
+        with self._lock:
+            batch_sizes = {
+                str(size): count
+                for size, count in enumerate(self._batch_size_counts)
+                if count
+            }
+            total_items = sum(size * count for size, count in enumerate(self._batch_size_counts))
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'batches': self._batches,
+                'mean_batch_size': round(total_items / self._batches, 3) if self._batches else 0.0,
+                'batch_size_counts': batch_sizes,
+                'queue_wait_ms': _summarize(self._queue_wait_ms),
+                'inference_ms': _summarize(self._inference_ms),
+            }
+
+    # --- Internals ---
+
+    def _note_queue_depth(self):
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+
+    def _collect_batch(self):
+        """Block for the first item, then gather more until full or the deadline passes"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except Empty:
+            return []
+
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        try:
+            if all(item.slot is not None for item in batch):
+                inputs = self.buffer_pool.gather([item.slot for item in batch])
+            else:
+                inputs = np.stack([
+                    item.array if item.slot is None else self.buffer_pool.view(item.slot)
+                    for item in batch
+                ])
+            outputs = np.asarray(self.predict_fn(inputs))
+            error = None
+        except Exception as e:
+            outputs = None
+            error = e
+        finished = time.perf_counter()
+
+        for row, item in enumerate(batch):
+            if error is None:
+                item.result = outputs[row]
+            else:
+                item.error = error
+            item.done.set()
+
+        with self._lock:
+            self._batches += 1
+            self._batch_size_counts[len(batch)] += 1
+            if error is None:
+                self._completed += len(batch)
+            else:
+                self._failed += len(batch)
+            self._inference_ms.append((finished - started) * 1000)
+            for item in batch:
+                self._queue_wait_ms.append((started - item.enqueued_at) * 1000)
+
+
+def _summarize(samples):
+    """p50/p95/p99/max over a window of millisecond samples"""
+    if not samples:
+        return {'count': 0}
+    values = np.fromiter(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': int(values.size),
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(values.max()), 3),
+    }
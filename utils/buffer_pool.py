@@ -0,0 +1,106 @@
+import heapq
+import threading
+
+import numpy as np
+
+
+class BatchBufferPool:
+    """
+    Preallocated, reusable input buffer for batched inference.
+
+    Each request borrows one slot (a row of `buffer`), preprocessing writes the
+    224x224x3 pixels straight into it, and the slot is returned once the
+    prediction is back. Slots are handed out lowest-index-first so concurrent
+    requests usually occupy consecutive rows and a batch can be passed to the
+    model as a plain slice - no stacking, no per-request arrays.
+
+    The buffer is uint8 by default: the model takes raw 0-255 pixel values, so
+    the cast to float32 happens inside the compiled inference graph and the
+    pool is a quarter of the size.
+
+    Pass `buffer` to manage slots in memory allocated elsewhere (the
+    shared-memory block of INFERENCE_MODE=process).
+    """
+
+    def __init__(self, num_slots, shape, dtype=np.uint8, buffer=None):
+        self.num_slots = int(num_slots)
+        if buffer is None:
+            buffer = np.zeros((self.num_slots,) + tuple(shape), dtype=dtype)
+        # `buffer` may be an existing array, e.g. a view of shared memory
+        self.buffer = buffer
+        # Gather target for batches whose slots are not consecutive (allocated on first use)
+        self._staging = None
+        self._free = list(range(self.num_slots))
+        # Slots another process may still write to: slot -> whether the borrower has released it
+        self._quarantined = {}
+        self._available = threading.Condition()
+        self.acquired = 0
+        self.waits = 0
+        self.contiguous_batches = 0
+        self.gathered_batches = 0
+
+    def acquire(self, timeout=None):
+        """Borrow a free slot index, waiting if every slot is in use"""
+        with self._available:
+            if not self._free:
+                self.waits += 1
+                if not self._available.wait_for(lambda: self._free, timeout):
+                    raise TimeoutError('No free batch buffer slot')
+            self.acquired += 1
+            return heapq.heappop(self._free)
+
+    def release(self, slot):
+        with self._available:
+            if slot in self._quarantined:
+                # Freed by reinstate() once whoever may still write into it is done
+                self._quarantined[slot] = True
+                return
+            heapq.heappush(self._free, slot)
+            self._available.notify()
+
+    def quarantine(self, slot):
+        """Keep a borrowed slot out of the pool after release() until reinstate(slot)"""
+        with self._available:
+            self._quarantined.setdefault(slot, False)
+
+    def reinstate(self, slot):
+        """End a quarantine; the slot is free again once its borrower has released it too"""
+        with self._available:
+            if self._quarantined.pop(slot, False):
+                heapq.heappush(self._free, slot)
+                self._available.notify()
+
+    def view(self, slot):
+        """Writable view of one slot's pixels"""
+        return self.buffer[slot]
+
+    def gather(self, slots):
+        """
+        Batch array for `slots`: a zero-copy slice when they are consecutive,
+        otherwise one copy into the preallocated staging buffer.
+        """
+        count = len(slots)
+        first = slots[0]
+        if all(slot == first + offset for offset, slot in enumerate(slots)):
+            self.contiguous_batches += 1
+            return self.buffer[first:first + count]
+        self.gathered_batches += 1
+        if self._staging is None:
+            self._staging = np.zeros_like(self.buffer)
+        return np.take(self.buffer, slots, axis=0, out=self._staging[:count])
+
+    def stats(self):
+        with self._available:
+            free = len(self._free)
+            quarantined = len(self._quarantined)
+        return {
+            'slots': self.num_slots,
+            'free': free,
+            'quarantined': quarantined,
+            'dtype': str(self.buffer.dtype),
+            'bytes': int(self.buffer.nbytes + (self._staging.nbytes if self._staging is not None else 0)),
+            'acquired': self.acquired,
+            'waits': self.waits,
+            'contiguous_batches': self.contiguous_batches,
+            'gathered_batches': self.gathered_batches,
+        }
@@ -0,0 +1,120 @@
+import numpy as np
+
+DEFAULT_ECE_BINS = 15
+
+
+class EvaluationStats:
+    """
+    Streaming accuracy/calibration accumulator: `update()` takes one batch of
+    probabilities and true class ids at a time, so memory is a confusion
+    matrix plus a few per-bin sums however many images are evaluated.
+    """
+
+    def __init__(self, class_names, ece_bins=DEFAULT_ECE_BINS):
+        self.class_names = list(class_names)
+        n = len(self.class_names)
+        self.confusion = np.zeros((n, n), dtype=np.int64)  # [true, predicted]
+        self.top5_hits = np.zeros(n, dtype=np.int64)
+        self.bin_edges = np.linspace(0.0, 1.0, ece_bins + 1)
+        self.bin_counts = np.zeros(ece_bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(ece_bins)
+        self.bin_correct = np.zeros(ece_bins)
+        self.nll = 0.0
+
+    @property
+    def count(self):
+        return int(self.confusion.sum())
+
+    def update(self, probabilities, truth):
+        probabilities = np.asarray(probabilities, dtype=np.float64)[:, :len(self.class_names)]
+        truth = np.asarray(truth, dtype=np.int64)
+        if not len(truth):
+            return
+        predicted = np.argmax(probabilities, axis=1)
+        np.add.at(self.confusion, (truth, predicted), 1)
+
+        k = min(5, probabilities.shape[1])
+        top5 = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+        np.add.at(self.top5_hits, truth, np.any(top5 == truth[:, None], axis=1))
+
+        confidence = probabilities[np.arange(len(truth)), predicted]
+        correct = predicted == truth
+        bins = np.clip(np.searchsorted(self.bin_edges, confidence, side='right') - 1, 0, len(self.bin_counts) - 1)
+        np.add.at(self.bin_counts, bins, 1)
+        np.add.at(self.bin_confidence, bins, confidence)
+        np.add.at(self.bin_correct, bins, correct)
+        self.nll -= float(np.log(np.clip(probabilities[np.arange(len(truth)), truth], 1e-12, 1.0)).sum())
+
+    def expected_calibration_error(self):
+        """Sum over confidence bins of |accuracy - mean confidence|, weighted by bin size"""
+        if not self.count:
+            return 0.0
+        filled = self.bin_counts > 0
+        gaps = np.abs(self.bin_correct[filled] - self.bin_confidence[filled])
+        return float(gaps.sum() / self.count)
+
+    def summary(self):
+        """Machine-readable results; per-class rows are keyed by class name so two runs diff cleanly"""
+        count = self.count
+        support = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        hits = np.diag(self.confusion)
+        per_class = {}
+        for i, name in enumerate(self.class_names):
+            if not support[i] and not predicted[i]:
+                continue
+            recall = hits[i] / support[i] if support[i] else None
+            precision = hits[i] / predicted[i] if predicted[i] else None
+            top_confusion = np.argsort(self.confusion[i])[::-1][:3]
+            per_class[name] = {
+                'images': int(support[i]),
+                'top1': _round(recall),
+                'top5': _round(self.top5_hits[i] / support[i] if support[i] else None),
+                'precision': _round(precision),
+                'confused_with': {
+                    self.class_names[j]: int(self.confusion[i, j])
+                    for j in top_confusion if j != i and self.confusion[i, j]
+                },
+            }
+        return {
+            'images': count,
+            'top1': _round(hits.sum() / count if count else None),
+            'top5': _round(self.top5_hits.sum() / count if count else None),
+            'ece': _round(self.expected_calibration_error()),
+            'nll': _round(self.nll / count if count else None),
+            'calibration': [
+                {
+                    'bin': [_round(lo), _round(hi)],
+                    'images': int(n),
+                    'confidence': _round(c / n if n else None),
+                    'accuracy': _round(a / n if n else None),
+                }
+                for lo, hi, n, c, a in zip(self.bin_edges[:-1], self.bin_edges[1:], self.bin_counts,
+                                           self.bin_confidence, self.bin_correct)
+            ],
+            'per_class': per_class,
+            'confusion': {'labels': self.class_names, 'matrix': self.confusion.tolist()},
+        }
+
+
+def _round(value, digits=4):
+    return None if value is None else round(float(value), digits)
+
+
+def compare(current, baseline, keys=('top1', 'top5', 'ece', 'nll')):
+    """Metric deltas between two summaries, overall and per class (current - baseline)"""
+    overall = {
+        key: _round(current[key] - baseline[key])
+        for key in keys if current.get(key) is not None and baseline.get(key) is not None
+    }
+    per_class = {}
+    for name, row in current.get('per_class', {}).items():
+        before = baseline.get('per_class', {}).get(name)
+        if before and row['top1'] is not None and before['top1'] is not None and row['top1'] != before['top1']:
+            per_class[name] = _round(row['top1'] - before['top1'])
+    throughput = {}
+    for size, row in current.get('throughput', {}).items():
+        before = baseline.get('throughput', {}).get(size)
+        if before:
+            throughput[size] = _round(row['images_per_second'] - before['images_per_second'], 1)
+    return {'overall': overall, 'per_class_top1': per_class, 'images_per_second': throughput}
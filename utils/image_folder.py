@@ -0,0 +1,71 @@
+import os
+from collections import deque
+
+import numpy as np
+
+from utils.preprocessing import IMG_SIZE, open_image, preprocess_into
+from utils.uploads import IMAGE_EXTENSIONS
+
+
+def list_images(inputs, limit=None):
+    """Image files under the given files/directories, in a stable sorted order"""
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS and not name.startswith('.'):
+                        paths.append(os.path.join(root, name))
+        elif os.path.isfile(item):
+            paths.append(item)
+    return paths[:limit] if limit else paths
+
+
+def load_batch(paths, dtype=np.uint8):
+    """Decode and preprocess `paths` into one (N, 224, 224, 3) array of raw 0-255 pixels"""
+    batch = np.empty((len(paths), IMG_SIZE, IMG_SIZE, 3), dtype=dtype)
+    for row, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            preprocess_into(open_image(f.read()), batch[row])
+    return batch
+
+
+def decode_batch(paths):
+    """(uint8 batch, per-row error or None); a bad file leaves a blank row instead of failing the batch"""
+    batch = np.zeros((len(paths), IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+    errors = [None] * len(paths)
+    for row, path in enumerate(paths):
+        try:
+            with open(path, 'rb') as f:
+                preprocess_into(open_image(f.read()), batch[row])
+        except Exception as e:
+            errors[row] = f'{type(e).__name__}: {e}'
+    return batch, errors
+
+
+def prefetched_batches(executor, paths, batch_size, workers, depth):
+    """
+    Yield (paths, uint8 batch, errors) in order while up to `depth` batches
+    decode ahead of the consumer. Each batch is split across the workers;
+    PIL releases the GIL while decoding and resampling, so threads scale.
+    """
+    window = deque()
+
+    def collect():
+        chunk, futures = window.popleft()
+        parts = [future.result() for future in futures]
+        batch = np.concatenate([part for part, _ in parts])
+        errors = [error for _, part_errors in parts for error in part_errors]
+        return chunk, batch, errors
+
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        step = -(-len(chunk) // workers)
+        window.append((chunk, [executor.submit(decode_batch, chunk[i:i + step]) for i in range(0, len(chunk), step)]))
+        if len(window) > depth:
+            yield collect()
+    while window:
+        yield collect()
@@ -0,0 +1,344 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def default_batch_sizes(max_batch_size):
+    """Powers of two up to (and including) the largest batch we serve"""
+    sizes = []
+    size = 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    sizes.append(int(max_batch_size))
+    return tuple(sizes)
+
+
+def _bucket_for(batch_sizes, count):
+    for size in batch_sizes:
+        if size >= count:
+            return size
+    return batch_sizes[-1]
+
+
+class CompiledPredictor:
+    """
+    Traced inference callable with a fixed input signature.
+
+    `model.predict` builds a data adapter, callbacks and possibly a new trace on
+    every call. Instead we trace `model(x, training=False)` once per batch-size
+    bucket at startup and pad each incoming batch up to the nearest bucket, so
+    the request path never retraces and always hits a known input shape.
+
+    With `input_dtype='uint8'` the traced function takes raw 0-255 pixels and
+    casts to float32 inside the graph, so callers can batch straight from a
+    uint8 buffer pool without a float32 copy per image.
+    """
+
+    def __init__(self, model, batch_sizes=(1, 2, 4, 8), img_size=224, channels=3, input_dtype='float32'):
+        import tensorflow as tf
+
+        self.model = model
+        self.batch_sizes = tuple(sorted(set(int(b) for b in batch_sizes)))
+        self.input_shape = (img_size, img_size, channels)
+        self.input_dtype = np.dtype(input_dtype)
+        self._to_tensor = tf.convert_to_tensor
+
+        @tf.function(reduce_retracing=True)
+        def _forward(images):
+            return model(tf.cast(images, tf.float32), training=False)
+
+        self._functions = {}
+        self.trace_ms = {}
+        for size in self.batch_sizes:
+            started = time.perf_counter()
+            spec = tf.TensorSpec((size,) + self.input_shape, tf.as_dtype(self.input_dtype))
+            self._functions[size] = _forward.get_concrete_function(spec)
+            self.trace_ms[size] = round((time.perf_counter() - started) * 1000, 2)
+
+        # Preallocated padding targets, one per bucket, so short batches don't allocate
+        self._padded = {
+            size: np.zeros((size,) + self.input_shape, dtype=self.input_dtype)
+            for size in self.batch_sizes
+        }
+
+    @property
+    def max_batch_size(self):
+        return self.batch_sizes[-1]
+
+    def __call__(self, batch):
+        """Run a batch of shape (N, H, W, C) and return (N, num_classes) probabilities"""
+        batch = np.asarray(batch, dtype=self.input_dtype)
+        count = batch.shape[0]
+
+        outputs = []
+        for start in range(0, count, self.max_batch_size):
+            chunk = batch[start:start + self.max_batch_size]
+            rows = len(chunk)
+            size = _bucket_for(self.batch_sizes, rows)
+            if rows < size:
+                # Rows past `rows` hold stale pixels from earlier calls; their outputs are dropped
+                padded = self._padded[size]
+                padded[:rows] = chunk
+                chunk = padded
+            result = self._functions[size](self._to_tensor(chunk))
+            outputs.append(result.numpy()[:rows])
+
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+
+def warmup(predict_fn, batch_sizes, img_size=224, rounds=2):
+    """
+    Run synthetic uint8 batches through every served batch size so graph
+    tracing, allocation and oneDNN kernel selection happen before real
+    traffic. Returns per-bucket milliseconds for each round plus the total.
+    """
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    timings = {}
+    for size in batch_sizes:
+        batch = rng.integers(0, 256, (size, img_size, img_size, 3), dtype=np.uint8)
+        samples = []
+        for _ in range(max(1, rounds)):
+            round_started = time.perf_counter()
+            predict_fn(batch)
+            samples.append(round((time.perf_counter() - round_started) * 1000, 2))
+        timings[str(size)] = samples
+    return {
+        'rounds': max(1, rounds),
+        'batch_ms': timings,
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def benchmark_against_predict(model, predictor, iterations=20, img_size=224):
+    """
+    Compare single-image latency of `model.predict` with the compiled
+    predictor. Returns mean/p50/p95 milliseconds for both paths.
+    """
+    image = np.random.uniform(0, 255, (1, img_size, img_size, 3)).astype('float32')
+
+    # Warm both paths so one-off tracing doesn't skew the numbers
+    model.predict(image, verbose=0)
+    predictor(image)
+
+    def _time(fn):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn(image)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples = np.array(samples)
+        return {
+            'mean_ms': round(float(samples.mean()), 3),
+            'p50_ms': round(float(np.percentile(samples, 50)), 3),
+            'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        }
+
+    predict_stats = _time(lambda x: model.predict(x, verbose=0))
+    compiled_stats = _time(predictor)
+    saved = predict_stats['mean_ms'] - compiled_stats['mean_ms']
+    return {
+        'iterations': iterations,
+        'model_predict': predict_stats,
+        'compiled': compiled_stats,
+        'saved_ms': round(saved, 3),
+        'speedup': round(predict_stats['mean_ms'] / compiled_stats['mean_ms'], 2) if compiled_stats['mean_ms'] else None,
+    }
+
+
+# --- Inference backends ---
+# A backend owns the model and exposes `predict(batch) -> (N, output_width)`,
+# `batch_sizes`, `output_dim` and `describe()`. The server picks one with the
+# INFERENCE_BACKEND environment variable. With embeddings enabled each output
+# row is `output_dim` probabilities followed by `embedding_dim` features, so
+# both come out of one forward pass through the existing batching path.
+
+def with_embeddings(model):
+    """
+    Wrap a classifier so one call returns [probabilities | penultimate features].
+    The features are the input of the final Dense (classification) layer.
+    Returns (model, embedding_dim).
+    """
+    import tensorflow as tf
+
+    head = next((layer for layer in reversed(model.layers) if isinstance(layer, tf.keras.layers.Dense)), None)
+    if head is None:
+        raise ValueError('Model has no Dense classification layer to take embeddings from')
+    features = head.input
+    if len(features.shape) > 2:
+        features = tf.keras.layers.Flatten(name='embedding_flatten')(features)
+    packed = tf.keras.layers.Concatenate(name='probabilities_and_embedding')([model.output, features])
+    return tf.keras.Model(model.inputs, packed), int(features.shape[-1])
+
+
+class KerasBackend:
+    """Full TensorFlow/Keras model behind a CompiledPredictor (today's behaviour)"""
+
+    name = 'keras'
+
+    def __init__(self, model_path, batch_sizes=(1,), img_size=224, input_dtype='uint8', embeddings=False):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        started = time.perf_counter()
+        self.model = tf.keras.models.load_model(model_path)
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.output_dim = int(self.model.output_shape[-1])
+        self.embedding_dim = 0
+        forward_model = self.model
+        if embeddings:
+            forward_model, self.embedding_dim = with_embeddings(self.model)
+        self.predictor = CompiledPredictor(
+            forward_model, batch_sizes=batch_sizes, img_size=img_size, input_dtype=input_dtype
+        )
+        self.batch_sizes = self.predictor.batch_sizes
+
+    @property
+    def output_width(self):
+        return self.output_dim + self.embedding_dim
+
+    @property
+    def has_rescaling(self):
+        return any('rescaling' in layer.name.lower() for layer in self.model.layers)
+
+    def predict(self, batch):
+        return self.predictor(batch)
+
+    def describe(self):
+        return {
+            'backend': self.name,
+            'model_path': self.model_path,
+            'load_ms': self.load_ms,
+            'batch_sizes': list(self.batch_sizes),
+            'trace_ms': self.predictor.trace_ms,
+            'embedding_dim': self.embedding_dim,
+        }
+
+
+def _tflite_interpreter_class():
+    """Prefer a standalone TFLite runtime wheel; fall back to full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter over a converted copy of the Keras model.
+
+    Interpreters aren't thread-safe and re-allocating tensors for a new batch
+    shape is slow, so one interpreter is prepared per batch-size bucket up
+    front. Each interpreter runs its kernels on `num_threads` threads, and
+    inputs are written straight into the interpreter's input tensor.
+    """
+
+    name = 'tflite'
+    # Converted models carry only the classification output
+    embedding_dim = 0
+
+    def __init__(self, model_path, batch_sizes=(1,), num_threads=None, img_size=224):
+        Interpreter = _tflite_interpreter_class()
+
+        self.model_path = model_path
+        self.batch_sizes = tuple(sorted(set(int(b) for b in batch_sizes)))
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.input_shape = (img_size, img_size, 3)
+        self._lock = threading.Lock()
+
+        started = time.perf_counter()
+        with open(model_path, 'rb') as f:
+            model_content = f.read()
+
+        self._interpreters = {}
+        for size in self.batch_sizes:
+            interpreter = Interpreter(model_content=model_content, num_threads=self.num_threads)
+            input_detail = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(input_detail['index'], (size,) + self.input_shape)
+            interpreter.allocate_tensors()
+            self._interpreters[size] = interpreter
+
+        first = self._interpreters[self.batch_sizes[0]]
+        self._input = first.get_input_details()[0]
+        self._output = first.get_output_details()[0]
+        self.input_dtype = np.dtype(self._input['dtype'])
+        self.output_dim = int(self._output['shape'][-1])
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    @property
+    def max_batch_size(self):
+        return self.batch_sizes[-1]
+
+    @property
+    def output_width(self):
+        return self.output_dim
+
+    def _write_input(self, chunk, target):
+        """Write 0-255 pixels into an input tensor, quantizing for int8/uint8 models"""
+        scale, zero_point = self._input.get('quantization', (0.0, 0))
+        if self.input_dtype.kind in 'iu' and scale:
+            info = np.iinfo(self.input_dtype)
+            target[...] = np.clip(np.round(chunk / scale + zero_point), info.min, info.max)
+        else:
+            np.copyto(target, chunk, casting='unsafe')
+
+    def _read_output(self, values):
+        scale, zero_point = self._output.get('quantization', (0.0, 0))
+        if values.dtype.kind in 'iu' and scale:
+            return (values.astype(np.float32) - zero_point) * scale
+        return values.astype(np.float32, copy=True)
+
+    def predict(self, batch):
+        batch = np.asarray(batch)
+        count = batch.shape[0]
+        outputs = []
+        with self._lock:
+            for start in range(0, count, self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                rows = len(chunk)
+                size = _bucket_for(self.batch_sizes, rows)
+                interpreter = self._interpreters[size]
+                # tensor() is a view of the interpreter's input buffer; it must not outlive invoke()
+                self._write_input(chunk, interpreter.tensor(self._input['index'])()[:rows])
+                interpreter.invoke()
+                result = interpreter.get_tensor(self._output['index'])[:rows]
+                outputs.append(self._read_output(result))
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+    def describe(self):
+        return {
+            'backend': self.name,
+            'model_path': self.model_path,
+            'load_ms': self.load_ms,
+            'batch_sizes': list(self.batch_sizes),
+            'num_threads': self.num_threads,
+            'input_dtype': str(self.input_dtype),
+        }
+
+
+BACKENDS = {'keras': KerasBackend, 'tflite': TFLiteBackend}
+
+
+def tflite_path_for(model_path):
+    """Default location of the converted model next to the .keras file"""
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+def load_backend(name, model_path, batch_sizes=(1,), img_size=224, num_threads=None, embeddings=False):
+    """Instantiate the inference backend called `name` ('keras' or 'tflite')"""
+    name = (name or 'keras').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if name == 'tflite':
+        if embeddings:
+            raise ValueError('Embeddings need the keras backend (the TFLite model has no embedding output)')
+        return TFLiteBackend(model_path, batch_sizes=batch_sizes, num_threads=num_threads, img_size=img_size)
+    return KerasBackend(model_path, batch_sizes=batch_sizes, img_size=img_size, embeddings=embeddings)
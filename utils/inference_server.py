@@ -0,0 +1,432 @@
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from utils.buffer_pool import BatchBufferPool
+from utils.preprocessing import IMG_SIZE
+
+PIXEL_SHAPE = (IMG_SIZE, IMG_SIZE, 3)
+PIXEL_BYTES = IMG_SIZE * IMG_SIZE * 3
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOCKET = os.path.join('/tmp', 'kala-inference.sock')
+
+# Message opcodes (first byte of every message)
+_HELLO = b'H'
+_ATTACH = b'A'
+_INFER = b'I'
+_DONE = b'D'
+_STATS = b'S'
+
+_SLOT_REQUEST = struct.Struct('>IH')
+_REQUEST_ID = struct.Struct('>I')
+
+
+class InferenceUnavailable(Exception):
+    """The inference process is not reachable or not ready yet"""
+
+
+def _regions(buf, slots, output_width):
+    """Input pixels and output rows (probabilities, plus embeddings if enabled) laid out back to back in one shared block"""
+    inputs = np.ndarray((slots,) + PIXEL_SHAPE, dtype=np.uint8, buffer=buf)
+    outputs = np.ndarray((slots, output_width), dtype=np.float32, buffer=buf, offset=slots * PIXEL_BYTES)
+    return inputs, outputs
+
+
+def _block_size(slots, output_width):
+    return slots * (PIXEL_BYTES + output_width * 4)
+
+
+# --- HTTP worker side ---
+
+class InferenceClient:
+    """
+    HTTP-worker end of INFERENCE_MODE=process.
+
+    Each worker owns a shared-memory block holding `slots` input images and
+    their output rows, exposed as a BatchBufferPool so request threads
+    preprocess straight into it exactly as in thread mode. `submit_slot()`
+    sends only the slot index over a Unix socket; the inference process
+    batches it with requests from every other worker, writes the
+    probabilities back into the block and replies with the request id.
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET, slots=32, timeout=60.0):
+        self.address = address
+        self.slots = int(slots)
+        self.timeout = timeout
+        self.buffer_pool = None
+        self.server_status = {}
+        self._conn = None
+        self._shm = None
+        self._outputs = None
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        # Timed-out requests whose slot the inference process may still be using: request id -> slot
+        self._abandoned = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._reader = None
+        self._closed = False
+        self.submitted = 0
+        self.failed = 0
+
+    # Connection setup
+
+    def _hello(self):
+        """One-off status query on a throwaway connection"""
+        conn = Client(self.address, family='AF_UNIX')
+        try:
+            conn.send_bytes(_HELLO)
+            reply = conn.recv_bytes()
+        finally:
+            conn.close()
+        return json.loads(reply[1:])
+
+    def wait_until_ready(self, timeout=None, poll_interval=0.5, on_status=None):
+        """
+        Poll the inference process until its model is loaded and warm. Returns
+        its status; raises InferenceUnavailable if it fails or `timeout` passes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                status = self._hello()
+            except (OSError, EOFError):
+                status = None
+            if status is not None:
+                if on_status is not None:
+                    on_status(status)
+                if status.get('ready'):
+                    return status
+                if status.get('phase') == 'failed':
+                    raise InferenceUnavailable(f"Inference process failed to load: {status.get('error')}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise InferenceUnavailable(f'Inference process at {self.address} not ready')
+            time.sleep(poll_interval)
+
+    def connect(self, timeout=None, on_status=None):
+        """Wait for a ready inference process, then share this worker's slot block with it"""
+        status = self.wait_until_ready(timeout=timeout, on_status=on_status)
+        output_width = int(status['output_width'])
+
+        self._shm = shared_memory.SharedMemory(create=True, size=_block_size(self.slots, output_width))
+        inputs, self._outputs = _regions(self._shm.buf, self.slots, output_width)
+        self.buffer_pool = BatchBufferPool(self.slots, PIXEL_SHAPE, buffer=inputs)
+
+        self._conn = Client(self.address, family='AF_UNIX')
+        self._conn.send_bytes(_ATTACH + json.dumps({'shm': self._shm.name, 'slots': self.slots}).encode())
+        self.server_status = json.loads(self._conn.recv_bytes()[1:])
+
+        self._reader = threading.Thread(target=self._read_replies, name='inference-client', daemon=True)
+        self._reader.start()
+        return self.server_status
+
+    # Requests
+
+    def _request(self, message_for_id, timeout, slot=None):
+        done = threading.Event()
+        entry = [done, None]
+        with self._pending_lock:
+            request_id = self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            self._pending[request_id] = entry
+        try:
+            try:
+                with self._send_lock:
+                    self._conn.send_bytes(message_for_id(request_id))
+            except (OSError, EOFError):
+                raise InferenceUnavailable('Lost connection to the inference process')
+            if not done.wait(self.timeout if timeout is None else timeout):
+                with self._pending_lock:
+                    # Re-checked under the lock: the reply may have landed just after the wait gave up
+                    if not done.is_set():
+                        if slot is not None:
+                            # The inference process may still read this slot and write its output row, so
+                            # it must not be handed to another request until the late reply arrives
+                            self._abandoned[request_id] = slot
+                            self.buffer_pool.quarantine(slot)
+                        raise TimeoutError('Timed out waiting for the inference process')
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        return entry[1]
+
+    def submit_slot(self, slot, timeout=None):
+        """Run the image in `slot` through the shared model and return its probability row"""
+        self.submitted += 1
+        error = self._request(lambda rid: _INFER + _SLOT_REQUEST.pack(rid, slot), timeout, slot=slot)
+        if error:
+            self.failed += 1
+            raise RuntimeError(error.decode('utf-8', 'replace'))
+        # Copy out so the row can't change under the caller once the slot is reused
+        return self._outputs[slot].copy()
+
+    def submit(self, array, timeout=None):
+        slot = self.buffer_pool.acquire(timeout)
+        try:
+            np.copyto(self.buffer_pool.view(slot), array, casting='unsafe')
+            return self.submit_slot(slot, timeout)
+        finally:
+            self.buffer_pool.release(slot)
+
+    @property
+    def queue_depth(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def stats(self):
+        """This worker's in-flight count plus the shared batcher's stats from the inference process"""
+        try:
+            remote = json.loads(self._request(lambda rid: _STATS + _REQUEST_ID.pack(rid), 5.0))
+        except Exception as e:
+            remote = {'error': str(e)}
+        return {
+            'mode': 'process',
+            'address': self.address,
+            'worker_pid': os.getpid(),
+            'worker_slots': self.slots,
+            'worker_in_flight': self.queue_depth,
+            'worker_submitted': self.submitted,
+            'worker_failed': self.failed,
+            **remote,
+        }
+
+    def _read_replies(self):
+        while not self._closed:
+            try:
+                message = self._conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            request_id = _REQUEST_ID.unpack_from(message, 1)[0]
+            with self._pending_lock:
+                entry = self._pending.get(request_id)
+                if entry is not None:
+                    entry[1] = message[1 + _REQUEST_ID.size:]
+                    entry[0].set()
+                abandoned = self._abandoned.pop(request_id, None)
+            if abandoned is not None:
+                # Late reply to a timed-out request: the process is done with the slot
+                self.buffer_pool.reinstate(abandoned)
+
+        # Server gone: fail everything still waiting
+        with self._pending_lock:
+            for entry in self._pending.values():
+                entry[1] = b'Inference process disconnected'
+                entry[0].set()
+
+    def close(self):
+        self._closed = True
+        if self._conn is not None:
+            # shutdown() wakes the reader thread blocked in recv and tells the server we're gone
+            with socket.fromfd(self._conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.shutdown(socket.SHUT_RDWR)
+            self._conn.close()
+        if self._shm is not None:
+            # Drop the numpy views first; SharedMemory can't close while they exist
+            self.buffer_pool = None
+            self._outputs = None
+            self._shm.close()
+            self._shm.unlink()
+
+
+# --- Inference process side ---
+
+class _Attachment:
+    """One HTTP worker's shared slot block, mapped into the inference process"""
+
+    def __init__(self, name, slots, output_width):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # The worker owns the block; don't let this process's tracker unlink it
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.inputs, self.outputs = _regions(self.shm.buf, slots, output_width)
+
+    def close(self):
+        del self.inputs, self.outputs
+        self.shm.close()
+
+
+class InferenceServer:
+    """
+    Single long-lived process that owns the model for every HTTP worker on the node.
+
+    It loads and warms the model on a background thread while already
+    answering status queries, then runs one MicroBatcher shared by all
+    connected workers, so concurrent requests from different workers land
+    in the same forward pass.
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET, model_path=None):
+        from utils.model_state import LoadProgress
+
+        self.address = address
+        self.model_path = model_path
+        self.progress = LoadProgress()
+        self.backend = None
+        self.batcher = None
+        self.warmup_report = None
+        self.workers = 0
+        self._executor = None
+
+    def load(self):
+        from utils.batching import MicroBatcher
+        from utils.inference import default_batch_sizes, load_backend, tflite_path_for, warmup
+        from utils.metrics import timed
+        from utils.model_loader import MODEL_NAME, download_model
+        from utils.similarity import DEFAULT_INDEX_DIR, embeddings_enabled
+
+        backend_name = os.environ.get('INFERENCE_BACKEND', 'keras').lower()
+        max_batch_size = int(os.environ.get('BATCH_MAX_SIZE', 8))
+        try:
+            if self.model_path is None:
+                if backend_name == 'tflite':
+                    self.model_path = os.environ.get('TFLITE_MODEL_PATH') or tflite_path_for(os.path.join(REPO_DIR, MODEL_NAME))
+                else:
+                    self.progress.set_phase('downloading')
+                    self.model_path = download_model(progress=self.progress.update_download)
+                if self.model_path is None:
+                    self.progress.mark_failed('Model download failed')
+                    return
+
+            self.progress.set_phase('loading')
+            print(f"[inference] Loading model from: {self.model_path} ({backend_name} backend)")
+            self.backend = load_backend(
+                backend_name,
+                self.model_path,
+                batch_sizes=default_batch_sizes(max_batch_size),
+                img_size=IMG_SIZE,
+                num_threads=int(os.environ.get('TFLITE_THREADS', 0)) or None,
+                embeddings=backend_name == 'keras' and embeddings_enabled(
+                    os.environ.get('SIMILARITY_INDEX') or os.path.join(REPO_DIR, DEFAULT_INDEX_DIR)
+                ),
+            )
+            self.batcher = MicroBatcher(
+                timed(self.backend.predict, 'model_forward'),
+                max_batch_size=max_batch_size,
+                max_wait_ms=float(os.environ.get('BATCH_MAX_WAIT_MS', 10)),
+            ).start()
+            # Enough threads to keep several full batches queued across all workers
+            self._executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get('INFERENCE_SERVER_THREADS', 0)) or 4 * max_batch_size,
+                thread_name_prefix='inference-request',
+            )
+
+            self.progress.set_phase('warming')
+            self.warmup_report = warmup(
+                self.backend.predict, self.backend.batch_sizes, img_size=IMG_SIZE,
+                rounds=int(os.environ.get('WARMUP_ROUNDS', 2)),
+            )
+            self.progress.set_phase('ready')
+            print(f"[inference] ✅ Ready (warmup {self.warmup_report['total_ms']:.0f} ms)")
+        except Exception as e:
+            print(f"[inference] ❌ Error loading model: {e}")
+            self.progress.mark_failed(e)
+
+    def status(self):
+        return {
+            **self.progress.snapshot(),
+            'pid': os.getpid(),
+            'model_path': self.model_path,
+            'output_dim': self.backend.output_dim if self.backend is not None else None,
+            'output_width': self.backend.output_width if self.backend is not None else None,
+            'embedding_dim': self.backend.embedding_dim if self.backend is not None else None,
+            'backend': self.backend.describe() if self.backend is not None else None,
+            'warmup': self.warmup_report,
+            'workers': self.workers,
+        }
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX')
+        threading.Thread(target=self.load, name='model-loader', daemon=True).start()
+        print(f"[inference] Listening on {self.address} (pid {os.getpid()})")
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve, args=(conn,), name='inference-conn', daemon=True).start()
+        finally:
+            listener.close()
+
+    def _serve(self, conn):
+        attachment = None
+        in_flight = []
+        send_lock = threading.Lock()
+
+        def reply(message):
+            with send_lock:
+                try:
+                    conn.send_bytes(message)
+                except OSError:
+                    pass
+
+        def run(request_id, slot):
+            try:
+                attachment.outputs[slot] = self.batcher.submit(attachment.inputs[slot])
+                error = b''
+            except Exception as e:
+                error = str(e).encode('utf-8') or b'Inference failed'
+            reply(_DONE + _REQUEST_ID.pack(request_id) + error)
+
+        try:
+            while True:
+                try:
+                    message = conn.recv_bytes()
+                except (EOFError, OSError):
+                    break
+                op = message[:1]
+                if op == _INFER:
+                    request_id, slot = _SLOT_REQUEST.unpack_from(message, 1)
+                    in_flight = [f for f in in_flight if not f.done()]
+                    in_flight.append(self._executor.submit(run, request_id, slot))
+                elif op == _STATS:
+                    request_id = _REQUEST_ID.unpack_from(message, 1)[0]
+                    stats = {'server': self.status(), 'batching': self.batcher.stats() if self.batcher else None}
+                    reply(_DONE + _REQUEST_ID.pack(request_id) + json.dumps(stats).encode())
+                elif op == _ATTACH:
+                    if not self.progress.ready:
+                        reply(_ATTACH + json.dumps(self.status()).encode())
+                        break
+                    spec = json.loads(message[1:])
+                    attachment = _Attachment(spec['shm'], spec['slots'], self.backend.output_width)
+                    self.workers += 1
+                    reply(_ATTACH + json.dumps(self.status()).encode())
+                elif op == _HELLO:
+                    reply(_HELLO + json.dumps(self.status()).encode())
+                    break
+        finally:
+            # Let this worker's queued requests finish before unmapping its block
+            for future in in_flight:
+                future.result()
+            if attachment is not None:
+                self.workers -= 1
+                attachment.close()
+            conn.close()
+
+
+def start_server_process(address=DEFAULT_SOCKET, model_path=None):
+    """Launch `python -m utils.inference_server` (used by gunicorn.conf.py and `python app.py`)"""
+    import subprocess
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    command = [sys.executable, '-m', 'utils.inference_server', address]
+    if model_path:
+        command.append(model_path)
+    return subprocess.Popen(command, cwd=REPO_DIR, env=env)
+
+
+if __name__ == '__main__':
+    # python -m utils.inference_server [socket path] [model path]
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    InferenceServer(
+        sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET,
+        model_path=sys.argv[2] if len(sys.argv) > 2 else None,
+    ).serve_forever()
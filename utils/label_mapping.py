@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+
+from utils.image_folder import list_images
+from utils.labels import clean_artist_name, normalize_name
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+except ImportError:  # optional: the NumPy solver below handles 50-ish classes instantly
+    _scipy_assignment = None
+
+# Probabilities are clipped before the log so a hard zero doesn't dominate a column mean
+_EPS = 1e-7
+
+
+def _hungarian(cost):
+    """
+    Minimum-cost assignment for a (rows <= cols) cost matrix: O(rows^2 * cols)
+    shortest augmenting paths with potentials, inner loops vectorized over
+    columns. Returns the column chosen for each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)  # row (1-based) matched to each column, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    padded = np.zeros((n + 1, m + 1))
+    padded[1:, 1:] = cost
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = match[column]
+            reduced = padded[current, 1:] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, minv[1:], np.inf)
+            nxt = int(np.argmin(candidates)) + 1
+            delta = candidates[nxt - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            column = nxt
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+    assignment = np.full(n, -1, dtype=np.int64)
+    for column in range(1, m + 1):
+        if match[column]:
+            assignment[match[column] - 1] = column - 1
+    return assignment
+
+
+def linear_sum_assignment(cost):
+    """(rows, cols) of a minimum-cost matching on a rectangular cost matrix, like scipy's"""
+    cost = np.asarray(cost, dtype=np.float64)
+    if _scipy_assignment is not None:
+        return _scipy_assignment(cost)
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = linear_sum_assignment(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+    return np.arange(cost.shape[0]), _hungarian(cost)
+
+
+def match_artist(name, candidates):
+    """The candidate class name for a folder/artist name in any spelling, or None"""
+    key = normalize_name(name)
+    for candidate in candidates:
+        if key in (normalize_name(candidate), normalize_name(clean_artist_name(candidate))):
+            return candidate
+    return None
+
+
+def labelled_images(root, candidates, per_artist=None):
+    """<root>/<artist>/ images as ({class name: [paths]}, [folders that match no class name])"""
+    images, unknown = {}, []
+    for folder in sorted(os.listdir(root)):
+        path = os.path.join(root, folder)
+        if not os.path.isdir(path):
+            continue
+        artist = match_artist(folder, candidates)
+        if artist is None:
+            unknown.append(folder)
+            continue
+        paths = list_images(path, limit=per_artist)
+        if paths:
+            images.setdefault(artist, []).extend(paths)
+    return images, unknown
+
+
+def score_matrix(probabilities, artist_ids, n_artists):
+    """
+    (n_outputs, n_artists) mean log-probability each model output gives the
+    images of each artist, plus per-artist image counts. One matrix product
+    over a one-hot artist matrix, however many images there are.
+    """
+    log_probs = np.log(np.clip(np.asarray(probabilities, dtype=np.float64), _EPS, 1.0))
+    onehot = np.zeros((len(artist_ids), n_artists))
+    onehot[np.arange(len(artist_ids)), artist_ids] = 1.0
+    counts = onehot.sum(axis=0)
+    return (log_probs.T @ onehot) / np.maximum(counts, 1), counts
+
+
+def solve_mapping(probabilities, artist_ids, artists, min_margin=1.0, min_agreement=0.5, min_images=3):
+    """
+    Assign each model output index to the artist whose images it scores
+    highest, as a single optimal one-to-one matching (Hungarian algorithm)
+    over the index x artist score matrix.
+
+    Returns a list with one entry per output index:
+      artist     the assigned artist, or None if no labelled artist is left for it
+      images     labelled images of that artist
+      agreement  fraction of those images whose top-1 output is this index
+      margin     mean log-prob gap to the runner-up index for that artist's images
+      ambiguous  True when the evidence is too thin or close to settle the index
+    """
+    probabilities = np.asarray(probabilities)
+    artist_ids = np.asarray(artist_ids, dtype=np.int64)
+    n_outputs = probabilities.shape[1]
+    scores, counts = score_matrix(probabilities, artist_ids, len(artists))
+    seen = np.flatnonzero(counts)
+
+    # Only artists with images get a column; any outputs left over stay unassigned
+    rows, cols = linear_sum_assignment(-scores[:, seen])
+    assigned = np.full(n_outputs, -1, dtype=np.int64)
+    assigned[rows] = seen[cols]
+
+    top1 = np.argmax(probabilities, axis=1)
+    result = []
+    for index in range(n_outputs):
+        artist = assigned[index]
+        if artist < 0:
+            result.append({'index': index, 'artist': None, 'images': 0, 'agreement': 0.0,
+                           'margin': 0.0, 'ambiguous': True})
+            continue
+        members = artist_ids == artist
+        agreement = float(np.mean(top1[members] == index))
+        column = np.delete(scores[:, artist], index)
+        margin = float(scores[index, artist] - column.max()) if len(column) else float('inf')
+        result.append({
+            'index': index,
+            'artist': artists[artist],
+            'images': int(counts[artist]),
+            'agreement': round(agreement, 4),
+            'margin': round(margin, 4),
+            'ambiguous': bool(counts[artist] < min_images or agreement < min_agreement or margin < min_margin),
+        })
+    return result
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import unicodedata
+import urllib.parse
+
+import numpy as np
+
+# Alphabetical class list, matching the order the model was trained with.
+# backend/class_names.json is in artists.csv order, which is NOT the model's
+# output order, so it is only used when explicitly configured (LABELS_PATH).
+DEFAULT_CLASS_NAMES = [
+    'Albrecht_Durer', 'Alfred_Sisley', 'Amedeo_Modigliani', 'Andy_Warhol', 'Artemisia_Gentileschi',
+    'Berthe_Morisot', 'Camille_Pissarro', 'Canaletto', 'Caravaggio', 'Claude_Monet',
+    'Diego_Velazquez', 'Edgar_Degas', 'Edouard_Manet', 'Edvard_Munch', 'El_Greco',
+    'Eugene_Delacroix', 'Francisco_Goya', 'Frida_Kahlo', 'Georges_Seurat', 'Giotto_di_Bondone',
+    'Gustav_Klimt', 'Gustave_Courbet', 'Henri_Matisse', 'Henri_Rousseau', 'Henri_de_Toulouse-Lautrec',
+    'Hieronymus_Bosch', 'Jackson_Pollock', 'Jan_van_Eyck', 'Joan_Miro', 'Kazimir_Malevich',
+    'Leonardo_da_Vinci', 'Marc_Chagall', 'Michelangelo', 'Mikhail_Vrubel', 'Pablo_Picasso',
+    'Paul_Cezanne', 'Paul_Gauguin', 'Paul_Klee', 'Peter_Paul_Rubens', 'Pierre-Auguste_Renoir',
+    'Piet_Mondrian', 'Pieter_Bruegel', 'Raphael', 'Rembrandt', 'René_Magritte',
+    'Salvador_Dali', 'Sandro_Botticelli', 'Titian', 'Vasiliy_Kandinsky', 'Vincent_van_Gogh',
+    'William_Turner'
+]
+
+
+class LabelMismatchError(ValueError):
+    """Raised when the label list does not match the model's output dimension"""
+
+
+def clean_artist_name(name):
+    """Clean artist name for better display"""
+    name = name.replace('_', ' ')
+    name = name.replace('тХа├а', 'ü').replace('а', '')
+    replacements = {
+        'Du rer': 'Dürer',
+        'Duerer': 'Dürer',
+        'Vasiliy Kandinskiy': 'Wassily Kandinsky',
+        'Vasiliy Kandinsky': 'Wassily Kandinsky',
+    }
+    for old, new in replacements.items():
+        name = name.replace(old, new)
+    return name.strip()
+
+
+def normalize_name(name):
+    """Lookup key that ignores case, accents, underscores and punctuation ("René_Magritte" == "rene magritte")"""
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return ''.join(c for c in ascii_name.lower() if c.isalnum())
+
+
+def wikipedia_title(url):
+    """Article title of a Wikipedia URL ("Wassily_Kandinsky"), or '' """
+    _, marker, title = (url or '').partition('/wiki/')
+    return urllib.parse.unquote(title) if marker else ''
+
+
+def name_keys(name, wikipedia=None):
+    """
+    normalize_name() keys for every spelling of an artist: the name itself,
+    its clean_artist_name() form and, for CSV rows, the Wikipedia article
+    title, which is the canonical spelling ("Wassily Kandinsky" for the CSV's
+    "Vasiliy Kandinskiy").
+    """
+    keys = [normalize_name(name), normalize_name(clean_artist_name(name))]
+    title = wikipedia_title(wikipedia)
+    if title:
+        keys.append(normalize_name(title))
+    return list(dict.fromkeys(keys))
+
+
+def load_class_names(path=None):
+    """Class names from a JSON list at `path`, or the built-in alphabetical list"""
+    if not path:
+        return list(DEFAULT_CLASS_NAMES)
+    with open(path, 'r', encoding='utf-8') as f:
+        names = json.load(f)
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise ValueError(f'{path} must contain a JSON list of class names')
+    return names
+
+
+def load_wikipedia_urls(csv_path):
+    """{name key: wikipedia url} for every spelling of each artist in the CSV ({} if it is missing)"""
+    urls = {}
+    if csv_path and os.path.exists(csv_path):
+        with open(csv_path, 'r', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                for key in name_keys(row['name'], row['wikipedia']):
+                    urls.setdefault(key, row['wikipedia'])
+    return urls
+
+
+class LabelRegistry:
+    """
+    Per-class display data, computed once at startup.
+
+    Raw names, display names and Wikipedia URLs are arrays indexed by class
+    id, so post-processing a prediction is an argpartition over the
+    probabilities plus a few array lookups instead of a full sort and string
+    cleanup per result.
+    """
+
+    def __init__(self, raw_names, wikipedia_urls=None):
+        wikipedia_urls = wikipedia_urls or {}
+        self.names = list(raw_names)
+        self.raw_names = np.array(self.names, dtype=object)
+        self.display_names = np.array([clean_artist_name(n) for n in self.names], dtype=object)
+        self.wikipedia = np.array([
+            next((wikipedia_urls[key] for key in name_keys(raw) if key in wikipedia_urls), '')
+            for raw in self.names
+        ], dtype=object)
+
+    @classmethod
+    def load(cls, names_path=None, csv_path=None):
+        return cls(load_class_names(names_path), load_wikipedia_urls(csv_path))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def wikipedia_count(self):
+        return int(sum(1 for url in self.wikipedia if url))
+
+    def validate(self, output_dim):
+        """Raise LabelMismatchError unless there is exactly one label per model output"""
+        if output_dim is not None and int(output_dim) != len(self):
+            raise LabelMismatchError(
+                f'Model has {output_dim} outputs but the label registry has {len(self)} classes'
+            )
+
+    def top_k(self, probabilities, k=5, min_confidence=0.0):
+        """The k most likely classes (descending) with confidence >= min_confidence, in the response shape"""
+        probabilities = np.asarray(probabilities)[:len(self)]
+        k = min(k, len(probabilities))
+        if k <= 0:
+            return []
+        if k < len(probabilities):
+            # O(n) selection of the top k, then sort just those
+            indices = np.argpartition(probabilities, -k)[-k:]
+        else:
+            indices = np.arange(len(probabilities))
+        indices = indices[np.argsort(probabilities[indices])[::-1]]
+        if min_confidence > 0:
+            indices = indices[probabilities[indices] >= min_confidence]
+
+        confidences = probabilities[indices].astype(np.float64)
+        percentages = np.round(confidences * 100, 2)
+        return [
+            {
+                'artist': artist,
+                'raw_name': raw_name,
+                'confidence': confidence,
+                'percentage': percentage,
+                'wikipedia': wikipedia,
+            }
+            for artist, raw_name, confidence, percentage, wikipedia in zip(
+                self.display_names[indices], self.raw_names[indices],
+                confidences.tolist(), percentages.tolist(), self.wikipedia[indices],
+            )
+        ]
@@ -0,0 +1,125 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from utils.model_loader import model_version
+
+# Per-stage latencies range from ~0.1 ms (post-processing) to seconds (a cold batch)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    'kala_stage_seconds',
+    'Time spent in each stage of a classification request',
+    ['stage'],
+    buckets=STAGE_BUCKETS,
+)
+REQUESTS = Counter('kala_requests', 'Requests by endpoint and HTTP status', ['endpoint', 'status'])
+ERRORS = Counter('kala_errors', 'Exceptions by stage and type', ['stage', 'type'])
+IN_FLIGHT = Gauge(
+    'kala_requests_in_flight', 'Requests currently being handled', ['endpoint'], multiprocess_mode='livesum'
+)
+MODEL_INFO = Gauge(
+    'kala_model_info',
+    'Loaded model and label list (value is always 1)',
+    ['model_version', 'labels_version', 'backend'],
+    multiprocess_mode='max',
+)
+
+
+@contextmanager
+def stage(name):
+    """Time a block into kala_stage_seconds{stage=name}; exceptions are counted by type and re-raised"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def timed(fn, name):
+    """Wrap `fn` so every call is recorded as stage `name`"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with stage(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _status_of(response):
+    if isinstance(response, tuple):
+        return response[1] if len(response) > 1 and isinstance(response[1], int) else 200
+    return getattr(response, 'status_code', 200)
+
+
+def track_requests(endpoint):
+    """Decorator counting requests by status and tracking in-flight requests (Flask views or async handlers)"""
+    def decorator(view):
+        gauge = IN_FLIGHT.labels(endpoint)
+
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                gauge.inc()
+                status = 500
+                try:
+                    response = await view(*args, **kwargs)
+                    status = _status_of(response)
+                    return response
+                finally:
+                    gauge.dec()
+                    REQUESTS.labels(endpoint, str(status)).inc()
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            gauge.inc()
+            status = 500
+            try:
+                response = view(*args, **kwargs)
+                status = _status_of(response)
+                return response
+            finally:
+                gauge.dec()
+                REQUESTS.labels(endpoint, str(status)).inc()
+        return wrapper
+    return decorator
+
+
+def labels_version(class_names):
+    return hashlib.sha256(json.dumps(list(class_names), ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+
+def set_model_info(model_path, class_names, backend_name):
+    MODEL_INFO.labels(model_version(model_path), labels_version(class_names), backend_name).set(1)
+
+
+def render():
+    """
+    Prometheus text exposition. Under gunicorn (PROMETHEUS_MULTIPROC_DIR set by
+    gunicorn.conf.py) this aggregates every worker's metrics, so any worker can
+    answer a scrape.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
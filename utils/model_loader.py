@@ -1,46 +1,381 @@
+import hashlib
+import json
 import os
-import gdown
+import sys
+import threading
+import time
+import urllib.request
+import zipfile
+from contextlib import contextmanager
+from urllib.error import HTTPError
 
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process lock, single worker assumed
+    fcntl = None
 
-def download_model():
+MODEL_NAME = 'art_artist_classifier.keras'
+DRIVE_FILE_ID = '1yVudBpUunOaEW1ilgROLrQvyqE9Bmzgv'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MANIFEST = os.path.join(REPO_DIR, 'model_manifest.json')
+CHUNK_SIZE = 1024 * 1024
+
+
+class ModelIntegrityError(Exception):
+    """Downloaded or cached model does not match the manifest"""
+
+
+class IncompleteModelError(ModelIntegrityError):
+    """Model file is shorter than the manifest size - an interrupted download that can be resumed"""
+
+
+# --- Manifest & verification ---
+
+def load_manifest(path=None):
+    """
+    Expected size/SHA-256 of the model. Read from MODEL_MANIFEST (or
+    model_manifest.json in the repo root) with MODEL_SHA256 / MODEL_SIZE
+    overriding; fields that are absent are simply not checked.
+    """
+    path = path or os.environ.get('MODEL_MANIFEST') or DEFAULT_MANIFEST
+    manifest = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    if os.environ.get('MODEL_SHA256'):
+        manifest['sha256'] = os.environ['MODEL_SHA256']
+    if os.environ.get('MODEL_SIZE'):
+        manifest['size'] = int(os.environ['MODEL_SIZE'])
+    return manifest
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(model_path):
+    """Short id of the model file from its name, size and mtime; 'unknown' if it is missing"""
+    if not model_path or not os.path.exists(model_path):
+        return 'unknown'
+    stat = os.stat(model_path)
+    key = f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def verify_model(path, manifest, name=None):
+    """
+    Raise ModelIntegrityError unless `path` matches the manifest's size and
+    checksum. `name` is the file's final name when `path` is a `.part` file,
+    so format checks go by what it will be installed as.
+    """
+    name = os.path.basename(name or path)
+    size = os.path.getsize(path)
+    expected_size = manifest.get('size')
+    if expected_size is not None and size < int(expected_size):
+        raise IncompleteModelError(f"{name} is {size} bytes, expected {expected_size}")
+    if expected_size is not None and size != int(expected_size):
+        raise ModelIntegrityError(f"{name} is {size} bytes, expected {expected_size}")
+
+    expected_sha = manifest.get('sha256')
+    if expected_sha:
+        actual = sha256_file(path)
+        if actual != expected_sha.lower():
+            raise ModelIntegrityError(f"{name} SHA-256 {actual[:12]}… does not match manifest")
+    elif name.endswith('.keras') and not zipfile.is_zipfile(path):
+        # No checksum configured: .keras files are zip archives, so at least catch truncation
+        raise ModelIntegrityError(f"{name} is not a complete .keras archive")
+
+
+def _stamp_path(path):
+    return path + '.verified'
+
+
+def _is_verified(path, manifest):
+    """True if `path` was verified against this manifest's checksum and hasn't changed since"""
+    if not manifest.get('sha256'):
+        # Stamps only vouch for a checksum; without one (or from before one was configured) they prove nothing
+        return False
+    try:
+        with open(_stamp_path(path), 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return False
+    return (
+        stamp.get('size') == stat.st_size
+        and stamp.get('mtime') == int(stat.st_mtime)
+        and stamp.get('sha256') == manifest.get('sha256')
+    )
+
+
+def _write_stamp(path, manifest):
+    """Record a checksum-verified file so later startups skip rehashing it; no-op without a checksum"""
+    if not manifest.get('sha256'):
+        return
+    stat = os.stat(path)
+    with open(_stamp_path(path), 'w', encoding='utf-8') as f:
+        json.dump({'size': stat.st_size, 'mtime': int(stat.st_mtime), 'sha256': manifest.get('sha256')}, f)
+
+
+# --- Sources ---
+
+class LocalSource:
+    """Copy from a path on disk (a mounted volume or a model baked into the image)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return f"local:{self.path}"
+
+    def fetch(self, part_path, progress=None):
+        total = os.path.getsize(self.path)
+        done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if done > total:
+            done = 0
+        with open(self.path, 'rb') as src, open(part_path, 'ab' if done else 'wb') as dst:
+            src.seek(done)
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                dst.write(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+
+
+class HTTPSource:
+    """Stream from an HTTP(S) mirror, resuming a partial file with a Range request"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+
+    def __str__(self):
+        return self.url
+
+    def fetch(self, part_path, progress=None):
+        done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request = urllib.request.Request(self.url, headers={'User-Agent': 'kala-art-ai-model-loader'})
+        if done:
+            request.add_header('Range', f'bytes={done}-')
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            if e.code == 416 and done:
+                # Range not satisfiable: the partial file is already complete (or garbage); let verify decide
+                return
+            raise
+
+        with response:
+            if done and response.status != 206:
+                # Server ignored the Range header: start over
+                done = 0
+            length = response.headers.get('Content-Length')
+            total = done + int(length) if length else None
+            if progress is not None:
+                progress(done, total)
+            with open(part_path, 'ab' if done else 'wb') as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress is not None:
+                        progress(done, total)
+            if total is not None and done < total:
+                raise IOError(f"connection closed after {done} of {total} bytes")
+
+
+class DriveSource:
+    """Google Drive via gdown, which handles the large-file confirmation page and resumes partial files"""
+
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+    def __str__(self):
+        return f"drive:{self.file_id}"
+
+    def fetch(self, part_path, progress=None):
+        import gdown
+
+        stop = threading.Event()
+        if progress is not None:
+            threading.Thread(
+                target=_watch_download, args=(part_path, progress, stop), name='download-progress', daemon=True
+            ).start()
+        try:
+            gdown.download(f"https://drive.google.com/uc?id={self.file_id}", part_path, quiet=False, resume=True)
+        finally:
+            stop.set()
+
+
+def _watch_download(path, progress, stop, interval=0.5):
+    """Report bytes written so far; gdown writes into temp files prefixed with the target name"""
+    directory = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path)
+    while not stop.wait(interval):
+        try:
+            written = sum(
+                os.path.getsize(os.path.join(directory, name))
+                for name in os.listdir(directory)
+                if name.startswith(prefix)
+            )
+        except OSError:
+            continue
+        progress(written, None)
+
+
+def parse_source(spec):
+    """'drive:<file id>', 'http(s)://...', 'file:<path>' or a plain local path"""
+    spec = spec.strip()
+    if spec.startswith('drive:'):
+        return DriveSource(spec[len('drive:'):])
+    if spec.startswith(('http://', 'https://')):
+        return HTTPSource(spec)
+    if spec.startswith('file:'):
+        spec = spec[len('file:'):]
+    return LocalSource(os.path.expanduser(spec))
+
+
+def default_sources(manifest=None):
+    """MODEL_SOURCES (comma-separated, tried in order), else the manifest's sources, else Google Drive"""
+    specs = os.environ.get('MODEL_SOURCES')
+    if specs:
+        specs = [s for s in specs.split(',') if s.strip()]
+    else:
+        specs = (manifest or {}).get('sources') or [f"drive:{DRIVE_FILE_ID}"]
+    return [parse_source(spec) for spec in specs]
+
+
+# --- Download orchestration ---
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive cross-process lock; other workers block here until the holder is done"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def ensure_model(dest, sources, manifest=None, progress=None, attempts=2):
     """
-    Download the art artist classifier model from Google Drive if it doesn't exist.
-    Uses a hardcoded File ID for the specific model.
+    Make sure a verified model exists at `dest` and return its path.
+
+    Each source streams into `<dest>.part` (kept across failures so the next
+    attempt resumes), the result is checked against the manifest and then
+    atomically renamed into place. Only one process downloads at a time;
+    the rest wait on the lock and find the verified file when they get it.
+    """
+    manifest = manifest or {}
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    part_path = dest + '.part'
+
+    with _file_lock(dest + '.lock'):
+        if os.path.exists(dest):
+            if _is_verified(dest, manifest):
+                return dest
+            try:
+                verify_model(dest, manifest)
+                _write_stamp(dest, manifest)
+                return dest
+            except IncompleteModelError as e:
+                # Left behind by the old non-atomic download: resume it instead of starting over
+                print(f"⚠️ Existing model is incomplete, resuming download: {e}")
+                os.replace(dest, part_path)
+            except ModelIntegrityError as e:
+                print(f"⚠️ Existing model failed verification, re-downloading: {e}")
+                os.remove(dest)
+
+        errors = []
+        for source in sources:
+            for attempt in range(1, attempts + 1):
+                print(f"📥 Fetching model from {source} (attempt {attempt}/{attempts})")
+                started = time.perf_counter()
+                try:
+                    source.fetch(part_path, progress)
+                    verify_model(part_path, manifest, name=dest)
+                except IncompleteModelError as e:
+                    # Keep the partial file so the next attempt resumes where this one stopped
+                    errors.append(f"{source}: {e}")
+                    print(f"❌ {e}")
+                    continue
+                except ModelIntegrityError as e:
+                    # A corrupt partial file can't be resumed into a good one
+                    errors.append(f"{source}: {e}")
+                    print(f"❌ {e}")
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    continue
+                except Exception as e:
+                    errors.append(f"{source}: {e}")
+                    print(f"❌ Download from {source} failed: {e}")
+                    continue
+
+                with open(part_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+                os.replace(part_path, dest)
+                _write_stamp(dest, manifest)
+                size_mb = os.path.getsize(dest) / (1024 * 1024)
+                print(f"✅ Model verified and installed ({size_mb:.2f} MB in {time.perf_counter() - started:.1f}s)")
+                return dest
+
+        raise ModelIntegrityError("Could not fetch a valid model: " + "; ".join(errors))
+
+
+def download_model(progress=None):
+    """
+    Return the path of a verified local model, downloading it first if needed.
+
+    The destination is MODEL_CACHE_DIR/art_artist_classifier.keras. Sources,
+    manifest and checksum come from MODEL_SOURCES / MODEL_MANIFEST /
+    MODEL_SHA256 (see load_manifest and default_sources). Returns None when
+    no source yields a valid model. `progress(bytes_done, bytes_total)` is
+    called while downloading.
     """
     # Use cache directory if available (for Docker), otherwise current directory
     cache_dir = os.environ.get('MODEL_CACHE_DIR', '.')
-    MODEL_PATH = os.path.join(cache_dir, 'art_artist_classifier.keras')
-    FILE_ID = '1yVudBpUunOaEW1ilgROLrQvyqE9Bmzgv'
-    
-    # Check if model already exists
-    if os.path.exists(MODEL_PATH):
-        file_size_mb = os.path.getsize(MODEL_PATH) / (1024 * 1024)
-        print(f"✅ Model already exists: {MODEL_PATH} ({file_size_mb:.2f} MB)")
-        return MODEL_PATH
-    
-    # Model doesn't exist, download from Google Drive
-    print(f"📥 Model not found. Downloading from Google Drive...")
-    print(f"   File ID: {FILE_ID}")
-    print(f"   Destination: {MODEL_PATH}")
-    
+    model_path = os.path.join(cache_dir, MODEL_NAME)
+
     try:
-        # Construct Google Drive URL
-        url = f"https://drive.google.com/uc?id={FILE_ID}"
-        
-        # Download with progress display
-        print("⏳ Download in progress (this may take 1-2 minutes)...")
-        gdown.download(url, MODEL_PATH, quiet=False)
-        
-        # Verify download
-        if os.path.exists(MODEL_PATH):
-            file_size_mb = os.path.getsize(MODEL_PATH) / (1024 * 1024)
-            print(f"✅ Download successful! ({file_size_mb:.2f} MB)")
-            return MODEL_PATH
-        else:
-            print("❌ Download failed: File not found after download")
-            return None
-            
+        manifest = load_manifest()
+        if not manifest.get('sha256'):
+            print("⚠️ No model checksum configured (MODEL_MANIFEST / MODEL_SHA256): the model is only checked to be a "
+                  "complete archive and is not stamped as verified. Run `python -m utils.model_loader <model file>` "
+                  "to write one")
+        path = ensure_model(model_path, default_sources(manifest), manifest, progress=progress)
+        if progress is not None:
+            size = os.path.getsize(path)
+            progress(size, size)
+        return path
     except Exception as e:
         print(f"❌ Error downloading model: {e}")
-        print("   Check that the Google Drive file is shared publicly")
+        print("   Check that the Google Drive file is shared publicly, or set MODEL_SOURCES to a mirror")
         return None
+
+
+if __name__ == '__main__':
+    # python -m utils.model_loader <model file> [manifest path]: write a manifest for a model release
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.model_loader <model file> [manifest path]")
+        sys.exit(1)
+    model_file = sys.argv[1]
+    manifest_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MANIFEST
+    existing = load_manifest(manifest_path) if os.path.exists(manifest_path) else {}
+    existing.update({
+        'name': os.path.basename(model_file),
+        'size': os.path.getsize(model_file),
+        'sha256': sha256_file(model_file),
+    })
+    existing.setdefault('sources', [f"drive:{DRIVE_FILE_ID}"])
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(existing, f, indent=2)
+        f.write('\n')
+    print(f"✅ Wrote {manifest_path}: {existing['size']} bytes, sha256 {existing['sha256']}")
@@ -0,0 +1,91 @@
+import threading
+import time
+
+
+class LoadProgress:
+    """
+    Phase tracker for the background model load.
+
+    The loader thread moves through downloading -> loading -> warming and ends
+    in `ready` or `failed`; request threads read `snapshot()` for the progress
+    endpoint and block in `wait()` for a bounded time before giving up with 503.
+    """
+
+    PHASES = ('pending', 'downloading', 'loading', 'warming', 'ready', 'failed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.started_at = time.time()
+        self.phase = 'pending'
+        self.error = None
+        self.bytes_done = 0
+        self.bytes_total = None
+        self._phase_started = time.perf_counter()
+        self._download_started = None
+        self._durations = {}
+
+    @property
+    def ready(self):
+        return self.phase == 'ready'
+
+    @property
+    def failed(self):
+        return self.phase == 'failed'
+
+    def set_phase(self, phase):
+        if phase not in self.PHASES:
+            raise ValueError(f"Unknown load phase '{phase}'")
+        with self._lock:
+            now = time.perf_counter()
+            self._durations[self.phase] = round((now - self._phase_started) * 1000, 1)
+            self.phase = phase
+            self._phase_started = now
+        if phase in ('ready', 'failed'):
+            self._done.set()
+
+    def update_download(self, bytes_done, bytes_total=None):
+        with self._lock:
+            if self._download_started is None:
+                self._download_started = time.perf_counter()
+            self.bytes_done = int(bytes_done)
+            if bytes_total:
+                self.bytes_total = int(bytes_total)
+
+    def mark_failed(self, error):
+        self.error = str(error)
+        self.set_phase('failed')
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds for the load to finish; True if the model is ready"""
+        if timeout and timeout > 0:
+            self._done.wait(timeout)
+        return self.ready
+
+    def retry_after(self, default=10):
+        """Seconds a client should wait before retrying, from the download rate when known"""
+        with self._lock:
+            if self.phase == 'downloading' and self.bytes_total and self.bytes_done and self._download_started:
+                elapsed = time.perf_counter() - self._download_started
+                remaining = (self.bytes_total - self.bytes_done) * elapsed / self.bytes_done
+                return max(1, min(int(remaining) + default, 600))
+        return default
+
+    def snapshot(self):
+        with self._lock:
+            durations = dict(self._durations)
+            if self.phase not in ('ready', 'failed'):
+                durations[self.phase] = round((time.perf_counter() - self._phase_started) * 1000, 1)
+            durations.pop('pending', None)
+            return {
+                'phase': self.phase,
+                'ready': self.phase == 'ready',
+                'error': self.error,
+                'elapsed_s': round(time.time() - self.started_at, 1),
+                'phase_ms': durations,
+                'download': {
+                    'bytes_done': self.bytes_done,
+                    'bytes_total': self.bytes_total,
+                    'percent': round(100 * self.bytes_done / self.bytes_total, 1) if self.bytes_total else None,
+                },
+            }
@@ -0,0 +1,122 @@
+import random
+import threading
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+# Popcount of every byte value, used to count differing bits between hashes
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image, hash_size=8):
+    """
+    64-bit difference hash of a decoded PIL image.
+
+    Robust to recompression, rescaling and small crops/colour shifts, so
+    screenshots and re-saved JPEGs of the same painting land a few bits apart.
+    """
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    small = image.resize(
+        (hash_size + 1, hash_size), Image.Resampling.BILINEAR, reducing_gap=2.0
+    ).convert('L')
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class NearDuplicateIndex:
+    """
+    Bounded Hamming-distance index of recent (hash -> probabilities) pairs.
+
+    Hashes live in a fixed-size ring buffer, so memory is capped at
+    `max_entries` rows and the oldest entries are overwritten first. Lookups
+    XOR the query against every stored hash and count differing bits with a
+    byte popcount table - a vectorised linear scan that stays well under a
+    millisecond for tens of thousands of entries.
+
+    A fraction of hits (`audit_rate`) is flagged for auditing: the caller runs
+    real inference anyway and reports back via `record_audit()`, so false
+    matches show up in `stats()` instead of going unnoticed.
+    """
+
+    def __init__(self, max_entries=10000, max_distance=6, audit_rate=0.05, audit_samples=50):
+        self.max_entries = int(max_entries)
+        self.max_distance = int(max_distance)
+        self.audit_rate = float(audit_rate)
+
+        self._hashes = np.zeros(self.max_entries, dtype=np.uint64)
+        self._values = [None] * self.max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.audited = 0
+        self.false_matches = 0
+        self._audit_log = deque(maxlen=audit_samples)
+
+    def lookup(self, image_hash):
+        """
+        Return (probabilities, distance, audit) for the closest stored hash
+        within `max_distance`, or (None, None, False) when there is no match.
+        """
+        with self._lock:
+            self.lookups += 1
+            if self._size == 0:
+                return None, None, False
+            stored = self._hashes[:self._size]
+            xor = np.bitwise_xor(stored, np.uint64(image_hash))
+            distances = _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            best = int(np.argmin(distances))
+            distance = int(distances[best])
+            if distance > self.max_distance:
+                return None, None, False
+            self.hits += 1
+            value = self._values[best]
+
+        audit = self.audit_rate > 0 and random.random() < self.audit_rate
+        return value, distance, audit
+
+    def add(self, image_hash, probabilities):
+        with self._lock:
+            slot = self._next
+            self._hashes[slot] = np.uint64(image_hash)
+            self._values[slot] = probabilities
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def record_audit(self, distance, stored, actual):
+        """Compare a near-duplicate result with the real forward pass"""
+        stored_top = int(np.argmax(stored))
+        actual_top = int(np.argmax(actual))
+        match = stored_top == actual_top
+        with self._lock:
+            self.audited += 1
+            if not match:
+                self.false_matches += 1
+            self._audit_log.append({
+                'distance': distance,
+                'stored_top': stored_top,
+                'actual_top': actual_top,
+                'match': match,
+                'max_abs_diff': round(float(np.max(np.abs(np.asarray(stored) - np.asarray(actual)))), 4),
+            })
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': self._size,
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                'audit_rate': self.audit_rate,
+                'audited': self.audited,
+                'false_matches': self.false_matches,
+                'false_match_rate': round(self.false_matches / self.audited, 4) if self.audited else 0.0,
+                'audit_samples': list(self._audit_log),
+            }
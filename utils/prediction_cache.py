@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def resource_version(model_path, class_names, embedding_dim=0):
+    """
+    Short fingerprint of the model file and label list (and the embedding
+    width, which changes what a cached row holds). Baked into every cache
+    key so a new model or a re-ordered class list never serves stale results.
+    """
+    digest = hashlib.sha256()
+    if model_path and os.path.exists(model_path):
+        stat = os.stat(model_path)
+        digest.update(f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+    digest.update(json.dumps(list(class_names), ensure_ascii=False).encode('utf-8'))
+    if embedding_dim:
+        digest.update(f"embedding:{embedding_dim}".encode())
+    return digest.hexdigest()[:16]
+
+
+class MemoryTier:
+    """In-process LRU with a maximum entry count and per-entry TTL"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """
+    On-disk tier shared by every gunicorn worker on the node and kept across
+    restarts. Values are stored as raw float32 probability bytes.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_rows=100000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            'key TEXT PRIMARY KEY, created REAL NOT NULL, value BLOB NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS predictions_created ON predictions(created)')
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT created, value FROM predictions WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created, value = row
+        if self.ttl_seconds and time.time() - created > self.ttl_seconds:
+            return None
+        return np.frombuffer(value, dtype=np.float32)
+
+    def put(self, key, value):
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO predictions (key, created, value) VALUES (?, ?, ?)',
+            (key, time.time(), np.asarray(value, dtype=np.float32).tobytes())
+        )
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        """Drop expired rows, then the oldest rows beyond max_rows"""
+        removed = 0
+        if self.ttl_seconds:
+            removed += conn.execute(
+                'DELETE FROM predictions WHERE created < ?', (time.time() - self.ttl_seconds,)
+            ).rowcount
+        removed += conn.execute(
+            'DELETE FROM predictions WHERE key IN ('
+            'SELECT key FROM predictions ORDER BY created DESC LIMIT -1 OFFSET ?)',
+            (self.max_rows,)
+        ).rowcount
+        self.evictions += max(removed, 0)
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+
+class _InFlight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of class probabilities.
+
+    Lookups go memory -> SQLite -> compute. Concurrent misses for the same key
+    are collapsed into one computation (single-flight): the first caller runs
+    inference, the rest wait for its result.
+    """
+
+    def __init__(self, version, max_entries=1024, ttl_seconds=3600, sqlite_path=None, sqlite_max_rows=100000):
+        self.version = version
+        self.memory = MemoryTier(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = SQLiteTier(sqlite_path, ttl_seconds=ttl_seconds, max_rows=sqlite_max_rows) if sqlite_path else None
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = {'memory': 0, 'disk': 0, 'shared': 0}
+        self.misses = 0
+        self.errors = 0
+
+    def key_for(self, data):
+        """Cache key for uploaded bytes under the current model/label version"""
+        return f"{self.version}:{hashlib.sha256(data).hexdigest()}"
+
+    def _record_hit(self, source):
+        with self._lock:
+            self.hits[source] += 1
+
+    def get_or_compute(self, key, compute):
+        """Return cached probabilities for `key`, computing them at most once"""
+        value = self.memory.get(key)
+        if value is not None:
+            self._record_hit('memory')
+            return value
+
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                self.memory.put(key, value)
+                self._record_hit('disk')
+                return value
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._in_flight[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            self._record_hit('shared')
+            return call.result
+
+        with self._lock:
+            self.misses += 1
+        try:
+            value = np.asarray(compute(), dtype=np.float32)
+            call.result = value
+            self.memory.put(key, value)
+            if self.disk is not None:
+                try:
+                    self.disk.put(key, value)
+                except sqlite3.Error:
+                    with self._lock:
+                        self.errors += 1
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+            in_flight = len(self._in_flight)
+        total_hits = sum(hits.values())
+        lookups = total_hits + misses
+        stats = {
+            'version': self.version,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(total_hits / lookups, 4) if lookups else 0.0,
+            'in_flight': in_flight,
+            'errors': self.errors,
+            'memory': {
+                'entries': len(self.memory),
+                'max_entries': self.memory.max_entries,
+                'ttl_seconds': self.memory.ttl_seconds,
+                'evictions': self.memory.evictions,
+                'expirations': self.memory.expirations,
+            },
+            'disk': None,
+        }
+        if self.disk is not None:
+            try:
+                rows = len(self.disk)
+            except sqlite3.Error:
+                rows = None
+            stats['disk'] = {
+                'path': self.disk.path,
+                'rows': rows,
+                'max_rows': self.disk.max_rows,
+                'ttl_seconds': self.disk.ttl_seconds,
+                'evictions': self.disk.evictions,
+            }
+        return stats
@@ -0,0 +1,201 @@
+import os
+import queue
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from utils.preprocessing import IMG_SIZE
+
+PIXEL_SHAPE = (IMG_SIZE, IMG_SIZE, 3)
+PIXEL_BYTES = IMG_SIZE * IMG_SIZE * 3
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_OK = b'ok'
+_ERROR = b'er'
+_HASH = struct.Struct('>Q')
+
+
+class PreprocessError(Exception):
+    """Raised when a worker crashes or times out on an upload"""
+
+
+def default_pool_size():
+    """Cores available to this process, leaving one for the request threads"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, cores - 1)
+
+
+class _Worker:
+    """One preprocessing subprocess with its own shared-memory output slot"""
+
+    def __init__(self, index):
+        self.index = index
+        self.shm = shared_memory.SharedMemory(create=True, size=PIXEL_BYTES)
+        self.pixels = np.ndarray(PIXEL_SHAPE, dtype=np.uint8, buffer=self.shm.buf)
+        self.process = None
+        self.conn = None
+        self.spawn()
+
+    def spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'utils.preprocess_pool', str(child_sock.fileno()), self.shm.name],
+            pass_fds=(child_sock.fileno(),),
+            cwd=REPO_DIR,
+            env=env,
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+
+    def kill(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        self.kill()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class PreprocessPool:
+    """
+    Fixed-size pool of processes that decode and preprocess uploads outside
+    the GIL-holding request threads.
+
+    `run(data)` blocks until a worker is free and sends it the raw upload bytes
+    over a socket pair. The worker writes 224x224x3 uint8 pixels into its own
+    shared-memory block and replies with a short status, so no arrays are
+    pickled. It returns `(pixels, dhash or None)`.
+
+    Workers are `python -m utils.preprocess_pool` subprocesses rather than
+    multiprocessing children, so they never re-import the server module (and
+    the model) as the spawn start method would. A worker that crashes or hangs
+    on a malformed image is killed and replaced; only that request fails.
+    """
+
+    def __init__(self, size=None, timeout=10.0):
+        self.size = size or default_pool_size()
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.errors = 0
+        self.restarts = 0
+        self.timeouts = 0
+
+        for index in range(self.size):
+            worker = _Worker(index)
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    def run(self, data, with_hash=False, out=None):
+        """
+        Preprocess `data` in a worker. Pixels are copied out of shared memory
+        into `out` (e.g. a batch buffer slot) when given, else a new float32 array.
+        """
+        worker = self._idle.get()
+        try:
+            return self._run_on(worker, data, with_hash, out)
+        finally:
+            self._idle.put(worker)
+
+    def _run_on(self, worker, data, with_hash, out):
+        with self._lock:
+            self.tasks += 1
+        try:
+            worker.conn.send_bytes(bytes([1 if with_hash else 0]) + data)
+            if not worker.conn.poll(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._restart(worker)
+                raise PreprocessError(f'Image preprocessing timed out after {self.timeout:.0f}s')
+            reply = worker.conn.recv_bytes()
+        except (EOFError, OSError):
+            self._restart(worker)
+            raise PreprocessError('Image preprocessing worker crashed')
+
+        status, payload = reply[:2], reply[2:]
+        if status == _ERROR:
+            with self._lock:
+                self.errors += 1
+            raise ValueError(payload.decode('utf-8', 'replace'))
+
+        image_hash = _HASH.unpack(payload)[0] if with_hash else None
+        # One copy out of shared memory, converted to the destination dtype
+        if out is None:
+            return worker.pixels.astype(np.float32), image_hash
+        np.copyto(out, worker.pixels, casting='unsafe')
+        return out, image_hash
+
+    def _restart(self, worker):
+        with self._lock:
+            self.errors += 1
+            self.restarts += 1
+        worker.kill()
+        worker.spawn()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.size,
+                'idle': self._idle.qsize(),
+                'tasks': self.tasks,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+            }
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+# --- Worker process ---
+
+def _worker_main(fd, shm_name):
+    from utils.perceptual_hash import dhash
+    from utils.preprocessing import open_image, preprocess_pixels
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The parent owns the block; don't let this process's tracker unlink it on exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    pixels = np.ndarray(PIXEL_SHAPE, dtype=np.uint8, buffer=shm.buf)
+    conn = Connection(fd)
+
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except (EOFError, OSError):
+            break
+
+        with_hash, data = message[0], message[1:]
+        try:
+            image = open_image(data)
+            image_hash = dhash(image) if with_hash else 0
+            pixels[...] = preprocess_pixels(image)
+            conn.send_bytes(_OK + _HASH.pack(image_hash))
+        except Exception as e:
+            conn.send_bytes(_ERROR + str(e).encode('utf-8'))
+
+    shm.close()
+
+
+if __name__ == '__main__':
+    _worker_main(int(sys.argv[1]), sys.argv[2])
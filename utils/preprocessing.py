@@ -0,0 +1,72 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = 224
+
+# Modes Image.reduce() supports; palette/bilevel images are converted first
+_REDUCIBLE_MODES = {'L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'I', 'F'}
+
+
+def open_image(data, target_size=IMG_SIZE):
+    """
+    Open uploaded bytes and, for JPEGs, ask libjpeg to decode at the smallest
+    DCT scale (1/2, 1/4 or 1/8) that is still at least `target_size` on both
+    sides. A 24 MP phone photo then decodes as ~0.4 MP instead of 24 MP.
+
+    Must be called before anything touches the pixels - draft() only takes
+    effect while the image is still lazily loaded.
+    """
+    image = Image.open(BytesIO(data))
+    if image.format == 'JPEG':
+        image.draft('RGB', (target_size, target_size))
+    return image
+
+
+def reduce_for_resize(image, target_size=IMG_SIZE):
+    """
+    Box-reduce by the largest integer factor that keeps both sides at least
+    `target_size`, so the final resample only touches a small image.
+    Covers formats without DCT scaling (PNG, WebP, ...) and whatever draft()
+    left over.
+    """
+    factor = min(image.width // target_size, image.height // target_size)
+    if factor >= 2 and image.mode in _REDUCIBLE_MODES:
+        image = image.reduce(factor)
+    return image
+
+
+def preprocess_pixels(image):
+    """Resize a decoded image to the model's 224x224 RGB input as uint8 pixels"""
+    # Shrink cheaply first so conversion and resampling touch fewer pixels
+    image = reduce_for_resize(image)
+
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize to model's expected input size
+    image = image.resize((IMG_SIZE, IMG_SIZE))
+
+    return np.asarray(image, dtype=np.uint8)
+
+
+def preprocess_into(image, out):
+    """
+    Preprocess straight into a caller-provided (224, 224, 3) buffer slot,
+    converting to the slot's dtype in the same pass.
+    """
+    np.copyto(out, preprocess_pixels(image), casting='unsafe')
+    return out
+
+
+def preprocess_image(image):
+    """Preprocess the image for model prediction"""
+    # Convert to numpy array - keep raw pixel values (0-255)
+    img_array = preprocess_pixels(image).astype('float32')
+
+    # Add batch dimension
+    img_array = np.expand_dims(img_array, axis=0)
+
+    return img_array
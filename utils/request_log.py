@@ -0,0 +1,149 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+
+LOGGER_NAME = 'kala'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via `extra={'fields': {...}}` are merged in"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue that drops records when the writer
+    thread falls behind, instead of blocking the request (or printing a
+    traceback per record, which is what QueueHandler does on queue.Full).
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Format the message now (args may be mutable) but skip the default
+        # exc_info formatting; the listener's formatter handles that
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingListener(QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown; wait for the writer thread to make room
+        self.queue.put(self._sentinel)
+
+
+class TraceBuffer:
+    """Ring buffer of recent prediction traces for the admin endpoint"""
+
+    def __init__(self, maxlen=256):
+        self._traces = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self, limit=None):
+        with self._lock:
+            traces = list(self._traces)
+        traces.reverse()
+        return traces[:limit] if limit else traces
+
+    def __len__(self):
+        return len(self._traces)
+
+
+class RequestLog:
+    """
+    Structured, sampled request logging.
+
+    Log records go through a bounded queue to a QueueListener thread that
+    does the formatting and the stdout write, so the request path only pays
+    for a `put_nowait`. Per-prediction records are sampled at
+    `sample_rate`; warnings and errors are always logged. Every prediction
+    is also kept in an in-memory TraceBuffer regardless of sampling.
+    """
+
+    def __init__(self, level='INFO', sample_rate=0.01, queue_size=10000, trace_size=256, stream=None):
+        self.sample_rate = float(sample_rate)
+        self.traces = TraceBuffer(trace_size)
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(level.upper() if isinstance(level, str) else level)
+        self.logger.propagate = False
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.logger.handlers = [self.handler]
+        self.listener = _DrainingListener(self.handler.queue, output, respect_handler_level=True)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.close)
+        self.sampled = 0
+
+    def prediction(self, endpoint, filename, size, probabilities, class_names, started):
+        """Record one prediction trace; log it if it falls in the sample"""
+        top = int(probabilities.argmax())
+        trace = {
+            'ts': round(time.time(), 3),
+            'endpoint': endpoint,
+            'filename': filename,
+            'bytes': size,
+            'predicted_index': top,
+            'artist': class_names[top] if top < len(class_names) else 'Unknown',
+            'confidence': round(float(probabilities[top]), 4),
+            'prob_min': round(float(probabilities.min()), 4),
+            'prob_max': round(float(probabilities.max()), 4),
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        self.traces.add(trace)
+        if self.sample_rate > 0 and random.random() < self.sample_rate and self.logger.isEnabledFor(logging.INFO):
+            self.sampled += 1
+            self.logger.info('prediction', extra={'fields': trace})
+
+    def error(self, message, **fields):
+        self.logger.error(message, exc_info=True, extra={'fields': fields})
+
+    def stats(self):
+        return {
+            'level': logging.getLevelName(self.logger.level),
+            'sample_rate': self.sample_rate,
+            'sampled': self.sampled,
+            'dropped': self.handler.dropped,
+            'queued': self.handler.queue.qsize(),
+            'traces': len(self.traces),
+        }
+
+    def close(self):
+        if self._running:
+            self._running = False
+            self.listener.stop()
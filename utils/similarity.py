@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; appends are then single-writer only
+    fcntl = None
+
+DEFAULT_INDEX_DIR = 'similarity_index'
+META_FILE = 'index.json'
+VECTORS_FILE = 'vectors.f32'
+ITEMS_FILE = 'items.jsonl'
+CENTROIDS_FILE = 'ivf_centroids.npy'
+ASSIGNMENTS_FILE = 'ivf_assignments.i32'
+
+
+def embeddings_enabled(index_path):
+    """EMBEDDINGS_ENABLED if set, otherwise on whenever a similarity index has been built"""
+    flag = os.environ.get('EMBEDDINGS_ENABLED')
+    if flag is not None:
+        return flag == '1'
+    return os.path.exists(os.path.join(index_path, META_FILE))
+
+
+def normalize(vectors):
+    """L2-normalize rows so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@contextmanager
+def _file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(scores, -k)[-k:] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(scores[top])[::-1]]
+
+
+def train_ivf(vectors, n_lists, iterations=20, sample_size=50000, seed=0):
+    """
+    Spherical k-means over (a sample of) normalized vectors. Returns
+    (centroids, assignments) for an inverted-file index.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    n_lists = max(1, min(int(n_lists), count))
+    sample = np.asarray(vectors[np.sort(rng.choice(count, min(sample_size, count), replace=False))])
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(n_lists):
+            members = sample[nearest == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+            else:
+                # Re-seed an empty list with a random point
+                centroids[list_id] = sample[rng.integers(len(sample))]
+        centroids = normalize(centroids)
+    return centroids, assign_lists(vectors, centroids)
+
+
+def assign_lists(vectors, centroids, chunk=65536):
+    """Nearest centroid per vector, computed in chunks to bound memory"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        assignments[start:start + chunk] = np.argmax(np.asarray(vectors[start:start + chunk]) @ centroids.T, axis=1)
+    return assignments
+
+
+class SimilarityIndex:
+    """
+    On-disk nearest-neighbour index over artwork embeddings.
+
+    Layout of the index directory:
+      index.json              dimension, row count, model version, IVF settings
+      vectors.f32             (count, dim) float32 L2-normalized rows, memory-mapped
+      items.jsonl             one metadata object per row (path, url, predicted artist...)
+      ivf_centroids.npy       optional IVF coarse centroids
+      ivf_assignments.i32     list id per row, when IVF is trained
+
+    `add()` appends rows to the end of each file and then rewrites
+    index.json, whose `count` is the only thing readers trust, so a reader
+    never sees a half-written append. New rows are assigned to the existing
+    IVF lists without retraining. A serving process picks appends up on its
+    next search via `refresh()`.
+
+    Search is either exact (one matrix-vector product over the memory-mapped
+    vectors) or IVF (score the centroids, then only the rows in the `nprobe`
+    closest lists).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self.meta = None
+        self.vectors = None
+        self.items = []
+        self.centroids = None
+        self._list_order = None
+        self._list_offsets = None
+        self.refresh()
+
+    @classmethod
+    def create(cls, path, dim, model_version=None):
+        os.makedirs(path, exist_ok=True)
+        meta = {'dim': int(dim), 'count': 0, 'model_version': model_version, 'ivf_lists': 0}
+        for name in (VECTORS_FILE, ITEMS_FILE):
+            open(os.path.join(path, name), 'wb').close()
+        for name in (CENTROIDS_FILE, ASSIGNMENTS_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.unlink(os.path.join(path, name))
+        cls._write_meta(path, meta)
+        return cls(path)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @staticmethod
+    def _write_meta(path, meta):
+        tmp = os.path.join(path, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, META_FILE))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @property
+    def dim(self):
+        return self.meta['dim']
+
+    def __len__(self):
+        return self.meta['count'] if self.meta else 0
+
+    @property
+    def ivf_lists(self):
+        return self.meta.get('ivf_lists', 0) if self.meta else 0
+
+    def refresh(self):
+        """Re-map the index if index.json changed since it was last loaded"""
+        mtime = os.stat(self._file(META_FILE)).st_mtime_ns
+        if mtime == self._meta_mtime:
+            return False
+        with self._lock:
+            with open(self._file(META_FILE)) as f:
+                meta = json.load(f)
+            count, dim = meta['count'], meta['dim']
+            vectors = (
+                np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode='r', shape=(count, dim))
+                if count else np.empty((0, dim), dtype=np.float32)
+            )
+            items = []
+            with open(self._file(ITEMS_FILE), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if len(items) == count:
+                        break
+                    items.append(json.loads(line))
+
+            centroids = order = offsets = None
+            if meta.get('ivf_lists') and count:
+                centroids = np.load(self._file(CENTROIDS_FILE))
+                assignments = np.fromfile(self._file(ASSIGNMENTS_FILE), dtype=np.int32, count=count)
+                # Inverted lists as one row permutation plus per-list offsets
+                order = np.argsort(assignments, kind='stable')
+                offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+
+            self.meta, self.vectors, self.items = meta, vectors, items
+            self.centroids, self._list_order, self._list_offsets = centroids, order, offsets
+            self._meta_mtime = mtime
+        return True
+
+    def add(self, vectors, items):
+        """Append embeddings and their metadata; returns the new row count"""
+        vectors = normalize(vectors)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f'Expected vectors of dimension {self.dim}, got shape {vectors.shape}')
+        if len(vectors) != len(items):
+            raise ValueError('vectors and items must have the same length')
+
+        with _file_lock(self._file(META_FILE + '.lock')):
+            with open(self._file(META_FILE)) as f:
+                meta = json.load(f)
+            count = meta['count']
+            # Drop anything past `count` left behind by an interrupted append
+            self._truncate(VECTORS_FILE, count * self.dim * 4)
+            with open(self._file(VECTORS_FILE), 'ab') as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._truncate_lines(ITEMS_FILE, count)
+            with open(self._file(ITEMS_FILE), 'a', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if meta.get('ivf_lists'):
+                centroids = np.load(self._file(CENTROIDS_FILE))
+                self._truncate(ASSIGNMENTS_FILE, count * 4)
+                with open(self._file(ASSIGNMENTS_FILE), 'ab') as f:
+                    f.write(assign_lists(vectors, centroids).tobytes())
+            meta['count'] = count + len(vectors)
+            self._write_meta(self.path, meta)
+        self.refresh()
+        return len(self)
+
+    def _truncate(self, name, size):
+        if os.path.getsize(self._file(name)) > size:
+            os.truncate(self._file(name), size)
+
+    def _truncate_lines(self, name, lines):
+        with open(self._file(name), 'rb') as f:
+            content = f.read()
+        kept = content.split(b'\n')[:lines]
+        expected = b''.join(line + b'\n' for line in kept)
+        if content != expected:
+            with open(self._file(name), 'wb') as f:
+                f.write(expected)
+
+    def train_ivf(self, n_lists, iterations=20):
+        """(Re)build the IVF coarse quantizer over every row currently in the index"""
+        with _file_lock(self._file(META_FILE + '.lock')):
+            self.refresh()
+            centroids, assignments = train_ivf(self.vectors, n_lists, iterations)
+            np.save(self._file(CENTROIDS_FILE), centroids)
+            assignments.tofile(self._file(ASSIGNMENTS_FILE))
+            meta = dict(self.meta, ivf_lists=len(centroids))
+            self._write_meta(self.path, meta)
+        self.refresh()
+
+    def vector(self, row):
+        return np.asarray(self.vectors[row])
+
+    def search(self, query, k=10, mode='exact', nprobe=8, exclude=None):
+        """[(row, cosine similarity)] of the k nearest rows to `query`, best first"""
+        self.refresh()
+        with self._lock:
+            vectors, centroids = self.vectors, self.centroids
+            order, offsets = self._list_order, self._list_offsets
+        if not len(vectors):
+            return []
+        query = normalize(query).reshape(-1)
+        extra = 1 if exclude is not None else 0
+
+        if mode == 'ivf' and centroids is not None:
+            lists = _top_k(centroids @ query, nprobe)
+            rows = np.concatenate([order[offsets[l]:offsets[l + 1]] for l in lists])
+            # Sorted rows read the memory map sequentially
+            rows.sort()
+            scores = np.asarray(vectors[rows]) @ query
+            top = _top_k(scores, k + extra)
+            results = zip(rows[top].tolist(), scores[top].tolist())
+        else:
+            scores = np.asarray(vectors @ query)
+            top = _top_k(scores, k + extra)
+            results = zip(top.tolist(), scores[top].tolist())
+        return [(row, score) for row, score in results if row != exclude][:k]
+
+    def describe(self):
+        return {
+            'path': self.path,
+            'count': len(self),
+            'dim': self.dim,
+            'model_version': self.meta.get('model_version'),
+            'ivf_lists': self.ivf_lists,
+        }
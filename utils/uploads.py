@@ -0,0 +1,207 @@
+import os
+import warnings
+import zipfile
+from io import BytesIO
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff'}
+
+# Enough leading bytes to recognise every supported format
+SNIFF_BYTES = 16
+READ_CHUNK_BYTES = 64 * 1024
+
+# check_image() enforces its own max_pixels, so Pillow's softer warning threshold is just noise.
+# Registered once here: catch_warnings() per request would race between server threads.
+warnings.filterwarnings('ignore', category=Image.DecompressionBombWarning)
+
+
+class UploadRejected(Exception):
+    """An upload refused before decoding; `status` is the HTTP status to answer with"""
+    status = 400
+
+
+class UploadTooLargeError(UploadRejected):
+    """Raised when an upload exceeds a byte or pixel limit"""
+    status = 413
+
+
+class UnsupportedImageError(UploadRejected):
+    """Raised when an upload is not one of the supported image formats"""
+    status = 415
+
+
+class BatchLimitError(UploadTooLargeError):
+    """Raised when a batch upload exceeds its image-count or byte budget"""
+
+
+def sniff_format(head):
+    """Image format from the leading magic bytes ('JPEG', 'PNG', ...), or None if unsupported"""
+    if head[:3] == b'\xff\xd8\xff':
+        return 'JPEG'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'PNG'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'GIF'
+    if head[:2] == b'BM':
+        return 'BMP'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'TIFF'
+    return None
+
+
+def _mb(limit):
+    return f'{limit / (1024 * 1024):g} MB'
+
+
+def _unsupported(filename=None):
+    prefix = f'{filename}: ' if filename else ''
+    return UnsupportedImageError(f'{prefix}Unsupported file type (expected JPEG, PNG, WebP, GIF, BMP or TIFF)')
+
+
+def _image_too_large(filename, max_bytes):
+    return UploadTooLargeError(f'{filename}: Image exceeds the {_mb(max_bytes)} upload limit')
+
+
+def read_limited(stream, max_bytes, head=b''):
+    """`head` plus the rest of `stream`, in chunks; UploadTooLargeError as soon as it passes `max_bytes`"""
+    chunks = [head]
+    size = len(head)
+    while True:
+        chunk = stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return b''.join(chunks)
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(f'Image exceeds the {_mb(max_bytes)} upload limit')
+        chunks.append(chunk)
+
+
+def read_upload(stream, max_bytes):
+    """
+    Read an uploaded image, sniffing its format from the first bytes before
+    reading the rest. Raises UnsupportedImageError for anything that isn't a
+    supported image and UploadTooLargeError once more than `max_bytes` arrive,
+    so neither ever holds more than a chunk past the limit in memory.
+    """
+    head = stream.read(SNIFF_BYTES)
+    if sniff_format(head) is None:
+        raise _unsupported()
+    return read_limited(stream, max_bytes, head)
+
+
+def check_image(data, max_pixels):
+    """
+    Validate image bytes from their header alone, before any pixels are
+    decoded: the format must be supported and the size the header declares
+    at most `max_pixels`. That is the stored size, not what JPEG DCT scaling
+    would decode to, so the limit means the same for every format. Returns
+    (format, width, height).
+    """
+    image_format = sniff_format(data[:SNIFF_BYTES])
+    if image_format is None:
+        raise _unsupported()
+    try:
+        # Parses the header only
+        image = Image.open(BytesIO(data))
+    except Image.DecompressionBombError:
+        # Past Pillow's own hard limit, which is far above any sane max_pixels
+        raise UploadTooLargeError(f'Image exceeds the {max_pixels / 1e6:g} megapixel limit')
+    except Exception as e:
+        raise UploadRejected(f'Unreadable {image_format} image: {e}')
+    width, height = image.size
+    if width * height > max_pixels:
+        raise UploadTooLargeError(
+            f'Image is {width}x{height} pixels; the limit is {max_pixels / 1e6:g} megapixels'
+        )
+    return image_format, width, height
+
+
+def _is_zip(filename, data):
+    return filename.lower().endswith('.zip') or data[:4] == b'PK\x03\x04'
+
+
+def _is_image_name(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def collect_batch_images(files, max_images, max_bytes, max_image_bytes=None):
+    """
+    Flatten a multipart upload (plain images and/or zip archives) into a list
+    of (filename, bytes, error) items, enforcing the per-request image and
+    byte limits and, when given, the `max_image_bytes` limit on every single
+    image.
+
+    A plain file that isn't an image, or an image over `max_image_bytes`, only
+    fails its own item: it comes back as (filename, None, UploadRejected) and
+    still counts towards `max_images`. Zip members are checked against the
+    limits using their declared uncompressed size *before* they are
+    extracted. Raises BatchLimitError when a batch limit is exceeded and
+    ValueError for an unreadable archive.
+    """
+    images = []
+    total_bytes = 0
+
+    def _check_count():
+        if len(images) >= max_images:
+            raise BatchLimitError(f'Too many images in batch (limit {max_images})')
+
+    def _add(name, data):
+        nonlocal total_bytes
+        _check_count()
+        total_bytes += len(data)
+        if total_bytes > max_bytes:
+            raise BatchLimitError(f'Batch exceeds {max_bytes // (1024 * 1024)} MB limit')
+        images.append((name, data, None))
+
+    def _reject(name, error):
+        _check_count()
+        images.append((name, None, error))
+
+    for file in files:
+        if not file or file.filename == '':
+            continue
+        # Sniff before reading the rest, so a non-image is refused without loading it
+        head = file.read(SNIFF_BYTES)
+        is_zip = _is_zip(file.filename, head)
+        if not is_zip and sniff_format(head) is None:
+            _reject(file.filename, _unsupported(file.filename))
+            continue
+        limit = max_bytes - total_bytes
+        per_image = not is_zip and max_image_bytes is not None and max_image_bytes < limit
+        try:
+            data = read_limited(file, max_image_bytes if per_image else limit, head)
+        except UploadTooLargeError:
+            if per_image:
+                _reject(file.filename, _image_too_large(file.filename, max_image_bytes))
+                continue
+            raise BatchLimitError(f'Batch exceeds {max_bytes // (1024 * 1024)} MB limit')
+
+        if not is_zip:
+            _add(file.filename, data)
+            continue
+
+        try:
+            archive = zipfile.ZipFile(BytesIO(data))
+        except zipfile.BadZipFile:
+            raise ValueError(f'Invalid zip archive: {file.filename}')
+
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_image_name(info.filename):
+                    continue
+                # Skip macOS resource forks and hidden files
+                base = os.path.basename(info.filename)
+                if base.startswith('.') or info.filename.startswith('__MACOSX/'):
+                    continue
+                _check_count()
+                if max_image_bytes is not None and info.file_size > max_image_bytes:
+                    _reject(info.filename, _image_too_large(info.filename, max_image_bytes))
+                    continue
+                if total_bytes + info.file_size > max_bytes:
+                    raise BatchLimitError(f'Batch exceeds {max_bytes // (1024 * 1024)} MB limit')
+                _add(info.filename, archive.read(info))
+
+    return images